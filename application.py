@@ -2,12 +2,28 @@
 
 import os
 import json
+import time
+import shlex
+import datetime
 import threading
 
 from gui import *
 from email_services import SendEmailServices
 from email_services import ReadEmailServices
-from email_services import BasicEmailHeadersParser
+from email_services import EmailHeaders
+from email_services import IdleListener
+from email_services import IndexCrawler
+from email_services import BodyPrefetcher
+from email_services import EmailAccount
+from email_services import AccountSyncScheduler
+from email_services import OutboxSender
+from email_services import OutboxSenderException
+from email_services import AttachmentPartException
+from email_storage import HeadersCache
+from email_storage import BodyCache
+from email_storage import SearchIndex
+from email_storage import SearchIndexException
+from email_storage import Outbox
 
 
 """
@@ -17,14 +33,29 @@ from email_services import BasicEmailHeadersParser
 
 
 class Application:
+    MIN_PAGE_SIZE = 25
+    MAX_PAGE_SIZE = 250
+    PAGE_LATENCY = 0.5  # durata tinta (secunde) pentru descarcarea unei pagini de header-e
+    READ_AHEAD_SCREENS = 2  # urmatoarea pagina se cere cand au ramas mai putin de atatea ecrane de randuri
+    PREFETCH_COUNT = 5  # numarul maxim de mesaje descarcate in avans dupa o selectie
+
     def __init__(self, config_file):
         self.__title = str()  # bara de titlu a ferestrei
         self.__imap_host = str()  # adresa serverului IMAP
         self.__smtp_host = str()  # adresa serverului SMTP
         self.__imap_port = int()  # portul serviciului IMAP
         self.__smtp_port = int()  # portul serviciului SMTP
-        self.__indexed_mails = dict()  # pentru  stocarea locala a fiecarui email citit
-        self.__indexed_mails_count = dict()  # numarul total e email-uri indexate
+        self.__index_crawl = False  # indexarea in fundal a tuturor mailbox-urilor dupa autentificare
+        self.__index_bodies = False  # indexarea include si textul mesajelor, nu doar header-ele
+        self.__accounts = dict()  # setarile fiecarui cont din fisierul de configurare, indexate dupa nume
+        self.__accounts_status = dict()  # starea ultimei sincronizari in fundal, pentru fiecare cont si mailbox
+        self.__indexed_mails = dict()  # pentru  stocarea locala a fiecarui email citit, indexat dupa UID
+        self.__search_results = None  # UID-urile gasite de ultima cautare, sau None daca se listeaza mailbox-ul
+        self.__searched_mails = dict()  # header-ele rezultatelor afisate, indexate dupa UID
+        self.__page_size = self.MIN_PAGE_SIZE  # adaptat dupa durata masurata a descarcarii paginilor
+        self.__page_loading = False
+        self.__page_generation = 0  # creste la fiecare incarcare de pagina noua sau anulata
+        self.__opened_uid = None  # UID-ul mesajului afisat in frame-ul de citire
 
         self.__import_settings(config_file)  # se importa setarile pentru conectarea la server
 
@@ -34,10 +65,25 @@ class Application:
         self.__write_email_screen = WriteEmailScreen(self.__main_window)
         self.__mailbox_screen = MailboxScreen(self.__main_window)
         self.__email_rendering_screen = EmailRenderingScreen(self.__main_window)
+        self.__ui_queue = UpdateQueue(self.__main_window)  # modificarile cerute de firele de executie secundare
 
         # se creaza cate un obiect al claselor de citire si trimitere a mail-urilor
         self.__send_email_services = SendEmailServices()
-        self.__read_email_services = ReadEmailServices()
+        try:
+            search_index = SearchIndex("email_index.db")  # indexul local pentru cautarea full-text
+        except SearchIndexException:
+            search_index = None
+        self.__headers_cache = HeadersCache("email_cache.db")  # comun tuturor conturilor
+        self.__read_email_services = ReadEmailServices(self.__headers_cache, body_cache=BodyCache(),
+                                                       search_index=search_index)
+        self.__index_crawler = None  # creat la autentificare, dupa optiunile de indexare ale contului ales
+        self.__idle_listener = IdleListener(self.__idle_notification)  # notificari push pentru mail-uri noi
+        self.__body_prefetcher = BodyPrefetcher(self.__read_email_services)  # mesajele probabil deschise in curand
+        self.__idle_refresh_pending = False
+        self.__smtp_login_thread = None  # autentificarea SMTP, finalizata in fundal dupa cea IMAP
+        self.__sync_scheduler = None  # sincronizarea in fundal a celorlalte conturi configurate
+        self.__outbox = Outbox("email_outbox.db")  # mesajele scrise, pastrate pe disc pana sunt trimise
+        self.__outbox_sender = None
 
         # functiile responsabile pentru randarea corecta a fiecarui frame;
         self.__setup_main_window()
@@ -51,171 +97,579 @@ class Application:
         self.__main_window.title(self.__title)  # seteaza titlul ferestrei
         self.__main_window.minsize(400, 500)  # seteaza dimensiunile minime ale ferestrei
 
-    def __setup_email_services(self):
-        # realizeaza conectarea la serverele SMTP si SMTP
+    def __setup_email_services(self, username, password):
+        # realizeaza conectarea si autentificarea la serverele IMAP si SMTP in paralel; se intoarce imediat
+        # ce sesiunea IMAP este disponibila, iar sesiunea SMTP este finalizata in fundal
+        smtp_result = dict()
+
+        def smtp_signing_in():
+            smtp_result["connected"] = self.__send_email_services.connect_to_server(self.__smtp_host,
+                                                                                     self.__smtp_port)
+            smtp_result["logged_in"] = smtp_result["connected"] and \
+                self.__send_email_services.login_to_server(username, password)
+            if smtp_result["logged_in"]:
+                self.__send_email_services.start_keepalive()
+                self.__outbox_sender.start()  # trimite si mesajele ramase in outbox de la sesiunea anterioara
+
+        self.__smtp_login_thread = threading.Thread(target=smtp_signing_in)
+        self.__smtp_login_thread.start()
 
         imap_connected = self.__read_email_services.connect_to_server(self.__imap_host, self.__imap_port)
-        smtp_connected = self.__send_email_services.connect_to_server(self.__smtp_host, self.__smtp_port)
+        imap_logged_in = imap_connected and self.__read_email_services.login_to_server(username, password)
+        if imap_logged_in:
+            return True, smtp_result
 
-        if not imap_connected and not smtp_connected:
-            self.__login_screen.status["text"] = "Connection error"
+        # fara IMAP, rezultatul autentificarii SMTP decide ce ecran este afisat
+        self.__smtp_login_thread.join()
+        if not imap_connected and not smtp_result["connected"]:
+            self.__ui_queue.put(self.__login_screen.status.configure, text="Connection error")
+        return False, smtp_result
 
     # urmatoarele 4 functii seteaza proprietatile frame-ului pentru login, pentru scrierea unui mail
     # frame-ul de inbox respectiv frame-ul de randare al mail-urilor in html
 
     def __setup_login_screen(self):
         self.__login_screen.login_button["command"] = self.__login_screen_login_button
+        self.__login_screen.accounts_list["values"] = tuple(self.__accounts)
+        self.__login_screen.accounts_list.set(self.__title)
+        self.__login_screen.accounts_list.bind("<<ComboboxSelected>>", self.__login_screen_account_selected)
 
     def __setup_write_email_screen(self):
         self.__write_email_screen.send_email_button["command"] = self.__write_email_screen_send_email_button
         self.__write_email_screen.back_button["command"] = self.__write_email_screen_back_button
+        self.__write_email_screen.attach_button["command"] = self.__write_email_screen_attach_button
 
     def __setup_mailbox_screen(self):
-        self.__mailbox_screen.mails_list.bind("<<TreeviewSelect>>", self.__mailbox_screen_item_selected_event)
+        self.__mailbox_screen.mails_list.bind("<Double-1>", self.__mailbox_screen_item_selected_event)
+        self.__mailbox_screen.mails_list.bind("<Return>", self.__mailbox_screen_item_selected_event)
         self.__mailbox_screen.mailboxes_list.bind("<<ComboboxSelected>>", self.__mailbox_screen_mailbox_selected)
         self.__mailbox_screen.write_button["command"] = self.__mailbox_screen_write_email_button
         self.__mailbox_screen.refresh_button["command"] = self.__mailbox_screen_refresh_button
         self.__mailbox_screen.more_button["command"] = self.__mailbox_screen_show_more_button
+        self.__mailbox_screen.mails.bind_scroll(self.__mailbox_screen_mails_scrolled)
         self.__mailbox_screen.logout_button["command"] = self.__mailbox_screen_logout_button
+        self.__mailbox_screen.search_button["command"] = self.__mailbox_screen_search_button
+        self.__mailbox_screen.search_entry.bind("<Return>", lambda event: self.__mailbox_screen_search_button())
+        self.__mailbox_screen.read_button["command"] = lambda: self.__mailbox_screen_flags_button("\\Seen", True)
+        self.__mailbox_screen.unread_button["command"] = lambda: self.__mailbox_screen_flags_button("\\Seen", False)
+        self.__mailbox_screen.flag_button["command"] = lambda: self.__mailbox_screen_flags_button("\\Flagged", True)
+        self.__mailbox_screen.delete_button["command"] = self.__mailbox_screen_delete_button
+        self.__mailbox_screen.move_button["command"] = self.__mailbox_screen_move_button
 
     def __setup_email_rendering_screen(self):
         self.__email_rendering_screen.back_button["command"] = self.__email_rendering_screen_back_button
         self.__email_rendering_screen.respond_button["command"] = self.__email_rendering_screen_respond_button
         self.__email_rendering_screen.redirect_button["command"] = self.__email_rendering_screen_redirect_button
+        self.__email_rendering_screen.attachments_button["command"] = self.__email_rendering_screen_attachments_button
 
     # urmatoarele functii sunt responsabile pentru fiecare buton ce apare in interfata grafica;
 
+    def __login_screen_account_selected(self, event=None):
+        self.__select_account(self.__login_screen.accounts_list.get())
+        self.__main_window.title(self.__title)
+
     def __login_screen_login_button(self):  # butonul "login"
-        def logging_in():
-            password = self.__login_screen.password.get()
-            username = self.__login_screen.username.get()
+        # valorile din interfata sunt citite in firul principal, iar comenzile de retea ruleaza separat
+        password = self.__login_screen.password.get()
+        username = self.__login_screen.username.get()
+        self.__login_screen_account_selected()
+        if self.__read_email_services.has_search_index():
+            self.__index_crawler = IndexCrawler(self.__read_email_services, self.__index_bodies)
+        # mesajele din outbox apartin utilizatorului autentificat, nu doar furnizorului din configurare;
+        # altfel mesajele ramase de la un utilizator ar fi trimise prin sesiunea SMTP a altuia
+        self.__outbox_sender = OutboxSender(self.__send_email_services, self.__outbox, f"{self.__title}/{username}",
+                                            callback=self.__outbox_message_processed)
 
-            self.__setup_email_services()
+        def logging_in():
+            imap_logged_in, smtp_result = self.__setup_email_services(username, password)
 
-            smtp_logged_in = self.__send_email_services.login_to_server(username, password)
-            imap_logged_in = self.__read_email_services.login_to_server(username, password)
+            if not imap_logged_in and not smtp_result["logged_in"]:
+                self.__ui_queue.put(self.__login_screen.status.configure, text="SMTP and IMAP login failed")
+                return
 
-            if not smtp_logged_in and not imap_logged_in:
-                self.__login_screen.status["text"] = "SMTP and IMAP login failed"
+            self.__ui_queue.put(self.__show_main_screen, username, imap_logged_in)
+            if not imap_logged_in:
                 return
 
-            self.__write_email_screen.from_address.insert(0, self.__login_screen.username.get())
+            # lista mailbox-urilor si prima pagina sunt cerute pe conexiunea deja autentificata,
+            # in timp ce autentificarea SMTP poate fi inca in desfasurare
+            mailboxes = self.__read_email_services.get_mailboxes()
+            for mailbox in mailboxes:
+                self.__indexed_mails[mailbox] = dict()
+            changes = self.__read_email_services.resync_mailbox(mailboxes[0])
+            self.__body_prefetcher.start()
+            self.__ui_queue.put(self.__show_mailboxes, mailboxes, changes)
 
-            self.__login_screen.grid_remove()
-            self.__main_window.minsize(800, 500)
-            if imap_logged_in:
-                self.__mailbox_screen.show()
+            self.__idle_listener.start(self.__imap_host, self.__imap_port, username, password, mailboxes[0])
+            if self.__index_crawler and self.__index_crawl:
+                self.__index_crawler.start(mailboxes)
+            self.__start_account_sync()
 
-                mailboxes = self.__read_email_services.get_mailboxes()
-                self.__mailbox_screen.mailboxes_list["values"] = tuple(mailboxes)
-                for mailbox in mailboxes:
-                    self.__indexed_mails[mailbox] = []
-                    self.__indexed_mails_count[mailbox] = 0
-                self.__mailbox_screen.mailboxes_list.set(mailboxes[0])
-                self.__mailbox_screen_mailbox_selected()
-                return
+        threading.Thread(target=logging_in).start()
 
-            if not imap_logged_in and smtp_logged_in:
-                self.__write_email_screen.show()
+    def __start_account_sync(self):
+        # celelalte conturi cu date de autentificare in fisierul de configurare sunt sincronizate in fundal,
+        # concurent, fiecare cu propria limita de frecventa
+        self.__sync_scheduler = AccountSyncScheduler(self.__account_synced)
+        for name, config in self.__accounts.items():
+            if name == self.__title or not config.get("username") or not config.get("password"):
+                continue
+
+            self.__sync_scheduler.add_account(EmailAccount(name, config["imap"]["host"], config["imap"]["port"],
+                                                           config["smtp"]["host"], config["smtp"]["port"],
+                                                           config["username"], config["password"],
+                                                           config.get("mailboxes"), config.get("sync_interval", 300),
+                                                           self.__headers_cache))
+
+        if self.__sync_scheduler.get_accounts():
+            self.__sync_scheduler.start()
+
+    def __account_synced(self, account, mailbox, changes):
+        # se apeleaza din firele de executie ale planificatorului
+        self.__ui_queue.put(self.__show_account_status, account, mailbox, changes)
+
+    def __show_account_status(self, account, mailbox, changes):
+        status = f"{account}/{mailbox}: {changes.emails_count} mails"
+        if changes.new_uids and not changes.full:
+            status += f", {len(changes.new_uids)} new"
+        self.__accounts_status[(account, mailbox)] = status
+        self.__mailbox_screen.accounts_status["text"] = " | ".join(self.__accounts_status.values())
+
+    def __outbox_message_processed(self, message_id, status):
+        # se apeleaza din firele de executie ale outbox-ului
+        self.__ui_queue.put(self.__show_outbox_status)
+
+    def __show_outbox_status(self):
+        if not self.__outbox_sender:
+            return
 
-        threading.Thread(target=logging_in).start()
+        queued = self.__outbox_sender.get_queue_depth()
+        failed = len(self.__outbox_sender.get_messages(Outbox.FAILED))
+        status = list()
+        if queued:
+            status.append(f"Outbox: {queued} waiting to be sent")
+        if failed:
+            status.append(f"{failed} failed")
+        self.__mailbox_screen.outbox_status["text"] = ", ".join(status)
+
+    def __show_main_screen(self, username, imap_logged_in):
+        self.__write_email_screen.from_address.insert(0, username)
+        self.__show_outbox_status()
+
+        self.__login_screen.grid_remove()
+        self.__main_window.minsize(800, 500)
+        if imap_logged_in:
+            self.__mailbox_screen.show()
+        else:
+            self.__write_email_screen.show()
+
+    def __show_mailboxes(self, mailboxes, changes):
+        self.__mailbox_screen.mailboxes_list["values"] = tuple(mailboxes)
+        self.__mailbox_screen.move_target["values"] = tuple(mailboxes)
+        self.__mailbox_screen.mailboxes_list.set(mailboxes[0])
+        self.__display_mailbox(mailboxes[0], changes)
+
+    def __get_listed_mails(self, selected_mailbox):
+        # mail-urile listate provin fie din mailbox, fie din rezultatele unei cautari
+        if self.__search_results is not None:
+            return self.__searched_mails
+        return self.__indexed_mails[selected_mailbox]
+
+    def __start_page_load(self, uids, selected_mailbox, indexed_mails=None):
+        # fiecare pagina incarcata la finalul listei primeste o generatie; o incarcare terminata dupa ce
+        # utilizatorul a trecut la alt mailbox sau la alta cautare este ignorata
+        self.__page_generation += 1
+        self.__page_loading = True
+        threading.Thread(target=self.__populate_mailbox_screen,
+                         args=(uids, selected_mailbox, "end", indexed_mails, self.__page_generation)).start()
+
+    def __cancel_page_load(self):
+        self.__page_generation += 1
+        self.__page_loading = False
+
+    def __populate_mailbox_screen(self, uids, selected_mailbox, position="end", indexed_mails=None, generation=None):
+        # aceasta functie se apeleaza dintr-un fir de executie separat cand se doreste listarea emailurilor
+        # dintr-un mailbox; mesajele noi sunt inserate la inceputul listei, iar paginile urmatoare la final
+        if indexed_mails is None:
+            indexed_mails = self.__indexed_mails[selected_mailbox]
+
+        # toate header-ele paginii sunt descarcate printr-o singura comanda FETCH
+        started = time.monotonic()
+        fetched_headers = self.__read_email_services.get_email_headers_by_uid(uids, selected_mailbox)
+        headers = [fetched_headers.get(uid, EmailHeaders(uid)) for uid in uids]
+
+        # randurile intregii pagini sunt adaugate in model printr-o singura actualizare a interfetei
+        self.__ui_queue.put(self.__insert_mail_rows, selected_mailbox, indexed_mails, headers, position, generation)
+        if generation is not None:
+            self.__ui_queue.put(self.__page_loaded, generation, len(uids), time.monotonic() - started)
+
+    def __page_loaded(self, generation, count, elapsed):
+        # dimensiunea paginii urmatoare este aleasa astfel incat descarcarea ei sa dureze aproximativ
+        # PAGE_LATENCY; header-ele din cache sunt rapide, deci paginile cresc pana la MAX_PAGE_SIZE
+        if generation != self.__page_generation:
+            return
 
-    def __populate_mailbox_screen(self, start_index, stop_index, selected_mailbox):
-        # aceasta functie se apeleaza cand se doreste listarea emailurilor dintr-un mailbox
-        self.__mailbox_screen.mailboxes_list["state"] = "disabled"
-        self.__mailbox_screen.refresh_button["state"] = "disabled"
-        self.__mailbox_screen.more_button["state"] = "disabled"
-        self.__mailbox_screen.logout_button["state"] = "disabled"
+        self.__page_loading = False
+        if count and elapsed > 0:
+            page_size = int(self.PAGE_LATENCY * count / elapsed)
+            page_size = (self.__page_size + page_size) // 2
+            self.__page_size = max(self.MIN_PAGE_SIZE, min(page_size, self.MAX_PAGE_SIZE))
 
-        basic_headers_parser = BasicEmailHeadersParser()
+    def __insert_mail_rows(self, selected_mailbox, indexed_mails, headers, position="end", generation=None):
+        # rezultatul este ignorat daca intre timp a fost selectat alt mailbox sau a fost pornita alta cautare
+        if generation is not None and generation != self.__page_generation:
+            return
+        if self.__mailbox_screen.mailboxes_list.get() != selected_mailbox:
+            return
+        if indexed_mails is not self.__get_listed_mails(selected_mailbox):
+            return
 
-        while start_index > stop_index:
-            email_headers = self.__read_email_services.get_email_headers(start_index)
-            basic_headers_parser.parse(email_headers)
+        for email_headers in headers:
+            indexed_mails[email_headers.uid] = email_headers
+        self.__mailbox_screen.mails.insert_rows(position, [self.__make_mail_row(email_headers)
+                                                           for email_headers in headers])
+
+        if len(self.__mailbox_screen.mails) == len(headers):  # prima pagina a listei
+            self.__schedule_prefetch(selected_mailbox)
+
+    def __schedule_prefetch(self, selected_mailbox, mail_uid=None):
+        # se descarca in avans vecinii mesajului deschis (intai urmatorul, apoi precedentul)
+        # si mesajele necitite din apropiere; fara o selectie se porneste de la inceputul listei
+        keys = [int(key) for key in self.__mailbox_screen.mails.get_keys() if key.isdigit()]
+        index = keys.index(mail_uid) if mail_uid in keys else -1
+        listed_mails = self.__get_listed_mails(selected_mailbox)
+
+        uids = keys[index + 1:index + 3] + keys[max(index - 1, 0):index] if index >= 0 else keys[:2]
+        uids += [uid for uid in keys[max(index, 0):max(index, 0) + 50]
+                 if uid in listed_mails and not listed_mails[uid].is_seen()]
+
+        uids = [uid for uid in dict.fromkeys(uids) if uid != mail_uid][:self.PREFETCH_COUNT]
+        if uids:
+            self.__body_prefetcher.schedule(selected_mailbox, uids)
+
+    @staticmethod
+    def __make_mail_row(email_headers):
+        # sirurile afisate sunt deja calculate de serviciul de citire, deci nu se mai parseaza nimic
+        return (str(email_headers.uid),
+                email_headers.display_from,
+                (email_headers.display_subject, email_headers.display_date),
+                () if email_headers.is_seen() else ("unseen",))
+
+    def __display_mailbox(self, selected_mailbox, changes):
+        # afiseaza mail-urile deja indexate si descarca doar header-ele mesajelor noi
+        self.__cancel_page_load()
+        self.__mailbox_screen.mails.clear()
+
+        if not changes.emails_count:
+            self.__mailbox_screen.mails.insert("end", "none", text="No mails available")
+            return
 
-            self.__indexed_mails[selected_mailbox].append(email_headers)
+        indexed_mails = self.__indexed_mails[selected_mailbox]
+        if changes.full:
+            indexed_mails.clear()
+        for uid in changes.expunged_uids:
+            indexed_mails.pop(uid, None)
 
-            self.__mailbox_screen.mails_list.insert("", "end", str(start_index),
-                                                    text=basic_headers_parser.from_address,
-                                                    values=(
-                                                        basic_headers_parser.subject,
-                                                        basic_headers_parser.date)
-                                                    )
+        self.__mailbox_screen.mails.insert_rows("end", [self.__make_mail_row(indexed_mails[uid])
+                                                        for uid in sorted(indexed_mails, reverse=True)])
+        if indexed_mails:
+            self.__schedule_prefetch(selected_mailbox)
 
-            start_index -= 1
+        if indexed_mails:
+            uids = sorted(changes.new_uids, reverse=True)
+            position = 0
+        else:
+            uids = self.__read_email_services.get_mailbox_uids(selected_mailbox)[:self.__page_size]
+            position = "end"
 
-        self.__mailbox_screen.mailboxes_list["state"] = "readonly"
-        self.__mailbox_screen.refresh_button["state"] = "normal"
-        self.__mailbox_screen.more_button["state"] = "normal"
-        self.__mailbox_screen.logout_button["state"] = "normal"
+        if uids and position == "end":
+            self.__start_page_load(uids, selected_mailbox)
+        elif uids:
+            threading.Thread(target=self.__populate_mailbox_screen, args=(uids, selected_mailbox, position)).start()
 
     def __mailbox_screen_mailbox_selected(self, event=None):
         # se apeleaza cand un nou mailbox a fost selectat pentru listarea mailurilor
         selected_mailbox = self.__mailbox_screen.mailboxes_list.get()
-        emails_count = self.__read_email_services.select_mailbox(selected_mailbox)
+        self.__search_results = None
+        self.__mailbox_screen.search_entry.delete(0, "end")
+        self.__body_prefetcher.cancel()
+        self.__cancel_page_load()
+
+        def selecting_mailbox():
+            changes = self.__read_email_services.resync_mailbox(selected_mailbox)
+            self.__idle_listener.set_mailbox(selected_mailbox)
+            self.__ui_queue.put(self.__display_mailbox, selected_mailbox, changes)
 
-        self.__mailbox_screen.mails_list.delete(*self.__mailbox_screen.mails_list.get_children())
+        threading.Thread(target=selecting_mailbox).start()
 
-        if not emails_count:
-            self.__mailbox_screen.mails_list.insert("", "end", text="No mails available")
+    def __mailbox_screen_refresh_button(self):  # butonul "Refresh"
+        # se cer de la server doar modificarile aparute de la ultima sincronizare
+        if self.__search_results is not None:
+            self.__mailbox_screen_search_button()
             return
 
-        if self.__indexed_mails_count[selected_mailbox] != emails_count:
-            self.__indexed_mails[selected_mailbox] = []
-            self.__indexed_mails_count[selected_mailbox] = emails_count
+        selected_mailbox = self.__mailbox_screen.mailboxes_list.get()
 
-            stop_index = emails_count - 25
-            if stop_index < 1:
-                stop_index = 1
+        def refreshing():
+            changes = self.__read_email_services.resync_mailbox(selected_mailbox)
+            self.__ui_queue.put(self.__apply_mailbox_changes, selected_mailbox, changes)
 
-            threading.Thread(target=self.__populate_mailbox_screen, args=(emails_count, stop_index,
-                                                                          selected_mailbox)).start()
-        else:
-            basic_headers_parser = BasicEmailHeadersParser()
-            for email_headers in self.__indexed_mails[selected_mailbox]:
-                basic_headers_parser.parse(email_headers)
-                self.__mailbox_screen.mails_list.insert("", "end", str(emails_count),
-                                                        text=basic_headers_parser.from_address,
-                                                        values=(
-                                                            basic_headers_parser.subject,
-                                                            basic_headers_parser.date)
-                                                        )
-                emails_count -= 1
+        threading.Thread(target=refreshing).start()
 
-    def __mailbox_screen_refresh_button(self):  # butonul "Refresh"
-        self.__mailbox_screen_mailbox_selected()
+    def __apply_mailbox_changes(self, selected_mailbox, changes):
+        if self.__mailbox_screen.mailboxes_list.get() != selected_mailbox or self.__search_results is not None:
+            return
 
-    def __mailbox_screen_item_selected_event(self, virtual_event=None):
-        # se apeleaza pentru afisarea mailului selectat
-        def selecting_item():
-            selected_mailbox = self.__mailbox_screen.mailboxes_list.get()
-            mail_index = int(self.__mailbox_screen.mails_list.selection()[0])
-            mail_content = self.__read_email_services.get_body(mail_index)
-            local_mail_index = self.__indexed_mails_count[selected_mailbox] - mail_index
-            mail_header = self.__indexed_mails[selected_mailbox][local_mail_index]
+        indexed_mails = self.__indexed_mails[selected_mailbox]
+        if changes.full or not changes.emails_count or not indexed_mails:
+            self.__display_mailbox(selected_mailbox, changes)
+            return
+
+        for uid in changes.expunged_uids:
+            if indexed_mails.pop(uid, None) is not None:
+                self.__mailbox_screen.mails.delete(str(uid))
+
+        for uid, flags in changes.changed_uids.items():
+            if uid in indexed_mails:
+                indexed_mails[uid].flags = EmailHeaders.make_flags(flags)
+                self.__mailbox_screen.mails.update(str(uid),
+                                                   tags=() if indexed_mails[uid].is_seen() else ("unseen",))
+
+        uids = sorted(changes.new_uids, reverse=True)
+        if uids:
+            threading.Thread(target=self.__populate_mailbox_screen, args=(uids, selected_mailbox, 0)).start()
+
+    @staticmethod
+    def __parse_search_query(query: str) -> dict:
+        # transforma o cerere de forma "from:ana subject:factura since:2024-01-31 is:unread text liber"
+        # in argumentele functiei de cautare de pe server
+        try:
+            terms = shlex.split(query)
+        except ValueError:
+            terms = query.split()
+
+        arguments = {"flags": list()}
+        text = list()
+        for term in terms:
+            key, _, value = term.partition(":")
+            key = key.lower()
+            if not value or key not in ("from", "subject", "since", "before", "is"):
+                text.append(term)
+            elif key == "from":
+                arguments["from_address"] = value
+            elif key == "subject":
+                arguments["subject"] = value
+            elif key in ("since", "before"):
+                try:
+                    arguments[key] = datetime.date.fromisoformat(value)
+                except ValueError:
+                    text.append(term)
+            elif value.lower() in ("unread", "read", "flagged", "answered"):
+                arguments["flags"].append({"unread": "UNSEEN", "read": "SEEN"}.get(value.lower(), value.upper()))
+            else:
+                text.append(term)
+
+        if text:
+            arguments["text"] = " ".join(text)
+        return arguments
+
+    def __mailbox_screen_search_button(self):  # butonul "Search"
+        # cautarea se executa pe server (SEARCH/SORT), fara a descarca header-ele intregului mailbox
+        selected_mailbox = self.__mailbox_screen.mailboxes_list.get()
+        query = self.__mailbox_screen.search_entry.get().strip()
+
+        if not query:
+            if self.__search_results is not None:
+                self.__search_results = None
+                self.__mailbox_screen_mailbox_selected()
+            return
+
+        arguments = self.__parse_search_query(query)
+        # cererile care contin doar text sunt rezolvate din indexul local, fara comenzi catre server, dar numai
+        # dupa ce mailbox-ul a fost indexat complet; altfel mesajele neindexate inca ar lipsi din rezultate
+        local = self.__index_crawler is not None and \
+            self.__index_crawler.is_indexed(selected_mailbox, bodies="text" in arguments) and \
+            not (arguments["flags"] or "since" in arguments or "before" in arguments)
+
+        def searching():
+            try:
+                if local:
+                    uids = [uid for _, uid in self.__read_email_services.search_local(query, selected_mailbox)]
+                    known_uids = set(self.__read_email_services.get_mailbox_uids(selected_mailbox))
+                    if known_uids:
+                        uids = [uid for uid in uids if uid in known_uids]
+                else:
+                    uids = self.__read_email_services.search(selected_mailbox, **arguments)
+            except Exception:
+                uids = list()
+
+            self.__ui_queue.put(self.__display_search_results, selected_mailbox, uids)
+
+        threading.Thread(target=searching).start()
+
+    def __display_search_results(self, selected_mailbox, uids):
+        self.__search_results = uids
+        self.__searched_mails = dict()
+        self.__cancel_page_load()
+        self.__mailbox_screen.mails.clear()
+
+        if not uids:
+            self.__mailbox_screen.mails.insert("end", "none", text="No mails found")
+            return
+
+        self.__start_page_load(uids[:self.__page_size], selected_mailbox, self.__searched_mails)
+
+    def __get_mail_header(self, selected_mailbox, mail_uid):
+        # header-ul poate proveni din listarea mailbox-ului sau din rezultatele unei cautari
+        mail_header = self.__indexed_mails[selected_mailbox].get(mail_uid)
+        return mail_header if mail_header is not None else self.__searched_mails[mail_uid]
 
-            self.__mailbox_screen.grid_remove()
-            self.__email_rendering_screen.set_header(mail_header)
-            self.__email_rendering_screen.set_content(mail_content, mail_header.get_content_subtype())
-            self.__email_rendering_screen.show()
+    def __get_selected_uids(self):
+        # randurile selectate pot contine si un mesaj informativ (ex. "No mails available"), fara UID
+        return [int(key) for key in self.__mailbox_screen.mails.selection() if key.isdigit()]
+
+    def __idle_notification(self, notification, number):
+        # se apeleaza din firul de executie al listener-ului IDLE; notificarile apropiate in timp
+        # sunt grupate intr-o singura resincronizare, pornita din bucla principala Tk
+        if self.__idle_refresh_pending:
+            return
+
+        self.__idle_refresh_pending = True
+        self.__ui_queue.put(self.__main_window.after, 500, self.__idle_refresh)
+
+    def __idle_refresh(self):
+        self.__idle_refresh_pending = False
+        if self.__mailbox_screen.mailboxes_list.get():
+            self.__mailbox_screen_refresh_button()
+
+    def __mailbox_screen_item_selected_event(self, event=None):
+        # se apeleaza pentru afisarea mailului activ (dublu click sau Enter); un click simplu doar il selecteaza
+        key = self.__mailbox_screen.mails_list.focus()
+        if not key.isdigit():
+            return
+
+        selected_mailbox = self.__mailbox_screen.mailboxes_list.get()
+        mail_uid = int(key)
+        self.__opened_uid = mail_uid
+
+        self.__body_prefetcher.cancel()  # mesajul deschis are prioritate fata de descarcarile in avans
+
+        def selecting_item():
+            mail_content, mail_subtype = self.__read_email_services.get_displayable_body(mail_uid, selected_mailbox)
+            self.__ui_queue.put(self.__schedule_prefetch, selected_mailbox, mail_uid)
+            mail_header = self.__get_mail_header(selected_mailbox, mail_uid)
+            self.__ui_queue.put(self.__show_email, mail_header, mail_content, mail_subtype)
 
         threading.Thread(target=selecting_item).start()
 
+    def __show_email(self, mail_header, mail_content, mail_subtype):
+        self.__mailbox_screen.grid_remove()
+        self.__email_rendering_screen.set_header(mail_header)
+        self.__email_rendering_screen.set_content(mail_content, mail_subtype)
+        self.__email_rendering_screen.show()
+
     def __mailbox_screen_write_email_button(self):  # butonul "Write"
         self.__mailbox_screen.grid_remove()
         self.__write_email_screen.show()
 
     def __mailbox_screen_show_more_button(self):  # butonul "Show more"
+        self.__load_next_page()
+
+    def __mailbox_screen_mails_scrolled(self, first, visible_count, total):
+        # pagina urmatoare este ceruta inainte ca utilizatorul sa ajunga la finalul listei
+        if total - (first + visible_count) <= visible_count * self.READ_AHEAD_SCREENS:
+            self.__load_next_page()
+
+    def __load_next_page(self):
+        # o singura pagina este descarcata la un moment dat; interfata ramane utilizabila in acest timp
         selected_mailbox = self.__mailbox_screen.mailboxes_list.get()
-        local_email_count = self.__indexed_mails_count[selected_mailbox]
-        start_index = local_email_count - len(self.__indexed_mails[selected_mailbox])
+        if self.__page_loading or not selected_mailbox or selected_mailbox not in self.__indexed_mails:
+            return
 
-        stop_index = start_index - 25
-        if stop_index < 1:
-            stop_index = 1
+        if self.__search_results is not None:
+            indexed_mails = self.__searched_mails
+            uids = self.__search_results
+        else:
+            indexed_mails = self.__indexed_mails[selected_mailbox]
+            uids = self.__read_email_services.get_mailbox_uids(selected_mailbox)
 
-        threading.Thread(target=self.__populate_mailbox_screen,
-                         args=(start_index, stop_index, selected_mailbox)).start()
+        uids = [uid for uid in uids if uid not in indexed_mails][:self.__page_size]
+        if uids:
+            self.__start_page_load(uids, selected_mailbox, indexed_mails)
+
+    def __mailbox_screen_flags_button(self, flag, add):  # butoanele "Mark read", "Mark unread" si "Flag"
+        selected_mailbox = self.__mailbox_screen.mailboxes_list.get()
+        uids = self.__get_selected_uids()
+        if not uids:
+            return
+
+        def updating_flags():
+            # toate mesajele selectate sunt modificate cu o comanda STORE pentru fiecare set compactat de UID-uri
+            if self.__read_email_services.set_flags(uids, [flag], selected_mailbox, add):
+                self.__ui_queue.put(self.__update_mail_flags, selected_mailbox, uids, flag, add)
+            else:
+                self.__ui_queue.put(self.__show_actions_status, "Updating messages failed")
+
+        self.__show_actions_status(f"Updating {len(uids)} messages...")
+        threading.Thread(target=updating_flags).start()
+
+    def __update_mail_flags(self, selected_mailbox, uids, flag, add):
+        self.__show_actions_status(f"{len(uids)} messages updated")
+        if self.__mailbox_screen.mailboxes_list.get() != selected_mailbox:
+            return
+
+        listed_mails = self.__get_listed_mails(selected_mailbox)
+        for uid in uids:
+            if uid not in listed_mails:
+                continue
+            flags = [mail_flag for mail_flag in listed_mails[uid].flags if mail_flag != flag]
+            listed_mails[uid].flags = EmailHeaders.make_flags(flags + [flag] if add else flags)
+            self.__mailbox_screen.mails.update(str(uid), tags=() if listed_mails[uid].is_seen() else ("unseen",))
+
+    def __mailbox_screen_delete_button(self):  # butonul "Delete"
+        selected_mailbox = self.__mailbox_screen.mailboxes_list.get()
+        uids = self.__get_selected_uids()
+        if not uids:
+            return
+
+        def deleting():
+            if self.__read_email_services.delete_messages(uids, selected_mailbox):
+                self.__ui_queue.put(self.__remove_mail_rows, selected_mailbox, uids, f"{len(uids)} messages deleted")
+            else:
+                self.__ui_queue.put(self.__show_actions_status, "Deleting messages failed")
+
+        self.__show_actions_status(f"Deleting {len(uids)} messages...")
+        threading.Thread(target=deleting).start()
+
+    def __mailbox_screen_move_button(self):  # butonul "Move to"
+        selected_mailbox = self.__mailbox_screen.mailboxes_list.get()
+        target = self.__mailbox_screen.move_target.get()
+        uids = self.__get_selected_uids()
+        if not uids or not target or target == selected_mailbox:
+            return
+
+        def moving():
+            if self.__read_email_services.move_messages(uids, target, selected_mailbox):
+                self.__ui_queue.put(self.__remove_mail_rows, selected_mailbox, uids,
+                                    f"{len(uids)} messages moved to {target}")
+            else:
+                self.__ui_queue.put(self.__show_actions_status, "Moving messages failed")
+
+        self.__show_actions_status(f"Moving {len(uids)} messages...")
+        threading.Thread(target=moving).start()
+
+    def __remove_mail_rows(self, selected_mailbox, uids, status):
+        self.__show_actions_status(status)
+        for uid in uids:
+            self.__indexed_mails[selected_mailbox].pop(uid, None)
+            self.__searched_mails.pop(uid, None)
+        if self.__search_results is not None:
+            self.__search_results = [uid for uid in self.__search_results if uid not in uids]
+        if self.__mailbox_screen.mailboxes_list.get() == selected_mailbox:
+            self.__mailbox_screen.mails.delete(*[str(uid) for uid in uids])
+
+    def __show_actions_status(self, status):
+        self.__mailbox_screen.actions_status["text"] = status
 
     def __mailbox_screen_logout_button(self):  # butonul "Logout"
         self.__login_screen.clear_all()
@@ -223,32 +677,98 @@ class Application:
         self.__write_email_screen.clear_all()
         self.__email_rendering_screen.clear_all()
 
-        self.__send_email_services.logout()
-        self.__read_email_services.logout()
-
+        self.__accounts_status.clear()
+        self.__search_results = None
+        self.__searched_mails = dict()
+        self.__cancel_page_load()
+        self.__opened_uid = None
+        sync_scheduler, self.__sync_scheduler = self.__sync_scheduler, None
+        outbox_sender, self.__outbox_sender = self.__outbox_sender, None
+        index_crawler, self.__index_crawler = self.__index_crawler, None
+
+        # ecranul de login este afisat imediat; oprirea serviciilor poate astepta o trimitere in curs,
+        # asa ca ruleaza separat, iar o noua autentificare este permisa doar dupa terminarea ei
         self.__mailbox_screen.grid_remove()
         self.__login_screen.show()
+        self.__login_screen.login_button.state(["disabled"])
+        self.__login_screen.status.configure(text="Logging out...")
+
+        def logging_out():
+            self.__idle_listener.stop()
+            self.__body_prefetcher.stop()
+            if sync_scheduler:
+                sync_scheduler.stop()
+            if index_crawler:
+                index_crawler.stop()
+            if outbox_sender:
+                outbox_sender.stop()
+            self.__send_email_services.logout()
+            self.__read_email_services.logout()
+            self.__ui_queue.put(self.__logged_out)
+
+        threading.Thread(target=logging_out).start()
+
+    def __logged_out(self):
+        self.__login_screen.login_button.state(["!disabled"])
+        self.__login_screen.status.configure(text="Enter your username and password")
 
     def __write_email_screen_send_email_button(self):  # butonul "Send"
-        def sending_email():
-            from_address = self.__write_email_screen.from_address.get()
-            to_address = self.__write_email_screen.to_address.get()
-            cc = self.__write_email_screen.cc.get()
-            bcc = self.__write_email_screen.bcc.get()
-            subject = self.__write_email_screen.subject.get()
-            text = self.__write_email_screen.text.get(1.0, END)
+        from_address = self.__write_email_screen.from_address.get()
+        to_address = self.__write_email_screen.to_address.get()
+        cc = self.__write_email_screen.cc.get()
+        bcc = self.__write_email_screen.bcc.get()
+        subject = self.__write_email_screen.subject.get()
+        text = self.__write_email_screen.text.get(1.0, END)
+
+        attachments = list(self.__write_email_screen.attachment_paths)
 
+        # mesajul este salvat in outbox, iar trimiterea propriu-zisa se face in fundal, cu reincercari
+        try:
             email_msg = self.__send_email_services.create_email_message(from_address, to_address, subject, text, cc,
-                                                                        bcc, _charset="utf-8")
-            self.__send_email_services.send_email(email_msg)
+                                                                        bcc, _charset="utf-8",
+                                                                        _attachments=attachments)
+        except AttachmentPartException as e:
+            self.__write_email_screen.status["text"] = str(e)
+            return
+
+        self.__write_email_screen.send_email_button.state(["disabled"])
+        self.__write_email_screen.status["text"] = "Saving to outbox..."
+
+        smtp_login_thread, outbox_sender = self.__smtp_login_thread, self.__outbox_sender
+
+        def queueing_email():
+            # un mesaj scris imediat dupa autentificare asteapta terminarea autentificarii SMTP, pornita in fundal
+            if smtp_login_thread and smtp_login_thread.is_alive():
+                self.__ui_queue.put(self.__write_email_screen.status.configure, text="Waiting for SMTP login...")
+                smtp_login_thread.join()
+
+            # atasamentele sunt codificate si scrise in spool-ul outbox-ului in afara firului principal
+            try:
+                outbox_sender.enqueue(email_msg)
+            except OutboxSenderException as e:
+                self.__ui_queue.put(self.__email_queued, str(e))
+                return
+            self.__ui_queue.put(self.__email_queued)
 
-            self.__write_email_screen.clear_all()
+        threading.Thread(target=queueing_email).start()
 
-        threading.Thread(target=sending_email).start()
+    def __email_queued(self, error=None):
+        self.__write_email_screen.send_email_button.state(["!disabled"])
+        if error:
+            self.__write_email_screen.status["text"] = error
+            return
+
+        self.__write_email_screen.clear_all()
+        self.__show_outbox_status()
 
         self.__write_email_screen.grid_remove()
         self.__mailbox_screen.show()
 
+    def __write_email_screen_attach_button(self):  # butonul "Attach"
+        paths = filedialog.askopenfilenames(parent=self.__main_window)
+        if paths:
+            self.__write_email_screen.add_attachments(paths)
+
     def __write_email_screen_back_button(self):  # butonul "Back" din frame-ul pentru scriere
         self.__write_email_screen.grid_remove()
         self.__write_email_screen.clear_all()
@@ -260,40 +780,87 @@ class Application:
 
     def __email_rendering_screen_respond_button(self):  # butonul "Respond"
         selected_mailbox = self.__mailbox_screen.mailboxes_list.get()
-        mail_index = int(self.__mailbox_screen.mails_list.selection()[0])
-        local_mail_index = self.__indexed_mails_count[selected_mailbox] - mail_index
-        mail_header = self.__indexed_mails[selected_mailbox][local_mail_index]
+        mail_uid = self.__opened_uid
+        if mail_uid is None:
+            return
+        mail_header = self.__get_mail_header(selected_mailbox, mail_uid)
 
         self.__email_rendering_screen.grid_remove()
         self.__write_email_screen.show()
-        self.__write_email_screen.to_address.insert(0, mail_header["From"])
-        self.__write_email_screen.subject.insert(0, "Re:" + mail_header["Subject"])
+        self.__write_email_screen.to_address.insert(0, mail_header.from_address)
+        self.__write_email_screen.subject.insert(0, "Re:" + mail_header.subject)
+
+    def __email_rendering_screen_attachments_button(self):  # butonul "Save attachments"
+        selected_mailbox = self.__mailbox_screen.mailboxes_list.get()
+        mail_uid = self.__opened_uid
+        if mail_uid is None:
+            return
+        directory = filedialog.askdirectory(parent=self.__main_window)
+        if not directory:
+            return
+
+        def saving_attachments():
+            # fiecare atasament este scris direct pe disc; progresul este afisat prin coada interfetei
+            parts = self.__read_email_services.get_attachments(mail_uid, selected_mailbox)
+            saved = 0
+            for part in parts:
+                filename = os.path.basename(part.filename or "") or f"attachment-{part.section}"
+
+                def progress(received, total, filename=filename):
+                    self.__ui_queue.put(self.__show_attachments_status,
+                                        f"{filename}: {received * 100 // max(total, 1)}%")
+
+                if self.__read_email_services.save_attachment(mail_uid, part, os.path.join(directory, filename),
+                                                              selected_mailbox, progress):
+                    saved += 1
+
+            self.__ui_queue.put(self.__show_attachments_status,
+                                f"{saved} of {len(parts)} attachments saved" if parts else "No attachments")
+
+        threading.Thread(target=saving_attachments).start()
+
+    def __show_attachments_status(self, status):
+        self.__email_rendering_screen.status["text"] = status
 
     def __email_rendering_screen_redirect_button(self):  # butonul "Redirect"
         selected_mailbox = self.__mailbox_screen.mailboxes_list.get()
-        mail_index = int(self.__mailbox_screen.mails_list.selection()[0])
-        local_mail_index = self.__indexed_mails_count[selected_mailbox] - mail_index
-        mail_header = self.__indexed_mails[selected_mailbox][local_mail_index]
-        mail_content = self.__read_email_services.get_body(mail_index)
+        mail_uid = self.__opened_uid
+        if mail_uid is None:
+            return
+        mail_header = self.__get_mail_header(selected_mailbox, mail_uid)
+
+        def redirecting():
+            mail_content = self.__read_email_services.get_body_by_uid(mail_uid, selected_mailbox, prefer="plain")
+            self.__ui_queue.put(self.__show_redirect, mail_header, mail_content)
+
+        threading.Thread(target=redirecting).start()
 
+    def __show_redirect(self, mail_header, mail_content):
         self.__email_rendering_screen.grid_remove()
         self.__write_email_screen.show()
-        self.__write_email_screen.subject.insert(0, "Fwd:" + mail_header["Subject"])
+        self.__write_email_screen.subject.insert(0, "Fwd:" + mail_header.subject)
         self.__write_email_screen.text.insert(1.0, mail_content)
 
     def __import_settings(self, file: str):
         # functia responsabila pentru importarea setarilor de conectare
         # la servere
         with open(file, "r") as file:
-            config = json.load(file)
-            title = list(config.keys())[0]
-            config = config[title]
-
-            self.__title = title
-            self.__imap_host = config["imap"]["host"]
-            self.__imap_port = config["imap"]["port"]
-            self.__smtp_host = config["smtp"]["host"]
-            self.__smtp_port = config["smtp"]["port"]
+            self.__accounts = json.load(file)
+
+        # fisierul poate contine mai multe conturi; implicit este folosit primul
+        self.__select_account(list(self.__accounts.keys())[0])
+
+    def __select_account(self, title: str):
+        # contul folosit in interfata grafica; celelalte conturi sunt doar sincronizate in fundal
+        config = self.__accounts[title]
+
+        self.__title = title
+        self.__imap_host = config["imap"]["host"]
+        self.__imap_port = config["imap"]["port"]
+        self.__smtp_host = config["smtp"]["host"]
+        self.__smtp_port = config["smtp"]["port"]
+        self.__index_crawl = config.get("index", {}).get("crawl", False)
+        self.__index_bodies = config.get("index", {}).get("bodies", False)
 
     def run(self):  # functia principala a aplicatiei
         self.__login_screen.show()
@@ -0,0 +1,1129 @@
+#!/usr/bin/env python
+
+import asyncio
+import base64
+import concurrent.futures
+import contextlib
+import datetime
+import os
+import re
+import socket
+import ssl
+import threading
+import typing
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from termcolor import colored
+
+from email_services import SendEmailServices
+from email_services import ReadEmailServices
+from email_services import EmailHeaders
+from email_services import BodyStructureParser
+from email_services import BodyStructureParserException
+from email_services import ReadEmailServicesException
+from email_services import BodyPart
+from email_services import PayloadDecoder
+from email_services import MailboxState
+from email_services import MailboxChanges
+from email_storage import HeadersCache
+from email_storage import BodyCache
+from email_storage import SearchIndex
+from email_storage import SearchIndexException
+
+
+"""
+    Acest modul contine varianta asyncio a serviciilor de citire si trimitere pentru email-uri;
+    metodele au aceleasi nume si argumente ca in email_services, dar trebuie asteptate (await);
+    indexarea in fundal, descarcarea in avans si transferul mailbox-urilor exista doar in varianta sincrona
+"""
+
+
+class AsyncImapResponse(object):
+    def __init__(self, status: str, text: str, untagged: list):
+        self.status = status  # OK, NO sau BAD
+        self.text = text  # textul raspunsului tagged
+        self.untagged = untagged  # (nume, date) pentru fiecare raspuns untagged primit in timpul comenzii
+
+    def get(self, name: str) -> list:
+        # datele raspunsurilor cu numele dat, in formatul folosit de imaplib
+        data = list()
+        for response_name, response_data in self.untagged:
+            if response_name == name.upper():
+                data.extend(response_data)
+        return data
+
+
+class AsyncImapConnection:
+    LITERAL = re.compile(rb"\{(\d+)\}\r\n$")
+
+    def __init__(self, timeout: float = 30):
+        if not isinstance(timeout, (int, float)):
+            raise AsyncImapConnectionException(f"wrong arg type: {type(timeout)}; float required")
+
+        self.timeout = timeout
+        self.capabilities = tuple()
+        self.__reader = None
+        self.__writer = None
+        self.__reader_task = None
+        self.__tag_number = 0
+        self.__pending = list()  # (tag, future, raspunsuri untagged, mesaje cerute), in ordinea trimiterii
+        self.__unsolicited = list()  # raspunsuri untagged primite cand nicio comanda nu este in asteptare
+        self.__continuation = None
+        self.__write_lock = asyncio.Lock()
+        self.__exclusive_lock = asyncio.Lock()
+
+    async def connect(self, address: str, port: int = 993) -> None:
+        self.__reader, self.__writer = await asyncio.wait_for(
+            asyncio.open_connection(address, port, ssl=ssl.create_default_context()), self.timeout
+        )
+
+        greeting = await asyncio.wait_for(self.__reader.readline(), self.timeout)
+        if not greeting.startswith((b"* OK", b"* PREAUTH")):
+            self.__writer.close()
+            raise AsyncImapConnectionException(f"unexpected greeting: {greeting}")
+
+        self.__reader_task = asyncio.create_task(self.__read_responses())
+        await self.refresh_capabilities()
+
+    async def refresh_capabilities(self) -> None:
+        response = await self.command("CAPABILITY")
+        capabilities = b" ".join(response.get("CAPABILITY")).decode("utf-8").upper()
+        self.capabilities = tuple(capabilities.split())
+
+    def is_connected(self) -> bool:
+        return self.__reader_task is not None and not self.__reader_task.done()
+
+    @staticmethod
+    def quote(value: str) -> str:
+        return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+    async def command(self, *arguments: str, literal: bytes = None, timeout: float = None) -> AsyncImapResponse:
+        # comenzile FETCH/STORE nu asteapta terminarea celor trimise anterior (pipelining), deoarece
+        # raspunsurile lor untagged sunt asociate dupa UID sau numarul mesajului; celelalte comenzi
+        # (SELECT, SEARCH, LIST etc.) ruleaza pe rand, deci datele lor nu pot fi confundate
+        if not self.is_connected():
+            raise AsyncImapConnectionException("not connected")
+
+        messages = self.__get_requested_messages(arguments)
+        async with contextlib.AsyncExitStack() as stack:
+            if messages is None:
+                await stack.enter_async_context(self.__exclusive_lock)
+            return await self.__command(arguments, messages, literal, timeout)
+
+    @staticmethod
+    def __get_requested_messages(arguments: tuple) -> typing.Optional[tuple]:
+        # intoarce ("UID" sau "FETCH", intervale) pentru comenzile ale caror raspunsuri FETCH pot fi recunoscute
+        words = [argument.upper() for argument in arguments[:2]]
+        if words[:1] == ["UID"] and words[1:] in (["FETCH"], ["STORE"]):
+            kind, message_set = "UID", arguments[2]
+        elif words[:1] in (["FETCH"], ["STORE"]):
+            kind, message_set = "FETCH", arguments[1]
+        else:
+            return None
+        if not re.fullmatch(r"[\d:,]+", message_set):
+            return None  # seturile cu "*" nu pot fi verificate
+
+        ranges = list()
+        for message_range in message_set.split(","):
+            first, _, last = message_range.partition(":")
+            first, last = int(first), int(last or first)
+            ranges.append((min(first, last), max(first, last)))
+        return kind, ranges
+
+    async def __command(self, arguments: tuple, messages: typing.Optional[tuple], literal: bytes,
+                        timeout: float) -> AsyncImapResponse:
+        self.__tag_number += 1
+        tag = f"A{self.__tag_number:04d}"
+        future = asyncio.get_running_loop().create_future()
+        line = " ".join((tag,) + arguments)
+
+        async with self.__write_lock:
+            self.__pending.append((tag, future, list(), messages))
+            if literal is None:
+                self.__writer.write(line.encode("utf-8") + b"\r\n")
+            elif "LITERAL+" in self.capabilities:
+                self.__writer.write(line.encode("utf-8") + f" {{{len(literal)}+}}\r\n".encode("utf-8") + literal +
+                                    b"\r\n")
+            else:
+                # literalul sincronizat se trimite doar dupa raspunsul de continuare "+" al serverului
+                self.__continuation = asyncio.get_running_loop().create_future()
+                self.__writer.write(line.encode("utf-8") + f" {{{len(literal)}}}\r\n".encode("utf-8"))
+                await self.__writer.drain()
+                await asyncio.wait_for(asyncio.shield(self.__continuation), timeout or self.timeout)
+                self.__writer.write(literal + b"\r\n")
+            await self.__writer.drain()
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            raise AsyncImapConnectionException(f"command timed out: {arguments[0]}")
+
+    async def __read_response(self) -> list:
+        # intoarce o lista de elemente bytes, respectiv (bytes, literal) pentru fiecare literal primit
+        parts = list()
+        while True:
+            line = await self.__reader.readline()
+            if not line:
+                raise ConnectionError("connection closed by server")
+
+            match = self.LITERAL.search(line)
+            if not match:
+                parts.append(line.rstrip(b"\r\n"))
+                return parts
+
+            literal = await self.__reader.readexactly(int(match.group(1)))
+            parts.append((line.rstrip(b"\r\n"), literal))
+
+    async def __read_responses(self) -> None:
+        try:
+            while True:
+                parts = await self.__read_response()
+                first = parts[0][0] if isinstance(parts[0], tuple) else parts[0]
+
+                if first.startswith(b"+"):
+                    if self.__continuation and not self.__continuation.done():
+                        self.__continuation.set_result(first)
+                elif first.startswith(b"* "):
+                    self.__dispatch_untagged(parts)
+                else:
+                    self.__dispatch_tagged(first)
+        except (ConnectionError, asyncio.IncompleteReadError, OSError) as e:
+            error = AsyncImapConnectionException(f"connection lost: {e}")
+        except asyncio.CancelledError:
+            error = AsyncImapConnectionException("connection closed")
+
+        for _, future, _, _ in self.__pending:
+            if not future.done():
+                future.set_exception(error)
+        self.__pending.clear()
+
+    def __dispatch_untagged(self, parts: list) -> None:
+        # "* 12 FETCH (...)" este memorat ca ("FETCH", [b"12 (...)", ...]), iar "* OK [UIDVALIDITY 3]"
+        # ca ("UIDVALIDITY", [b"3"]), la fel ca in imaplib
+        first = parts[0]
+        head = (first[0] if isinstance(first, tuple) else first)[2:]
+
+        words = head.split(b" ", 2)
+        if words[0].isdigit() and len(words) > 1:
+            name = words[1].decode("utf-8").upper()
+            head = words[0] + (b" " + words[2] if len(words) > 2 else b"")
+        else:
+            name = words[0].decode("utf-8").upper()
+            head = head[len(words[0]) + 1:]
+
+            code = re.match(rb"\[([A-Z-]+) ?([^\]]*)\]", head)
+            if name in ("OK", "NO", "BAD") and code:
+                name, head = code.group(1).decode("utf-8"), code.group(2)
+
+        data = [(head, first[1]) if isinstance(first, tuple) else head] + parts[1:]
+        self.__find_receiver(name, data).append((name, data))
+
+    def __find_receiver(self, name: str, data: list) -> list:
+        if not self.__pending:
+            return self.__unsolicited
+
+        if name == "FETCH":
+            attributes = b" ".join(item[0] if isinstance(item, tuple) else item for item in data)
+            number = re.match(rb"(\d+)", attributes)
+            uid = re.search(rb"UID (\d+)", attributes)
+            for _, _, untagged, messages in self.__pending:
+                if not messages:
+                    continue
+                kind, ranges = messages
+                value = uid if kind == "UID" else number
+                if value and any(first <= int(value.group(1)) <= last for first, last in ranges):
+                    return untagged
+
+        # celelalte raspunsuri apartin comenzii exclusive in curs, daca exista, altfel celei mai vechi comenzi
+        for _, _, untagged, messages in self.__pending:
+            if messages is None:
+                return untagged
+        return self.__pending[0][2]
+
+    def __dispatch_tagged(self, line: bytes) -> None:
+        tag, _, rest = line.decode("utf-8", "replace").partition(" ")
+        status, _, text = rest.partition(" ")
+
+        for i, (pending_tag, future, untagged, _) in enumerate(self.__pending):
+            if pending_tag == tag:
+                del self.__pending[i]
+                # o comanda anulata de apelant este terminata normal de server, iar rezultatul ei ignorat
+                if not future.done():
+                    future.set_result(AsyncImapResponse(status.upper(), text, untagged))
+                return
+
+    def pop_unsolicited(self) -> list:
+        unsolicited, self.__unsolicited = self.__unsolicited, list()
+        return unsolicited
+
+    async def close(self) -> None:
+        if self.__reader_task:
+            self.__reader_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self.__reader_task
+            self.__reader_task = None
+        if self.__writer:
+            self.__writer.close()
+            with contextlib.suppress(Exception):
+                await self.__writer.wait_closed()
+            self.__writer = None
+
+
+class AsyncReadEmailServices:
+    HEADER_FIELDS = ReadEmailServices.HEADER_FIELDS
+    ATTACHMENT_CHUNK_SIZE = ReadEmailServices.ATTACHMENT_CHUNK_SIZE
+
+    def __init__(self, headers_cache: HeadersCache = None, body_cache: BodyCache = None, timeout: float = 30,
+                 search_index: SearchIndex = None):
+        if headers_cache is not None and not isinstance(headers_cache, HeadersCache):
+            raise AsyncReadEmailServicesException(f"wrong arg type: {type(headers_cache)}; {HeadersCache} required")
+        if body_cache is not None and not isinstance(body_cache, BodyCache):
+            raise AsyncReadEmailServicesException(f"wrong arg type: {type(body_cache)}; {BodyCache} required")
+        if search_index is not None and not isinstance(search_index, SearchIndex):
+            raise AsyncReadEmailServicesException(f"wrong arg type: {type(search_index)}; {SearchIndex} required")
+
+        self.__connection = None
+        self.__timeout = timeout
+        self.__show_details = True
+        self.__headers_cache = headers_cache
+        self.__body_cache = body_cache
+        self.__search_index = search_index
+        self.__account = str()
+        self.__mailbox = str()  # mailbox-ul selectat pe conexiune
+        self.__uidvalidity = 0
+        self.__uidvalidities = dict()
+        self.__mailbox_states = dict()
+        self.__mailbox_users = 0  # operatiile in curs pe mailbox-ul selectat
+        self.__mailbox_condition = None
+
+    def show_details(self, show_details: bool) -> None:
+        if not isinstance(show_details, bool):
+            raise AsyncReadEmailServicesException(f"wrong arg type: {type(show_details)}; {bool} required")
+
+        self.__show_details = show_details
+
+    def __output(self, output: typing.Any) -> None:
+        if self.__show_details:
+            print(output)
+
+    async def connect_to_server(self, address: str, port: int = 993) -> bool:
+        if not isinstance(address, str) or not isinstance(port, int):
+            raise AsyncReadEmailServicesException(
+                f"wrong arg type: {type(address)}, {type(port)}; (str, int) required"
+            )
+
+        try:
+            self.__connection = AsyncImapConnection(self.__timeout)
+            await self.__connection.connect(address, port)
+            self.__mailbox_condition = asyncio.Condition()
+            self.__output(f"[+] connected successfully to '{address}'")
+            return True
+        except Exception:
+            self.__connection = None
+            self.__output(colored(f"[-] connection to '{address}' failed", "red"))
+            return False
+
+    def is_connected(self) -> bool:
+        return self.__connection is not None and self.__connection.is_connected()
+
+    def has_capability(self, capability: str) -> bool:
+        return self.__connection is not None and capability.upper() in self.__connection.capabilities
+
+    async def login_to_server(self, username: str, password: str) -> bool:
+        if not isinstance(username, str) or not isinstance(password, str):
+            raise AsyncReadEmailServicesException(
+                f"wrong arg type: {type(username)}, {type(password)}; (str, str) required"
+            )
+
+        try:
+            response = await self.__connection.command("LOGIN", AsyncImapConnection.quote(username),
+                                                       AsyncImapConnection.quote(password))
+            self.__output(f"[+] login result: status: {response.status}, server response: {response.text}")
+            if response.status != "OK":
+                return False
+
+            # unele servere anunta extensiile abia dupa autentificare
+            await self.__connection.refresh_capabilities()
+        except Exception:
+            self.__output(colored("[-] login failed", "red"))
+            return False
+
+        self.__account = username
+        return True
+
+    async def __command(self, *arguments: str, literal: bytes = None) -> AsyncImapResponse:
+        if self.__connection is None:
+            raise AsyncReadEmailServicesException("not connected")
+
+        response = await self.__connection.command(*arguments, literal=literal)
+        if response.status != "OK":
+            raise AsyncReadEmailServicesException(f"{arguments[0]} failed: {response.text}")
+        return response
+
+    async def get_mailboxes(self) -> list:
+        try:
+            response = await self.__command("LIST", '""', '"*"')
+        except Exception:
+            self.__output(colored("mailbox listing failed", "red"))
+            return []
+
+        mailboxes = list()
+        for mailbox in response.get("LIST"):
+            if isinstance(mailbox, tuple):
+                mailbox = mailbox[0] + b'"' + mailbox[1] + b'"'
+            names = re.findall('(?:")(.+?)(?:")', mailbox.decode("utf-8"))
+            if names:
+                mailboxes.append(names[-1])
+        return mailboxes
+
+    async def __select(self, mailbox: str) -> int:
+        self.__mailbox = str()
+        response = await self.__command("SELECT", AsyncImapConnection.quote(mailbox))
+        self.__output(f"[+] mailbox selecting result: status {response.status}, server response: {response.text}")
+
+        uidvalidity = response.get("UIDVALIDITY")
+        exists = response.get("EXISTS")
+        self.__mailbox = mailbox
+        self.__uidvalidity = int(uidvalidity[-1]) if uidvalidity else 0
+
+        if self.__uidvalidities.get(mailbox) != self.__uidvalidity:
+            self.__uidvalidities[mailbox] = self.__uidvalidity
+            if self.__headers_cache and self.__uidvalidity:
+                self.__headers_cache.set_uidvalidity(self.__account, mailbox, self.__uidvalidity)
+            if self.__search_index and self.__uidvalidity:
+                self.__search_index.purge(self.__account, mailbox, self.__uidvalidity)
+
+        return int(exists[-1]) if exists else 0
+
+    @contextlib.asynccontextmanager
+    async def __using_mailbox(self, mailbox: str = None):
+        # operatiile pe mailbox-ul selectat ruleaza concurent pe aceeasi conexiune; schimbarea
+        # mailbox-ului asteapta terminarea lor, deoarece raspunsurile depind de mailbox-ul selectat
+        if self.__connection is None:
+            raise AsyncReadEmailServicesException("not connected")
+
+        mailbox = mailbox or self.__mailbox
+        async with self.__mailbox_condition:
+            while mailbox != self.__mailbox and self.__mailbox_users:
+                await self.__mailbox_condition.wait()
+            if mailbox != self.__mailbox:
+                await self.__select(mailbox)
+            self.__mailbox_users += 1
+
+        try:
+            yield mailbox
+        finally:
+            async with self.__mailbox_condition:
+                self.__mailbox_users -= 1
+                self.__mailbox_condition.notify_all()
+
+    async def select_mailbox(self, mailbox: str = "INBOX") -> int:
+        if not isinstance(mailbox, str):
+            raise AsyncReadEmailServicesException(f"wrong arg type: {type(mailbox)}; str required")
+
+        try:
+            async with self.__mailbox_condition:
+                while self.__mailbox_users:
+                    await self.__mailbox_condition.wait()
+                return await self.__select(mailbox)
+        except Exception:
+            self.__output(colored(f"[-] mailbox selecting failed: {mailbox}", "red"))
+            return 0
+
+    async def get_mailbox_uids(self, mailbox: str = "INBOX") -> list:
+        try:
+            async with self.__using_mailbox(mailbox):
+                response = await self.__command("UID", "SEARCH", "ALL")
+        except Exception:
+            self.__output(colored(f"[-] UID listing failed: {mailbox}", "red"))
+            return []
+
+        return sorted((int(uid) for data in response.get("SEARCH") for uid in data.split()), reverse=True)
+
+    async def get_email_headers_by_uid(self, uids: list, mailbox: str = None) -> dict:
+        if not isinstance(uids, list):
+            raise AsyncReadEmailServicesException(f"wrong arg type: {type(uids)}; list required")
+
+        headers = dict()
+        if not uids:
+            return headers
+
+        raw_headers = dict()
+        fetched_headers = dict()
+        try:
+            async with self.__using_mailbox(mailbox) as mailbox:
+                uidvalidity = self.__uidvalidity
+                if self.__headers_cache and uidvalidity:
+                    raw_headers = self.__headers_cache.get_headers(self.__account, mailbox, uidvalidity, uids)
+
+                missing_uids = [uid for uid in uids if uid not in raw_headers]
+                if missing_uids:
+                    response = await self.__command("UID", "FETCH", ReadEmailServices.compress_uid_set(missing_uids),
+                                                    f"({self.HEADER_FIELDS})")
+                    for _, uid, flags, size, raw in ReadEmailServices.parse_fetch_attributes(response.get("FETCH")):
+                        if uid:
+                            fetched_headers[uid] = (raw, flags, size)
+        except Exception:
+            self.__output(colored(f"[-] headers fetching failed: {ReadEmailServices.compress_uid_set(uids)}", "red"))
+            return headers
+
+        if self.__headers_cache and uidvalidity:
+            self.__headers_cache.store_headers(self.__account, mailbox, uidvalidity, fetched_headers)
+        self.__output(f"[+] headers loaded: {len(raw_headers)} from cache, {len(fetched_headers)} from server")
+        raw_headers.update(fetched_headers)
+
+        for uid, (raw, flags, size) in raw_headers.items():
+            headers[uid] = ReadEmailServices.build_email_headers(raw, uid, flags, size)
+        return headers
+
+    async def get_email_headers_range(self, start: int, stop: int) -> dict:
+        if not isinstance(start, int) or not isinstance(stop, int):
+            raise AsyncReadEmailServicesException(
+                f"wrong arg types: {type(start)}, {type(stop)}; (int, int) required"
+            )
+
+        headers = dict()
+        if start <= 0 or stop <= 0:
+            return headers
+
+        try:
+            async with self.__using_mailbox():
+                response = await self.__command("FETCH", f"{start}:{stop}", f"({self.HEADER_FIELDS})")
+        except Exception:
+            self.__output(colored(f"[-] headers fetching failed: {start}:{stop}", "red"))
+            return headers
+
+        for index, uid, flags, size, raw in ReadEmailServices.parse_fetch_attributes(response.get("FETCH")):
+            headers[index] = ReadEmailServices.build_email_headers(raw, uid, flags, size)
+        return headers
+
+    async def get_email_headers(self, index: int = 1) -> EmailHeaders:
+        if not isinstance(index, int):
+            raise AsyncReadEmailServicesException(f"wrong arg type: {type(index)}; int required")
+
+        return (await self.get_email_headers_range(index, index)).get(index, EmailHeaders())
+
+    async def get_emails_headers(self, count: int = 1) -> list:
+        if not isinstance(count, int):
+            raise AsyncReadEmailServicesException(f"wrong arg type: {type(count)}; int required")
+
+        if count <= 0:
+            return list()
+
+        headers = await self.get_email_headers_range(1, count)
+        return [headers.get(index, EmailHeaders()) for index in range(1, count + 1)]
+
+    async def __fetch_displayable_body(self, message_id: int, uid: bool = True, prefer: str = "html") -> tuple:
+        prefix = ("UID", "FETCH") if uid else ("FETCH",)
+        response = await self.__command(*prefix, str(message_id), "(BODYSTRUCTURE)")
+
+        try:
+            parts = BodyStructureParser.parse_fetch_response(response.get("FETCH"))
+        except BodyStructureParserException:
+            parts = None
+
+        if parts is None:
+            response = await self.__command(*prefix, str(message_id), "(BODY.PEEK[TEXT])")
+            literals = [item[1] for item in response.get("FETCH") if isinstance(item, tuple)]
+            return (literals[0].decode("utf-8", "replace") if literals else ""), "plain"
+
+        part = BodyStructureParser.get_displayable_part(parts, prefer)
+        if part is None:
+            return "", "plain"
+
+        response = await self.__command(*prefix, str(message_id), f"(BODY.PEEK[{part.section}])")
+        literals = [item[1] for item in response.get("FETCH") if isinstance(item, tuple)]
+        payload = part.decode_payload(literals[0]) if literals else b""
+        return part.decode_text(payload), part.subtype
+
+    async def get_body(self, index: int = 1) -> str:
+        if not isinstance(index, int):
+            raise AsyncReadEmailServicesException(f"wrong arg type: {type(index)}; int required")
+
+        try:
+            async with self.__using_mailbox():
+                return (await self.__fetch_displayable_body(index, uid=False))[0]
+        except Exception:
+            self.__output(colored("[-] body fetching failed", "red"))
+            return ""
+
+    async def get_displayable_body(self, uid: int, mailbox: str = None, prefer: str = "html") -> tuple:
+        if not isinstance(uid, int):
+            raise AsyncReadEmailServicesException(f"wrong arg type: {type(uid)}; int required")
+        if prefer not in ("html", "plain"):
+            raise AsyncReadEmailServicesException(f"wrong arg: {prefer}; 'html' or 'plain' required")
+
+        # cheia din cache include UIDVALIDITY; cat timp aceasta nu este cunoscuta, cache-ul nu este folosit
+        mailbox = mailbox or self.__mailbox
+        uidvalidity = self.__uidvalidities.get(mailbox, 0)
+        if self.__body_cache and uidvalidity:
+            body = self.__body_cache.get(BodyCache.make_key(mailbox, uidvalidity, uid, prefer))
+            if body:
+                return body
+
+        try:
+            async with self.__using_mailbox(mailbox) as mailbox:
+                body = await self.__fetch_displayable_body(uid, prefer=prefer)
+                uidvalidity = self.__uidvalidity
+        except Exception:
+            self.__output(colored("[-] body fetching failed", "red"))
+            return "", "plain"
+
+        if self.__body_cache and uidvalidity:
+            self.__body_cache.put(BodyCache.make_key(mailbox, uidvalidity, uid, prefer), *body)
+        return body
+
+    async def get_displayable_bodies(self, uids: list, mailbox: str = None, prefer: str = "html") -> dict:
+        # comenzile pentru toate mesajele sunt trimise fara a astepta raspunsurile precedente
+        if not isinstance(uids, list):
+            raise AsyncReadEmailServicesException(f"wrong arg type: {type(uids)}; list required")
+
+        bodies = await asyncio.gather(*(self.get_displayable_body(uid, mailbox, prefer) for uid in uids))
+        return dict(zip(uids, bodies))
+
+    async def get_body_by_uid(self, uid: int, mailbox: str = None, prefer: str = "html") -> str:
+        return (await self.get_displayable_body(uid, mailbox, prefer))[0]
+
+    async def resync_mailbox(self, mailbox: str = "INBOX") -> MailboxChanges:
+        # fara CONDSTORE, modificarile sunt aflate comparand lista de UID-uri cu cea de la sincronizarea
+        # anterioara; schimbarile de FLAGS nu sunt raportate
+        if not isinstance(mailbox, str):
+            raise AsyncReadEmailServicesException(f"wrong arg type: {type(mailbox)}; str required")
+
+        try:
+            async with self.__using_mailbox(mailbox):
+                response = await self.__command("UID", "SEARCH", "ALL")
+                uidvalidity = self.__uidvalidity
+        except Exception:
+            self.__output(colored(f"[-] mailbox resync failed: {mailbox}", "red"))
+            state = self.__mailbox_states.get(mailbox)
+            return MailboxChanges(len(state.uids) if state else 0)
+
+        uids = {int(uid) for data in response.get("SEARCH") for uid in data.split()}
+        state = self.__mailbox_states.get(mailbox)
+        changes = MailboxChanges(len(uids))
+        if not state or state.uidvalidity != uidvalidity:
+            state = MailboxState(uidvalidity)
+            changes.full = True
+            changes.new_uids = sorted(uids)
+        else:
+            changes.new_uids = sorted(uids - state.uids)
+            changes.expunged_uids = sorted(state.uids - uids)
+
+        state.uids = uids
+        state.uidnext = max(uids) + 1 if uids else 0
+        self.__mailbox_states[mailbox] = state
+        self.__forget_messages(mailbox, uidvalidity, changes.expunged_uids)
+
+        self.__output(f"[+] mailbox resync result: {len(changes.new_uids)} new, "
+                      f"{len(changes.expunged_uids)} expunged")
+        return changes
+
+    async def search(self, mailbox: str = None, from_address: str = None, subject: str = None, text: str = None,
+                     since: datetime.date = None, before: datetime.date = None, flags: list = None,
+                     sort: str = "DATE") -> list:
+        for value in (mailbox, from_address, subject, text, sort):
+            if value is not None and not isinstance(value, str):
+                raise AsyncReadEmailServicesException(f"wrong arg type: {type(value)}; str required")
+        for value in (since, before):
+            if value is not None and not isinstance(value, datetime.date):
+                raise AsyncReadEmailServicesException(f"wrong arg type: {type(value)}; {datetime.date} required")
+        if sort is not None and sort.upper() not in ReadEmailServices.SORT_CRITERIA:
+            raise AsyncReadEmailServicesException(
+                f"wrong sort criterion: {sort}; one of {ReadEmailServices.SORT_CRITERIA} required"
+            )
+
+        try:
+            criteria, charset, literal = ReadEmailServices.make_search_criteria(from_address, subject, text,
+                                                                                since, before, flags)
+        except ReadEmailServicesException as e:
+            raise AsyncReadEmailServicesException(str(e))
+
+        try:
+            async with self.__using_mailbox(mailbox):
+                if sort and self.has_capability("SORT"):
+                    response = await self.__command("UID", "SORT", f"(REVERSE {sort.upper()})", charset or "UTF-8",
+                                                    *criteria, literal=literal)
+                    uids = [int(uid) for data in response.get("SORT") for uid in data.split()]
+                else:
+                    arguments = ["CHARSET", charset] if charset else []
+                    response = await self.__command("UID", "SEARCH", *arguments, *criteria, literal=literal)
+                    uids = sorted((int(uid) for data in response.get("SEARCH") for uid in data.split()),
+                                  reverse=True)
+        except Exception:
+            self.__output(colored(f"[-] search failed: {' '.join(criteria)}", "red"))
+            return []
+
+        self.__output(f"[+] search result: {len(uids)} messages match {' '.join(criteria)}")
+        return uids
+
+    async def search_local(self, text: str, mailbox: str = None, limit: int = 500) -> list:
+        # indexul local nu foloseste conexiunea IMAP; interogarea SQLite este scurta si ruleaza direct in bucla
+        if not isinstance(text, str):
+            raise AsyncReadEmailServicesException(f"wrong arg type: {type(text)}; str required")
+        if not self.__search_index:
+            raise AsyncReadEmailServicesException("no search index configured")
+
+        try:
+            results = self.__search_index.search(text, self.__account, mailbox, limit)
+        except SearchIndexException:
+            self.__output(colored(f"[-] local search failed: {text}", "red"))
+            return []
+
+        self.__output(f"[+] local search result: {len(results)} messages match {text}")
+        return results
+
+    def has_search_index(self) -> bool:
+        return self.__search_index is not None
+
+    async def get_attachments(self, uid: int, mailbox: str = None) -> list:
+        if not isinstance(uid, int):
+            raise AsyncReadEmailServicesException(f"wrong arg type: {type(uid)}; int required")
+
+        try:
+            async with self.__using_mailbox(mailbox):
+                response = await self.__command("UID", "FETCH", str(uid), "(BODYSTRUCTURE)")
+            parts = BodyStructureParser.parse_fetch_response(response.get("FETCH")) or []
+        except Exception:
+            self.__output(colored("[-] attachments listing failed", "red"))
+            return []
+
+        return [part for part in parts if part.is_attachment()]
+
+    async def save_attachment(self, uid: int, part: BodyPart, path: str, mailbox: str = None,
+                              progress: typing.Callable[[int, int], None] = None) -> bool:
+        # la fel ca in varianta sincrona, atasamentul este cerut pe bucati si decodificat incremental
+        if not isinstance(uid, int) or not isinstance(part, BodyPart):
+            raise AsyncReadEmailServicesException(
+                f"wrong arg type: {type(uid)}, {type(part)}; (int, BodyPart) required"
+            )
+        if not isinstance(path, str):
+            raise AsyncReadEmailServicesException(f"wrong arg type: {type(path)}; str required")
+        if progress is not None and not callable(progress):
+            raise AsyncReadEmailServicesException(f"wrong arg type: {type(progress)}; callable required")
+
+        temporary_path = path + ".part"
+        decoder = PayloadDecoder(part.encoding)
+        received = 0
+        try:
+            async with self.__using_mailbox(mailbox):
+                with open(temporary_path, "wb") as file:
+                    while True:
+                        response = await self.__command(
+                            "UID", "FETCH", str(uid),
+                            f"(BODY.PEEK[{part.section}]<{received}.{self.ATTACHMENT_CHUNK_SIZE}>)"
+                        )
+                        # dupa sfarsitul partii, serverul intoarce un sir vid in locul unui literal
+                        literals = [item[1] for item in response.get("FETCH") if isinstance(item, tuple)]
+                        chunk = literals[0] if literals else b""
+                        file.write(decoder.decode(chunk))
+                        received += len(chunk)
+                        if progress:
+                            progress(received, max(part.size, received))
+                        if len(chunk) < self.ATTACHMENT_CHUNK_SIZE:
+                            break
+                    file.write(decoder.flush())
+            os.replace(temporary_path, path)
+        except Exception:
+            with contextlib.suppress(OSError):
+                os.remove(temporary_path)
+            self.__output(colored(f"[-] attachment saving failed: {part.filename}", "red"))
+            return False
+
+        self.__output(f"[+] attachment saved: {path} ({received} bytes fetched)")
+        return True
+
+    async def set_flags(self, uids: list, flags: list, mailbox: str = None, add: bool = True) -> bool:
+        if not isinstance(uids, list) or not isinstance(flags, list):
+            raise AsyncReadEmailServicesException(
+                f"wrong arg types: {type(uids)}, {type(flags)}; (list, list) required"
+            )
+        if not uids or not flags:
+            return True
+
+        try:
+            async with self.__using_mailbox(mailbox) as mailbox:
+                response = await self.__uid_command("STORE", uids, ("+" if add else "-") + "FLAGS",
+                                                    "(" + " ".join(flags) + ")")
+                uidvalidity = self.__uidvalidity
+        except Exception:
+            self.__output(colored(f"[-] flags updating failed for {len(uids)} messages", "red"))
+            return False
+
+        changed_flags = dict()
+        for item in response:
+            if isinstance(item, tuple):
+                item = item[0]
+            uid = re.search(rb"UID (\d+)", item)
+            uid_flags = re.search(rb"FLAGS \(([^)]*)\)", item)
+            if uid and uid_flags:
+                changed_flags[int(uid.group(1))] = uid_flags.group(1).decode("utf-8").split()
+
+        if self.__headers_cache and uidvalidity and changed_flags:
+            self.__headers_cache.update_flags(self.__account, mailbox, uidvalidity, changed_flags)
+        self.__output(f"[+] flags {' '.join(flags)} {'added to' if add else 'removed from'} {len(uids)} messages")
+        return True
+
+    async def move_messages(self, uids: list, target: str, mailbox: str = None) -> bool:
+        if not isinstance(uids, list) or not isinstance(target, str):
+            raise AsyncReadEmailServicesException(
+                f"wrong arg types: {type(uids)}, {type(target)}; (list, str) required"
+            )
+        if not uids:
+            return True
+
+        try:
+            async with self.__using_mailbox(mailbox) as mailbox:
+                if self.has_capability("MOVE"):
+                    await self.__uid_command("MOVE", uids, AsyncImapConnection.quote(target))
+                else:
+                    await self.__uid_command("COPY", uids, AsyncImapConnection.quote(target))
+                    await self.__expunge(uids)
+                self.__forget_messages(mailbox, self.__uidvalidity, uids)
+        except Exception:
+            self.__output(colored(f"[-] moving {len(uids)} messages to '{target}' failed", "red"))
+            return False
+
+        self.__output(f"[+] {len(uids)} messages moved from '{mailbox}' to '{target}'")
+        return True
+
+    async def delete_messages(self, uids: list, mailbox: str = None) -> bool:
+        if not isinstance(uids, list):
+            raise AsyncReadEmailServicesException(f"wrong arg type: {type(uids)}; list required")
+        if not uids:
+            return True
+
+        try:
+            async with self.__using_mailbox(mailbox) as mailbox:
+                await self.__expunge(uids)
+                self.__forget_messages(mailbox, self.__uidvalidity, uids)
+        except Exception:
+            self.__output(colored(f"[-] deleting {len(uids)} messages failed", "red"))
+            return False
+
+        self.__output(f"[+] {len(uids)} messages deleted from '{mailbox}'")
+        return True
+
+    async def __uid_command(self, command: str, uids: list, *arguments: str) -> list:
+        # setul de UID-uri este impartit la fel ca in varianta sincrona, sub limita de lungime a comenzilor
+        data = list()
+        for uid_set in ReadEmailServices.make_uid_sets(uids):
+            response = await self.__command("UID", command, uid_set, *arguments)
+            data.extend(response.get("FETCH"))
+        return data
+
+    async def __expunge(self, uids: list) -> None:
+        await self.__uid_command("STORE", uids, "+FLAGS.SILENT", "(\\Deleted)")
+        if self.has_capability("UIDPLUS"):
+            await self.__uid_command("EXPUNGE", uids)
+        else:
+            # fara UIDPLUS, EXPUNGE elimina si alte mesaje marcate anterior ca sterse
+            await self.__command("EXPUNGE")
+
+    def __forget_messages(self, mailbox: str, uidvalidity: int, uids: list) -> None:
+        if not uids:
+            return
+
+        state = self.__mailbox_states.get(mailbox)
+        if state and state.uidvalidity == uidvalidity:
+            state.uids.difference_update(uids)
+        if self.__headers_cache and uidvalidity:
+            self.__headers_cache.remove_headers(self.__account, mailbox, uidvalidity, uids)
+        if self.__search_index and uidvalidity:
+            self.__search_index.remove(self.__account, mailbox, uidvalidity, uids)
+
+    async def logout(self) -> bool:
+        try:
+            self.__mailbox_states.clear()
+            if self.__body_cache:
+                self.__body_cache.clear()
+            if self.__connection:
+                with contextlib.suppress(Exception):
+                    await self.__connection.command("LOGOUT")
+                await self.__connection.close()
+                self.__connection = None
+            self.__mailbox = str()
+            self.__uidvalidities.clear()
+            self.__output("[+] IMAP logout succeeded")
+            return True
+        except Exception:
+            self.__output(colored("[-] IMAP logout failed", "red"))
+            return False
+
+
+class AsyncSendEmailServices:
+    def __init__(self, timeout: float = 30):
+        self.__reader = None
+        self.__writer = None
+        self.__timeout = timeout
+        self.__extensions = dict()  # extensiile ESMTP anuntate in raspunsul EHLO
+        self.__show_details = True
+        self.__is_connected = False
+        self.__lock = None  # o singura tranzactie SMTP poate fi in desfasurare pe conexiune
+
+    def show_details(self, show_details: bool) -> None:
+        self.__show_details = show_details
+
+    def __output(self, output: typing.Any) -> None:
+        if self.__show_details:
+            print(output)
+
+    create_email_message = staticmethod(SendEmailServices.create_email_message)
+
+    async def __read_reply(self) -> tuple:
+        # un raspuns SMTP poate avea mai multe linii, de forma "250-..." urmate de "250 ..."
+        lines = list()
+        while True:
+            line = await asyncio.wait_for(self.__reader.readline(), self.__timeout)
+            if len(line) < 4:
+                raise AsyncSendEmailServicesException(f"unexpected reply: {line}")
+
+            lines.append(line[4:].rstrip(b"\r\n").decode("utf-8", "replace"))
+            if line[3:4] != b"-":
+                return int(line[:3]), "\n".join(lines)
+
+    async def __command(self, line: str, expected: tuple = (250,)) -> tuple:
+        self.__writer.write(line.encode("utf-8") + b"\r\n")
+        await self.__writer.drain()
+
+        code, message = await self.__read_reply()
+        if code not in expected:
+            raise AsyncSendEmailServicesException(f"{line.split()[0]} failed: {code} {message}")
+        return code, message
+
+    async def connect_to_server(self, address: str, port: int = 465) -> bool:
+        if not isinstance(address, str) or not isinstance(port, int):
+            raise AsyncSendEmailServicesException(
+                f"wrong arg types: ({type(address)}, {type(port)}); (str, int) required"
+            )
+
+        try:
+            self.__reader, self.__writer = await asyncio.wait_for(
+                asyncio.open_connection(address, port, ssl=ssl.create_default_context()), self.__timeout
+            )
+            code, message = await self.__read_reply()
+            self.__output(f"[+] connected successfully to '{address}'")
+            self.__output(f"[+] connection result: code: {code}, server response: {message}")
+            if code != 220:
+                return False
+
+            _, message = await self.__command(f"EHLO {socket.getfqdn()}")
+            self.__extensions = dict()
+            for extension in message.split("\n")[1:]:
+                name, _, parameters = extension.partition(" ")
+                self.__extensions[name.upper()] = parameters
+
+            self.__lock = asyncio.Lock()
+            self.__is_connected = True
+            return True
+        except Exception:
+            self.__output(colored(f"[-] connection to '{address}' failed", "red"))
+            return False
+
+    def is_connected(self) -> bool:
+        return self.__is_connected
+
+    async def login_to_server(self, username: str, password: str) -> bool:
+        if not isinstance(username, str) or not isinstance(password, str):
+            raise AsyncSendEmailServicesException(
+                f"wrong arg types: ({type(username)}, {type(password)}); (str, str) required"
+            )
+
+        try:
+            mechanisms = self.__extensions.get("AUTH", "").upper().split()
+            if "PLAIN" in mechanisms or "LOGIN" not in mechanisms:
+                credentials = base64.b64encode(f"\0{username}\0{password}".encode("utf-8")).decode("ascii")
+                code, message = await self.__command(f"AUTH PLAIN {credentials}", (235,))
+            else:
+                await self.__command("AUTH LOGIN", (334,))
+                await self.__command(base64.b64encode(username.encode("utf-8")).decode("ascii"), (334,))
+                code, message = await self.__command(base64.b64encode(password.encode("utf-8")).decode("ascii"),
+                                                     (235,))
+
+            self.__output(f"[+] login result: code: {code}, server response: {message}")
+            return True
+        except Exception:
+            self.__output(colored("[-] login failed", "red"))
+            return False
+
+    async def send_email(self, email_message: typing.Union[MIMEText, MIMEMultipart]) -> bool:
+        if not isinstance(email_message, (MIMEText, MIMEMultipart)):
+            raise AsyncSendEmailServicesException(
+                f"wrong arg type: {type(email_message)}; {MIMEText} or {MIMEMultipart} required"
+            )
+
+        # destinatarii sunt stabiliti la fel ca in varianta sincrona, iar Bcc nu este transmis
+        sender, recipients, message = SendEmailServices.make_envelope(email_message)
+        if not self.__is_connected:
+            self.__output(colored("[-] error sending email: not connected", "red"))
+            return False
+
+        try:
+            async with self.__lock:
+                # o trimitere anterioara, asteptata pe acelasi lock, poate sa fi inchis conexiunea
+                if not self.__is_connected:
+                    raise AsyncSendEmailServicesException("not connected")
+
+                await self.__send_envelope(sender, recipients)
+                try:
+                    await self.__send_data(SendEmailServices.iter_message_bytes(message))
+                    code, reply = await self.__read_reply()
+                except BaseException:
+                    # dupa raspunsul 354 serverul este in modul DATA; un mesaj intrerupt (de exemplu un atasament
+                    # sters sau o anulare) nu poate fi incheiat corect, deci conexiunea este inchisa
+                    self.__close_connection()
+                    raise
+                if code != 250:
+                    raise AsyncSendEmailServicesException(f"DATA failed: {code} {reply}")
+
+            self.__output("[+] email sent successfully")
+            return True
+        except Exception:
+            self.__output(colored("[-] error sending email", "red"))
+            return False
+
+    def __close_connection(self) -> None:
+        self.__is_connected = False
+        if self.__writer:
+            self.__writer.close()
+            self.__writer = None
+
+    async def __send_data(self, chunks: typing.Iterable[bytes]) -> None:
+        # atasamentele sunt codificate si scrise pe bucati; punctele de la inceputul liniilor sunt dublate
+        # (RFC 5321), inclusiv la granita dintre bucati
+        at_line_start, ending = True, b""
+        for chunk in chunks:
+            if not chunk:
+                continue
+            data = re.sub(rb"(?m)^\.", b"..", chunk)
+            if not at_line_start and chunk.startswith(b"."):
+                data = data[1:]
+            self.__writer.write(data)
+            await self.__writer.drain()
+            at_line_start = chunk.endswith(b"\n")
+            ending = (ending + chunk)[-2:]
+
+        self.__writer.write((b"" if ending == b"\r\n" else b"\r\n") + b".\r\n")
+        await self.__writer.drain()
+
+    async def __send_envelope(self, sender: str, recipients: list) -> None:
+        commands = [(f"MAIL FROM:<{sender}>", (250,))]
+        commands += [(f"RCPT TO:<{recipient}>", (250, 251)) for recipient in recipients]
+        commands += [("DATA", (354,))]
+
+        if "PIPELINING" not in self.__extensions:
+            try:
+                for line, expected in commands:
+                    await self.__command(line, expected)
+            except AsyncSendEmailServicesException:
+                # tranzactia inceputa este abandonata, altfel urmatorul MAIL ar fi respins
+                with contextlib.suppress(Exception):
+                    await self.__command("RSET")
+                raise
+            return
+
+        # cu PIPELINING (RFC 2920) intregul plic este trimis deodata, iar raspunsurile sunt citite in ordine
+        self.__writer.write(b"".join(line.encode("utf-8") + b"\r\n" for line, _ in commands))
+        await self.__writer.drain()
+
+        errors = list()
+        for line, expected in commands:
+            code, message = await self.__read_reply()
+            if code not in expected:
+                errors.append(f"{line.split(':')[0]}: {code} {message}")
+        if errors:
+            if not errors[-1].startswith("DATA"):
+                # serverul a acceptat DATA desi un destinatar a fost respins; tranzactia este abandonata
+                self.__writer.write(b".\r\n")
+                await self.__writer.drain()
+                await self.__read_reply()
+            await self.__command("RSET")
+            raise AsyncSendEmailServicesException("; ".join(errors))
+
+    async def logout(self) -> bool:
+        try:
+            if self.__writer:
+                with contextlib.suppress(Exception):
+                    await self.__command("QUIT", (221,))
+                self.__writer.close()
+                self.__writer = None
+            self.__output("[+] SMTP logout succeeded")
+            self.__is_connected = False
+            return True
+        except Exception:
+            self.__output(colored("[-] SMTP logout failed", "red"))
+            return False
+
+
+class AsyncServicesRunner:
+    # ruleaza o bucla asyncio intr-un singur fir de executie; interfata grafica trimite corutine
+    # si primeste rezultatele prin functia dispatch (ex. UpdateQueue.put), deci in firul principal Tk
+    def __init__(self, dispatch: typing.Callable = None):
+        if dispatch is not None and not callable(dispatch):
+            raise AsyncServicesRunnerException(f"wrong arg type: {type(dispatch)}; callable required")
+
+        self.__dispatch = dispatch or (lambda function, *args: function(*args))
+        self.__loop = None
+        self.__thread = None
+
+    def start(self) -> None:
+        if self.is_running():
+            return
+
+        self.__loop = asyncio.new_event_loop()
+        self.__thread = threading.Thread(target=self.__loop.run_forever, daemon=True)
+        self.__thread.start()
+
+    def is_running(self) -> bool:
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def submit(self, coroutine: typing.Coroutine, callback: typing.Callable = None,
+               error_callback: typing.Callable = None) -> concurrent.futures.Future:
+        # rezultatul poate fi anulat prin future.cancel(), care anuleaza si corutina din bucla asyncio
+        if not self.is_running():
+            raise AsyncServicesRunnerException("runner not started")
+
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.__loop)
+
+        def done(completed: concurrent.futures.Future):
+            if completed.cancelled():
+                return
+            if completed.exception() is not None:
+                if error_callback:
+                    self.__dispatch(error_callback, completed.exception())
+                return
+            if callback:
+                self.__dispatch(callback, completed.result())
+
+        future.add_done_callback(done)
+        return future
+
+    def stop(self) -> None:
+        if not self.is_running():
+            return
+
+        self.__loop.call_soon_threadsafe(self.__loop.stop)
+        self.__thread.join(5)
+        self.__loop.close()
+        self.__loop = None
+        self.__thread = None
+
+
+class AsyncImapConnectionException(Exception):
+    def __init__(self, e):
+        super().__init__(e)
+
+
+class AsyncReadEmailServicesException(Exception):
+    def __init__(self, e):
+        super().__init__(e)
+
+
+class AsyncSendEmailServicesException(Exception):
+    def __init__(self, e):
+        super().__init__(e)
+
+
+class AsyncServicesRunnerException(Exception):
+    def __init__(self, e):
+        super().__init__(e)
@@ -2,11 +2,37 @@
 
 import smtplib
 from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from email.mime.base import MIMEBase
+from email.header import decode_header, make_header
 from termcolor import colored
 from mailparser import parse_from_bytes
 import typing
 import imaplib
+import contextlib
+import base64
+import quopri
+import datetime
+import html
 import re
+import sys
+import select
+import threading
+import time
+import concurrent.futures
+import copy
+import string
+import email.utils
+import mimetypes
+import uuid
+import os
+
+from email_storage import HeadersCache
+from email_storage import BodyCache
+from email_storage import SearchIndex
+from email_storage import SearchIndexException
+from email_storage import Outbox
+from email_storage import OutboxException
 
 
 """
@@ -15,10 +41,23 @@ import re
 
 
 class SendEmailServices:
+    KEEPALIVE_INTERVAL = 120
+    DATA_CHUNK_SIZE = 64 * 1024
+    NOOP_AFTER = 30  # dupa atatea secunde fara activitate, sesiunea este verificata inainte de trimitere
+
     def __init__(self):
         self.__server = smtplib.SMTP_SSL()
         self.__show_details = True
         self.__is_connected = False
+        self.__address = str()
+        self.__port = int()
+        self.__username = None
+        self.__password = None
+        self.__last_activity = 0.0
+        self.__last_error = (0, str())
+        self.__lock = threading.RLock()
+        self.__keepalive_thread = None
+        self.__stop_event = threading.Event()
 
     def show_details(self, show_details: bool) -> None:
         self.__show_details = show_details
@@ -29,8 +68,13 @@ class SendEmailServices:
 
     @staticmethod
     def create_email_message(_from: str, _to: str, _subject: str, _text: str, _cc: str = "", _bcc: str = "",
-                             _subtype: str = "plain", _charset: str = "us-ascii") -> MIMEText:
+                             _subtype: str = "plain", _charset: str = "us-ascii",
+                             _attachments: list = None) -> typing.Union[MIMEText, MIMEMultipart]:
         email_message = MIMEText(_text, _subtype, _charset)
+        if _attachments:
+            # fisierele atasate nu sunt citite acum, ci abia la trimitere (vezi AttachmentPart)
+            email_message = MIMEMultipart("mixed", None, [email_message] + [AttachmentPart(path)
+                                                                             for path in _attachments])
         email_message["Subject"] = _subject
         email_message["From"] = _from
         email_message["To"] = _to
@@ -38,13 +82,46 @@ class SendEmailServices:
         email_message["Bcc"] = _bcc
         return email_message
 
+    @staticmethod
+    def make_envelope(email_message: typing.Union[MIMEText, MIMEMultipart]) -> tuple:
+        # intoarce (expeditor, destinatari, mesaj), la fel ca smtplib.send_message: destinatarii Bcc
+        # raman doar in plicul SMTP si nu apar in mesajul trimis
+        sender = email.utils.getaddresses([email_message["Sender"] or email_message["From"] or ""])[0][1]
+        recipients = [address for _, address in email.utils.getaddresses(
+            email_message.get_all("To", []) + email_message.get_all("Cc", []) + email_message.get_all("Bcc", []))
+            if address]
+
+        message = copy.copy(email_message)
+        del message["Bcc"]
+        return sender, recipients, message
+
+    @staticmethod
+    def iter_message_bytes(email_message: typing.Union[MIMEText, MIMEMultipart]) -> typing.Iterator[bytes]:
+        # mesajul este serializat cu atasamentele inlocuite de marcaje, deci fara continutul fisierelor;
+        # in locul fiecarui marcaj, fisierul este codificat in base64 bucata cu bucata
+        attachments = {part.placeholder.encode(): part for part in email_message.walk()
+                       if isinstance(part, AttachmentPart)}
+        skeleton = email_message.as_bytes(policy=email_message.policy.clone(linesep="\r\n"))
+        if not attachments:
+            yield skeleton
+            return
+
+        for segment in re.split(b"(" + b"|".join(map(re.escape, attachments)) + b")", skeleton):
+            if segment in attachments:
+                yield from attachments[segment].iter_encoded()
+            elif segment:
+                yield segment
+
     def connect_to_server(self, address: str, port: int = 465) -> bool:
         if not isinstance(address, str) or not isinstance(port, int):
             raise SendEmailServicesException(f"wrong arg types: ({type(address)}, {type(port)}); (str, int) required")
 
+        self.__address = address
+        self.__port = port
+
         try:
-            self.__server = smtplib.SMTP_SSL(address)
-            code, message = self.__server.connect(address, port)
+            with self.__lock:
+                code, message = self.__open()
             ok = 200 <= code < 300
 
             if ok:
@@ -72,7 +149,9 @@ class SendEmailServices:
             )
 
         try:
-            code, message = self.__server.login(username, password)
+            with self.__lock:
+                code, message = self.__server.login(username, password)
+                self.__last_activity = time.monotonic()
             ok = 200 <= code < 300
 
             if ok:
@@ -82,26 +161,287 @@ class SendEmailServices:
 
             self.__output(f"[+] login result: code: {code}, server response: {message.decode()}")
 
+            if ok:
+                # datele de autentificare sunt pastrate pentru reconectarea transparenta
+                self.__username = username
+                self.__password = password
+
             return ok
         except Exception:
             self.__output(colored("[-] login failed", "red"))
             return False
 
-    def send_email(self, email_message: MIMEText) -> bool:
-        if not isinstance(email_message, MIMEText):
-            raise SendEmailServicesException(f"wrong arg type: {type(email_message)}; {MIMEText} required")
+    def __open(self) -> tuple:
+        # o singura conectare: SMTP_SSL(address) s-ar conecta deja o data in constructor
+        self.__server = smtplib.SMTP_SSL(timeout=60)
+        code, message = self.__server.connect(self.__address, self.__port)
+        self.__last_activity = time.monotonic()
+        return code, message
+
+    def __close_quietly(self) -> None:
+        try:
+            self.__server.close()
+        except Exception:
+            pass
+
+    def __is_alive(self) -> bool:
+        try:
+            code, _ = self.__server.noop()
+            self.__last_activity = time.monotonic()
+            return code == 250
+        except Exception:
+            return False
+
+    def __reconnect(self) -> bool:
+        if not self.__address or self.__username is None:
+            return False
 
+        self.__close_quietly()
         try:
-            self.__server.send_message(email_message)
-            self.__output("[+] email sent successfully")
+            self.__open()
+            self.__server.login(self.__username, self.__password)
+            self.__last_activity = time.monotonic()
+        except Exception:
+            self.__close_quietly()
+            self.__is_connected = False
+            self.__output(colored(f"[-] reconnection to '{self.__address}' failed", "red"))
+            return False
+
+        self.__is_connected = True
+        self.__output(f"[+] reconnected to '{self.__address}'")
+        return True
+
+    def __ensure_session(self) -> bool:
+        # o sesiune folosita recent este presupusa valida; altfel NOOP confirma ca serverul nu a inchis-o
+        if self.__is_connected and time.monotonic() - self.__last_activity < self.NOOP_AFTER:
             return True
+        if self.__is_connected and self.__is_alive():
+            return True
+        return self.__reconnect()
+
+    def send_email(self, email_message: typing.Union[MIMEText, MIMEMultipart]) -> bool:
+        if not isinstance(email_message, (MIMEText, MIMEMultipart)):
+            raise SendEmailServicesException(
+                f"wrong arg type: {type(email_message)}; {MIMEText} or {MIMEMultipart} required"
+            )
+
+        sender, recipients, message = self.make_envelope(email_message)
+        return self.__deliver(recipients, lambda: self.__sendmail(sender, recipients, self.iter_message_bytes(message)))
+
+    def send_raw_email(self, from_address: str, recipients: list, raw: typing.Union[bytes, typing.BinaryIO]) -> bool:
+        # trimite un mesaj deja serializat (de exemplu din outbox), catre destinatarii din plicul SMTP;
+        # un fisier deschis este citit pe bucati, fara a fi incarcat complet in memorie
+        if not isinstance(from_address, str) or not (isinstance(raw, bytes) or hasattr(raw, "read")):
+            raise SendEmailServicesException(
+                f"wrong arg types: ({type(from_address)}, {type(raw)}); (str, bytes or binary file) required"
+            )
+
+        def chunks():
+            if isinstance(raw, bytes):
+                yield re.sub(rb"\r\n|\r|\n", b"\r\n", raw)
+                return
+            raw.seek(0)  # la o noua incercare, fisierul este citit din nou de la inceput
+            yield from iter(lambda: raw.read(self.DATA_CHUNK_SIZE), b"")
+
+        recipients = list(recipients)
+        return self.__deliver(recipients, lambda: self.__sendmail(from_address, recipients, chunks()))
+
+    def get_last_error(self) -> tuple:
+        # intoarce (cod SMTP, mesaj) pentru ultima trimitere esuata; codul 0 inseamna o eroare de conexiune
+        return self.__last_error
+
+    def open_session(self) -> typing.Optional["SendEmailServices"]:
+        # deschide o sesiune noua, autentificata cu aceleasi date, pentru trimiteri in paralel
+        if not self.__address or self.__username is None:
+            return None
+
+        session = SendEmailServices()
+        session.show_details(self.__show_details)
+        if session.connect_to_server(self.__address, self.__port) and \
+                session.login_to_server(self.__username, self.__password):
+            return session
+
+        session.logout()
+        return None
+
+    def __sendmail(self, from_address: str, recipients: list, chunks: typing.Iterable[bytes]) -> dict:
+        # la fel ca smtplib.sendmail, dar continutul este scris pe socket pe bucati, pe masura ce este generat
+        server = self.__server
+        server.ehlo_or_helo_if_needed()
+        if server.has_extn("pipelining"):
+            refused = self.__send_envelope_pipelined(from_address, recipients)
+        else:
+            refused = self.__send_envelope(from_address, recipients)
+
+        at_line_start, ending = True, b""
+        try:
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                # punctele de la inceputul liniilor sunt dublate (RFC 5321), inclusiv la granita dintre bucati
+                data = re.sub(rb"(?m)^\.", b"..", chunk)
+                if not at_line_start and chunk.startswith(b"."):
+                    data = data[1:]
+                server.send(data)
+                at_line_start = chunk.endswith(b"\n")
+                ending = (ending + chunk)[-2:]
+
+            server.send((b"" if ending == b"\r\n" else b"\r\n") + b".\r\n")
         except Exception:
-            self.__output(colored("[-] error sending email", "red"))
+            # continutul nu a putut fi generat complet (de exemplu un atasament sters); serverul este inca
+            # in modul DATA, deci sesiunea nu mai poate fi folosita si este redeschisa la urmatoarea trimitere
+            server.close()
+            self.__is_connected = False
+            raise
+
+        code, message = server.getreply()
+        if code != 250:
+            if code == 421:
+                server.close()
+            raise smtplib.SMTPDataError(code, message)
+        return refused
+
+    def __send_envelope(self, from_address: str, recipients: list) -> dict:
+        server = self.__server
+        code, message = server.mail(from_address)
+        if code != 250:
+            if code == 421:
+                server.close()
+            else:
+                server.rset()
+            raise smtplib.SMTPSenderRefused(code, message, from_address)
+
+        refused = dict()
+        for recipient in recipients:
+            code, message = server.rcpt(recipient)
+            if code not in (250, 251):
+                refused[recipient] = (code, message)
+            if code == 421:
+                server.close()
+                raise smtplib.SMTPRecipientsRefused(refused)
+        if len(refused) == len(recipients):
+            server.rset()
+            raise smtplib.SMTPRecipientsRefused(refused)
+
+        server.putcmd("data")
+        code, message = server.getreply()
+        if code != 354:
+            if code == 421:
+                server.close()
+            else:
+                server.rset()
+            raise smtplib.SMTPDataError(code, message)
+        return refused
+
+    def __send_envelope_pipelined(self, from_address: str, recipients: list) -> dict:
+        # smtplib asteapta raspunsul fiecarei comenzi din plic; cu PIPELINING (RFC 2920) MAIL, RCPT si DATA
+        # sunt trimise deodata, iar raspunsurile sunt citite in ordine, deci un singur drum dus-intors
+        server = self.__server
+        commands = [f"MAIL FROM:<{from_address}>"] + [f"RCPT TO:<{recipient}>" for recipient in recipients] + ["DATA"]
+        server.send(b"".join(command.encode("utf-8") + b"\r\n" for command in commands))
+        replies = [server.getreply() for _ in commands]
+
+        (mail_code, mail_message), (data_code, data_message) = replies[0], replies[-1]
+        refused = {recipient: reply for recipient, reply in zip(recipients, replies[1:-1])
+                   if reply[0] not in (250, 251)}
+
+        if mail_code != 250 or len(refused) == len(recipients) or data_code != 354:
+            if data_code == 354:
+                # serverul a acceptat DATA desi tranzactia nu este valida; mesajul gol este abandonat
+                server.send(b".\r\n")
+                server.getreply()
+            if mail_code == 421 or data_code == 421:
+                server.close()
+            else:
+                server.rset()
+
+            if mail_code != 250:
+                raise smtplib.SMTPSenderRefused(mail_code, mail_message, from_address)
+            if len(refused) == len(recipients):
+                raise smtplib.SMTPRecipientsRefused(refused)
+            raise smtplib.SMTPDataError(data_code, data_message)
+        return refused
+
+    def __deliver(self, recipients: list, send: typing.Callable[[], typing.Any]) -> bool:
+        if not recipients:
+            # fara destinatari, serverul ar refuza oricum tranzactia; MAIL FROM nu mai este trimis
+            self.__last_error = (0, "no recipients")
+            self.__output(colored("[-] error sending email: no recipients", "red"))
             return False
 
+        with self.__lock:
+            self.__last_error = (0, "not connected")
+            for attempt in range(2):
+                if not self.__ensure_session():
+                    break
+
+                try:
+                    refused = send()
+                    self.__last_error = (0, str())
+                    if refused:
+                        code, message = next(iter(refused.values()))
+                        self.__last_error = (code, message.decode(errors="replace"))
+                    self.__last_activity = time.monotonic()
+                    self.__output("[+] email sent successfully")
+                    return True
+                except smtplib.SMTPServerDisconnected as e:
+                    # sesiunea a fost inchisa intre verificare si trimitere; se reia o singura data
+                    self.__last_error = (0, str(e))
+                    self.__is_connected = False
+                except smtplib.SMTPRecipientsRefused as e:
+                    code, message = next(iter(e.recipients.values()), (0, b"no recipients"))
+                    self.__last_error = (code, message.decode(errors="replace"))
+                    break
+                except smtplib.SMTPResponseException as e:
+                    self.__last_error = (e.smtp_code, e.smtp_error.decode(errors="replace")
+                                         if isinstance(e.smtp_error, bytes) else str(e.smtp_error))
+                    if e.smtp_code != 421:
+                        break
+                    self.__is_connected = False
+                except Exception as e:
+                    self.__last_error = (0, str(e))
+                    break
+
+        self.__output(colored("[-] error sending email", "red"))
+        return False
+
+    def start_keepalive(self, interval: float = None) -> None:
+        if interval is not None and (not isinstance(interval, (int, float)) or interval <= 0):
+            raise SendEmailServicesException(f"wrong arg: {interval}; positive number required")
+
+        self.stop_keepalive()
+        self.__stop_event.clear()
+        self.__keepalive_thread = threading.Thread(target=self.__keepalive,
+                                                   args=(interval or self.KEEPALIVE_INTERVAL,), daemon=True)
+        self.__keepalive_thread.start()
+
+    def stop_keepalive(self) -> None:
+        self.__stop_event.set()
+        if self.__keepalive_thread and self.__keepalive_thread is not threading.current_thread():
+            self.__keepalive_thread.join(5)
+        self.__keepalive_thread = None
+
+    def __keepalive(self, interval: float) -> None:
+        # NOOP periodic, pentru ca serverul sa nu inchida sesiunea inactiva; daca a inchis-o totusi,
+        # reconectarea se face aici, nu la urmatoarea trimitere
+        while not self.__stop_event.wait(interval):
+            with self.__lock:
+                if time.monotonic() - self.__last_activity < interval:
+                    continue
+                if not self.__is_alive():
+                    self.__reconnect()
+
     def logout(self):
+        self.stop_keepalive()
         try:
-            self.__server.close()
+            with self.__lock:
+                try:
+                    self.__server.quit()
+                except smtplib.SMTPServerDisconnected:
+                    pass
+                self.__server.close()
+                self.__username = None
+                self.__password = None
             self.__output("[+] SMTP logout succeeded")
             self.__is_connected = False
             return True
@@ -110,11 +450,81 @@ class SendEmailServices:
             return False
 
 
+class AttachmentPart(MIMEBase):
+    # fisier atasat unui mesaj; continutul nu este incarcat in memorie, ci citit si codificat in base64
+    # bucata cu bucata, abia cand mesajul este trimis
+    CHUNK_SIZE = 57 * 1024  # multiplu de 57 de octeti, deci fiecare bucata da linii base64 complete
+
+    def __init__(self, path: str):
+        if not isinstance(path, str):
+            raise AttachmentPartException(f"wrong arg type: {type(path)}; str required")
+        if not os.path.isfile(path):
+            raise AttachmentPartException(f"no such file: {path}")
+
+        content_type, encoding = mimetypes.guess_type(path)
+        if content_type is None or encoding is not None:
+            content_type = "application/octet-stream"
+        super().__init__(*content_type.split("/", 1))
+
+        filename = os.path.basename(path)
+        self.path = path
+        self.placeholder = f"attachment-{uuid.uuid4().hex}"  # inlocuit cu continutul fisierului la serializare
+        self.add_header("Content-Disposition", "attachment",
+                        filename=filename if filename.isascii() else ("utf-8", "", filename))
+        self["Content-Transfer-Encoding"] = "base64"
+        self.set_payload(self.placeholder)
+
+    def iter_encoded(self) -> typing.Iterator[bytes]:
+        # linii de 76 de caractere separate prin CRLF; ultima linie nu are CRLF, care urmeaza in mesaj
+        with open(self.path, "rb") as file:
+            first = True
+            for chunk in iter(lambda: file.read(self.CHUNK_SIZE), b""):
+                encoded = base64.b64encode(chunk)
+                lines = b"\r\n".join(encoded[i:i + 76] for i in range(0, len(encoded), 76))
+                yield lines if first else b"\r\n" + lines
+                first = False
+
+
 class ReadEmailServices:
-    def __init__(self):
-        self.__server = None
+    ATTACHMENT_CHUNK_SIZE = 512 * 1024
+    MESSAGE_ID_BATCH = 1000
+    UID_SET_LENGTH = 7900  # RFC 7162 recomanda comenzi de cel mult 8192 octeti, inclusiv restul comenzii
+    HEADER_FIELDS = "UID FLAGS RFC822.SIZE BODY.PEEK[HEADER.FIELDS (SUBJECT FROM TO DATE CONTENT-TYPE)]"
+    SEARCH_FLAGS = ("SEEN", "UNSEEN", "FLAGGED", "UNFLAGGED", "ANSWERED", "UNANSWERED", "DELETED", "UNDELETED",
+                    "DRAFT", "UNDRAFT", "NEW", "OLD", "RECENT")
+    SORT_CRITERIA = ("ARRIVAL", "CC", "DATE", "FROM", "SIZE", "SUBJECT", "TO")
+    MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+    def __init__(self, headers_cache: HeadersCache = None, pool_size: int = 4, body_cache: BodyCache = None,
+                 search_index: SearchIndex = None):
+        if headers_cache is not None and not isinstance(headers_cache, HeadersCache):
+            raise ReadEmailServicesException(f"wrong arg type: {type(headers_cache)}; {HeadersCache} required")
+        if body_cache is not None and not isinstance(body_cache, BodyCache):
+            raise ReadEmailServicesException(f"wrong arg type: {type(body_cache)}; {BodyCache} required")
+        if search_index is not None and not isinstance(search_index, SearchIndex):
+            raise ReadEmailServicesException(f"wrong arg type: {type(search_index)}; {SearchIndex} required")
+        if not isinstance(pool_size, int) or pool_size < 1:
+            raise ReadEmailServicesException(f"wrong arg: {pool_size}; positive int required")
+
+        self.__server = None  # conexiunea initiala, predata pool-ului dupa autentificare
+        self.__pool = None
+        self.__pool_size = pool_size
         self.__show_details = True
         self.__is_connected = False
+        self.__headers_cache = headers_cache
+        self.__body_cache = body_cache
+        self.__search_index = search_index
+        self.__address = str()
+        self.__port = int()
+        self.__account = str()
+        self.__password = str()
+        self.__capabilities = tuple()
+        self.__mailbox = str()
+        self.__uidvalidities = dict()
+        self.__mailbox_states = dict()
+        self.__resync_lock = threading.Lock()
+        self.__prefetch_connection = None  # conexiune separata, folosita doar pentru descarcarea in avans
+        self.__prefetch_lock = threading.Lock()
 
     def show_details(self, show_details: bool) -> None:
         if not isinstance(show_details, bool):
@@ -134,6 +544,8 @@ class ReadEmailServices:
             self.__server = imaplib.IMAP4_SSL(address, port)
             self.__output(f"[+] connected successfully to '{address}'")
 
+            self.__address = address
+            self.__port = port
             self.__is_connected = True
 
             return True
@@ -161,15 +573,66 @@ class ReadEmailServices:
             _status = self.__highlight_status(status)
 
             self.__output(f"[+] login result: status: {_status}, server response: {response}")
-            return status == "OK"
-
+            if status != "OK":
+                return False
         except Exception:
             self.__output(colored("[-] login failed", "red"))
             return False
 
+        self.__account = username
+        self.__password = password
+        self.__enable_extensions(self.__server)
+
+        # conexiunile suplimentare sunt deschise doar la nevoie, cu aceleasi date de autentificare
+        self.__pool = ImapConnectionPool(self.__open_connection, self.__pool_size)
+        self.__pool.add(self.__server)
+        self.__server = None
+        return True
+
+    def __open_connection(self) -> imaplib.IMAP4:
+        server = imaplib.IMAP4_SSL(self.__address, self.__port)
+        server.login(self.__account, self.__password)
+        self.__enable_extensions(server)
+        self.__output(f"[+] new IMAP connection opened to '{self.__address}'")
+        return server
+
+    def __enable_extensions(self, server: imaplib.IMAP4) -> None:
+        # unele servere anunta extensiile CONDSTORE/QRESYNC abia dupa autentificare
+        try:
+            status, response = server.capability()
+            if status == "OK" and response[-1]:
+                self.__capabilities = tuple(response[-1].decode("utf-8").upper().split())
+            else:
+                self.__capabilities = tuple(server.capabilities)
+            # imaplib verifica ENABLE in lista de capabilitati primita inainte de autentificare
+            server.capabilities = self.__capabilities
+
+            if "ENABLE" not in self.__capabilities:
+                return
+            if "QRESYNC" in self.__capabilities:
+                server.enable("QRESYNC")
+            elif "CONDSTORE" in self.__capabilities:
+                server.enable("CONDSTORE")
+        except Exception as e:
+            self.__output(colored(f"[-] enabling IMAP extensions failed: {e}", "red"))
+
+    def has_capability(self, capability: str) -> bool:
+        return capability.upper() in self.__capabilities
+
+    @contextlib.contextmanager
+    def __connection(self, mailbox: str = None, auto_select: bool = True):
+        if self.__pool is None:
+            raise ReadEmailServicesException("not logged in")
+
+        with self.__pool.connection(mailbox) as connection:
+            if mailbox and auto_select and connection.mailbox != mailbox:
+                self.__select(connection, mailbox)
+            yield connection
+
     def get_mailboxes(self) -> list:
         try:
-            status, response = self.__server.list()
+            with self.__connection() as connection:
+                status, response = connection.server.list()
             status = self.__highlight_status(status)
 
             self.__output(f"[+] mailboxes listing result: status: {status}, server response: {response}")
@@ -185,81 +648,1076 @@ class ReadEmailServices:
             mailboxes.append(re.findall('(?:")(.+?)(?:")', mailbox)[-1])
         return mailboxes
 
+    def __select(self, connection: "ImapConnection", mailbox: str) -> int:
+        connection.mailbox = None
+        status, response = connection.server.select('"' + mailbox + '"')
+        _status = self.__highlight_status(status)
+
+        self.__output(f"[+] mailbox selecting result: status {_status}, server response: {response}")
+        if status != "OK":
+            raise ReadEmailServicesException(f"error selecting mailbox: {mailbox}")
+
+        connection.mailbox = mailbox
+        connection.uidvalidity = self.__get_response_code(connection, "UIDVALIDITY")
+        connection.uidnext = self.__get_response_code(connection, "UIDNEXT")
+        connection.highestmodseq = self.__get_response_code(connection, "HIGHESTMODSEQ")
+
+        if self.__uidvalidities.get(mailbox) != connection.uidvalidity:
+            self.__uidvalidities[mailbox] = connection.uidvalidity
+            if self.__headers_cache and connection.uidvalidity:
+                self.__headers_cache.set_uidvalidity(self.__account, mailbox, connection.uidvalidity)
+            if self.__search_index and connection.uidvalidity:
+                self.__search_index.purge(self.__account, mailbox, connection.uidvalidity)
+
+        return int(response[0])
+
     def select_mailbox(self, mailbox: str = "INBOX") -> int:
         if not isinstance(mailbox, str):
             raise ReadEmailServicesException(f"wrong arg type: {type(mailbox)}; str required")
 
         try:
-            status, response = self.__server.select('"' + mailbox + '"')
-            status = self.__highlight_status(status)
+            with self.__connection(mailbox, auto_select=False) as connection:
+                emails_count = self.__select(connection, mailbox)
 
-            self.__output(f"[+] mailbox selecting result: status {status}, server response: {response}")
-            return int(response[0])
+            self.__mailbox = mailbox
+            return emails_count
 
         except Exception:
             self.__output(colored(f"[-] error selecting mailbox: {mailbox}", "red"))
             return 0
 
-    def get_email_headers(self, index: int = 1) -> MIMEText:
-        if not isinstance(index, int):
-            raise ReadEmailServicesException(f"wrong arg type: {type(index)}; int required")
+    @staticmethod
+    def __get_response_code(connection: "ImapConnection", code: str) -> int:
+        _, response = connection.server.response(code)
+        if response and response[-1]:
+            return int(response[-1])
+        return 0
+
+    def __search_uids(self, connection: "ImapConnection", *criteria: str, charset: str = None,
+                      literal: bytes = None) -> list:
+        arguments = list()
+        # ESEARCH intoarce rezultatul ca set compact de UID-uri (ex. 1:500,502) in loc de o lista completa
+        esearch = self.has_capability("ESEARCH")
+        if esearch:
+            arguments += ["RETURN", "(ALL)"]
+        if charset:
+            arguments += ["CHARSET", charset]
+        arguments += criteria
+
+        connection.server.literal = literal
+        status, response = connection.server.uid("SEARCH", *arguments)
+        if status != "OK":
+            raise ReadEmailServicesException(f"search failed: {response}")
+
+        if esearch:
+            _, response = connection.server.response("ESEARCH")
+            uids = list()
+            for data in response:
+                match = re.search(rb"ALL ([\d:,]+)", data or b"")
+                if match:
+                    uids.extend(self.expand_uid_set(match.group(1).decode("utf-8")))
+            return uids
+
+        if not response or not response[0]:
+            return []
+        return [int(uid) for uid in response[0].split()]
 
-        email_headers = MIMEText("")
-        if index <= 0:
-            return email_headers
+    @staticmethod
+    def __quote(value: str) -> str:
+        return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
 
-        status, response = self.__server.fetch(str(index).encode("utf-8"),
-                                               "(BODY[HEADER.FIELDS (SUBJECT FROM TO DATE CONTENT-TYPE)])")
-        if not response[0]:
-            return email_headers
+    @staticmethod
+    def __format_date(date: datetime.date) -> str:
+        # formatul IMAP (ex. 01-Jan-2024) nu depinde de setarile locale
+        return f"{date.day:02d}-{ReadEmailServices.MONTHS[date.month - 1]}-{date.year}"
+
+    def search(self, mailbox: str = None, from_address: str = None, subject: str = None, text: str = None,
+               since: datetime.date = None, before: datetime.date = None, flags: list = None,
+               sort: str = "DATE") -> list:
+        for value in (mailbox, from_address, subject, text, sort):
+            if value is not None and not isinstance(value, str):
+                raise ReadEmailServicesException(f"wrong arg type: {type(value)}; str required")
+        for value in (since, before):
+            if value is not None and not isinstance(value, datetime.date):
+                raise ReadEmailServicesException(f"wrong arg type: {type(value)}; {datetime.date} required")
+        if sort is not None and sort.upper() not in self.SORT_CRITERIA:
+            raise ReadEmailServicesException(f"wrong sort criterion: {sort}; one of {self.SORT_CRITERIA} required")
+
+        criteria, charset, literal = self.make_search_criteria(from_address, subject, text, since, before, flags)
+        try:
+            with self.__connection(mailbox or self.__mailbox) as connection:
+                if sort and self.has_capability("SORT"):
+                    connection.server.literal = literal
+                    status, response = connection.server.uid("SORT", f"(REVERSE {sort.upper()})",
+                                                             charset or "UTF-8", *criteria)
+                    if status != "OK":
+                        raise ReadEmailServicesException(f"sort failed: {response}")
+                    uids = [int(uid) for uid in response[0].split()] if response and response[0] else []
+                else:
+                    uids = sorted(self.__search_uids(connection, *criteria, charset=charset, literal=literal),
+                                  reverse=True)
+        except Exception:
+            self.__output(colored(f"[-] search failed: {' '.join(criteria)}", "red"))
+            return []
 
-        headers = parse_from_bytes(response[0][1]).headers
-        for header_name, header_value in headers.items():
-            header_value = BasicEmailHeadersParser.process_charset(header_value)
+        self.__output(f"[+] search result: {len(uids)} messages match {' '.join(criteria)}")
+        return uids
 
-            if header_name.lower() == "content-type":
-                header_value = header_value.split("boundary")[0]
-                email_headers.set_type(header_value)
+    @staticmethod
+    def make_search_criteria(from_address: str = None, subject: str = None, text: str = None,
+                             since: datetime.date = None, before: datetime.date = None, flags: list = None) -> tuple:
+        # intoarce (criterii, charset, literal); comanda poate trimite un singur literal, la final,
+        # deci este acceptat un singur termen non-ASCII
+        criteria = list()
+        for flag in flags or []:
+            if flag.upper() not in ReadEmailServices.SEARCH_FLAGS:
+                raise ReadEmailServicesException(
+                    f"wrong flag: {flag}; one of {ReadEmailServices.SEARCH_FLAGS} required"
+                )
+            criteria.append(flag.upper())
+        if since:
+            criteria += ["SINCE", ReadEmailServices.__format_date(since)]
+        if before:
+            criteria += ["BEFORE", ReadEmailServices.__format_date(before)]
+
+        text_criteria = [(key, value) for key, value in (("FROM", from_address), ("SUBJECT", subject),
+                                                         ("TEXT", text)) if value]
+        non_ascii_criteria = [(key, value) for key, value in text_criteria if not value.isascii()]
+        if len(non_ascii_criteria) > 1:
+            raise ReadEmailServicesException("only one non-ASCII search term is supported")
+
+        for key, value in text_criteria:
+            if value.isascii():
+                criteria += [key, ReadEmailServices.__quote(value)]
+
+        charset, literal = None, None
+        if non_ascii_criteria:
+            key, value = non_ascii_criteria[0]
+            charset, literal = "UTF-8", value.encode("utf-8")
+            criteria.append(key)
+        if not criteria:
+            criteria.append("ALL")
+        return criteria, charset, literal
+
+    def resync_mailbox(self, mailbox: str = "INBOX") -> "MailboxChanges":
+        if not isinstance(mailbox, str):
+            raise ReadEmailServicesException(f"wrong arg type: {type(mailbox)}; str required")
+
+        with self.__resync_lock:
+            try:
+                with self.__connection(mailbox, auto_select=False) as connection:
+                    changes = self.__resync_mailbox(connection, mailbox)
+            except Exception:
+                self.__output(colored(f"[-] mailbox resync failed: {mailbox}", "red"))
+                state = self.__mailbox_states.get(mailbox)
+                return MailboxChanges(len(state.uids) if state else 0)
+
+        self.__mailbox = mailbox
+        self.__output(f"[+] mailbox resync result: {len(changes.new_uids)} new, {len(changes.changed_uids)} changed, "
+                      f"{len(changes.expunged_uids)} expunged")
+        return changes
+
+    def __resync_mailbox(self, connection: "ImapConnection", mailbox: str) -> "MailboxChanges":
+        state = self.__mailbox_states.get(mailbox)
+        polled = state is not None and connection.mailbox == mailbox
+
+        emails_count = self.__poll_selected_mailbox(connection, state) if polled else self.__select(connection,
+                                                                                                    mailbox)
+        changes = MailboxChanges(emails_count)
+
+        if not state or state.uidvalidity != connection.uidvalidity:
+            state = MailboxState(connection.uidvalidity)
+            state.uids = set(self.__search_uids(connection, "ALL")) if emails_count else set()
+            changes.full = True
+            changes.new_uids = sorted(state.uids)
+        elif connection.highestmodseq and state.highestmodseq:
+            self.__resync_changed_since(connection, state, changes, polled)
+        else:
+            self.__resync_uid_range(connection, state, changes)
+
+        state.uidnext = max(connection.uidnext, max(state.uids) + 1 if state.uids else 0)
+        state.highestmodseq = connection.highestmodseq
+        self.__mailbox_states[mailbox] = state
+        changes.emails_count = len(state.uids)
+
+        if self.__headers_cache and changes.expunged_uids:
+            self.__headers_cache.remove_headers(self.__account, mailbox, state.uidvalidity, changes.expunged_uids)
+        if self.__headers_cache and changes.changed_uids:
+            self.__headers_cache.update_flags(self.__account, mailbox, state.uidvalidity, changes.changed_uids)
+        if self.__search_index and changes.expunged_uids:
+            self.__search_index.remove(self.__account, mailbox, state.uidvalidity, changes.expunged_uids)
+
+        return changes
+
+    @staticmethod
+    def __poll_selected_mailbox(connection: "ImapConnection", state: "MailboxState") -> int:
+        # mailbox-ul este deja selectat, asa ca NOOP aduce notificarile EXISTS/EXPUNGE fara un nou SELECT
+        emails_count = len(state.uids)
+        connection.server.noop()
+
+        _, expunged = connection.server.response("EXPUNGE")
+        emails_count -= len([number for number in expunged if number])
+        _, exists = connection.server.response("EXISTS")
+        if exists and exists[-1]:
+            emails_count = int(exists[-1])
+
+        connection.uidnext = state.uidnext
+        connection.highestmodseq = state.highestmodseq
+        return emails_count
+
+    def __resync_changed_since(self, connection: "ImapConnection", state: "MailboxState", changes: "MailboxChanges",
+                               polled: bool = False) -> None:
+        if not polled and state.highestmodseq == connection.highestmodseq and state.uidnext == connection.uidnext \
+                and len(state.uids) == changes.emails_count:
+            return
+
+        modifiers = f"(CHANGEDSINCE {state.highestmodseq}"
+        if self.has_capability("QRESYNC"):
+            modifiers += " VANISHED"
+        modifiers += ")"
+
+        status, response = connection.server.uid("FETCH", "1:*", "(UID FLAGS MODSEQ)", modifiers)
+        if status != "OK":
+            raise ReadEmailServicesException(f"changed messages fetching failed: {response}")
+
+        for item in response:
+            if isinstance(item, tuple):
+                item = item[0]
+            if not isinstance(item, bytes):
+                continue
+
+            uid = re.search(rb"UID (\d+)", item)
+            if not uid:
                 continue
-            email_headers[header_name] = header_value
+            uid = int(uid.group(1))
+            flags = re.search(rb"FLAGS \(([^)]*)\)", item)
+            flags = flags.group(1).decode("utf-8").split() if flags else []
+            modseq = re.search(rb"MODSEQ \((\d+)\)", item)
+            if modseq:
+                connection.highestmodseq = max(connection.highestmodseq, int(modseq.group(1)))
+
+            if uid in state.uids:
+                changes.changed_uids[uid] = flags
+            elif uid >= state.uidnext:
+                changes.new_uids.append(uid)
+
+        state.uids.update(changes.new_uids)
+
+        if self.has_capability("QRESYNC"):
+            _, vanished = connection.server.response("VANISHED")
+            for uid_set in vanished or []:
+                if isinstance(uid_set, bytes):
+                    uid_set = uid_set.decode("utf-8")
+                expunged_uids = state.uids.intersection(self.expand_uid_set(uid_set.split()[-1]))
+                changes.expunged_uids.extend(expunged_uids)
+                state.uids.difference_update(expunged_uids)
+        elif len(state.uids) != changes.emails_count:
+            self.__resync_expunged(connection, state, changes)
+
+        changes.new_uids.sort()
+
+    def __resync_uid_range(self, connection: "ImapConnection", state: "MailboxState",
+                           changes: "MailboxChanges") -> None:
+        # fara CONDSTORE, mesajele noi sunt cele cu UID >= UIDNEXT-ul anterior,
+        # iar cele sterse se afla comparand lista de UID-uri doar cand numarul de mesaje nu corespunde
+        if changes.emails_count > len(state.uids) or state.uidnext != connection.uidnext or not connection.uidnext:
+            new_uids = self.__search_uids(connection, f"UID {max(state.uidnext, 1)}:*")
+            changes.new_uids = sorted(uid for uid in new_uids if uid >= state.uidnext and uid not in state.uids)
+            state.uids.update(changes.new_uids)
+
+        if len(state.uids) != changes.emails_count:
+            self.__resync_expunged(connection, state, changes)
+
+    def __resync_expunged(self, connection: "ImapConnection", state: "MailboxState",
+                          changes: "MailboxChanges") -> None:
+        uids = set(self.__search_uids(connection, "ALL"))
+        changes.expunged_uids.extend(sorted(state.uids - uids))
+
+        # mesaje noi care nu au fost detectate (ex. UIDNEXT lipsa din raspunsul serverului)
+        missing_uids = sorted(uids - state.uids)
+        changes.new_uids.extend(uid for uid in missing_uids if uid not in changes.new_uids)
+        state.uids = uids
+
+    def get_mailbox_uids(self, mailbox: str = "INBOX") -> list:
+        state = self.__mailbox_states.get(mailbox)
+        if not state:
+            return []
+        return sorted(state.uids, reverse=True)
 
+    @staticmethod
+    def build_email_headers(raw_headers: bytes, uid: int = 0, flags: tuple = (), size: int = 0) -> "EmailHeaders":
+        email_headers = EmailHeaders(uid, EmailHeaders.make_flags(flags), size)
+
+        headers = parse_from_bytes(raw_headers).headers
+        for header_name, header_value in headers.items():
+            header_value = BasicEmailHeadersParser.decode_header_value(header_value)
+            header_name = header_name.lower()
+
+            if header_name == "content-type":
+                email_headers.content_type = header_value.split(";")[0].strip().lower() or "text/plain"
+            elif header_name == "from":
+                email_headers.from_address = header_value
+            elif header_name == "to":
+                email_headers.to_address = header_value
+            elif header_name == "subject":
+                email_headers.subject = header_value
+            elif header_name == "date":
+                email_headers.date = header_value
+
+        email_headers.update_display()
         return email_headers
 
+    @staticmethod
+    def parse_fetch_attributes(response: list) -> list:
+        # intoarce (numar, UID, FLAGS, RFC822.SIZE, literal) pentru fiecare mesaj din raspunsul FETCH;
+        # atributele pot aparea atat inainte cat si dupa literal
+        messages = list()
+        for i, item in enumerate(response):
+            if not isinstance(item, tuple):
+                continue
+
+            attributes = item[0]
+            if i + 1 < len(response) and isinstance(response[i + 1], bytes):
+                attributes += response[i + 1]
+
+            index = int(attributes.split(b" ", 1)[0])
+            uid = re.search(rb"UID (\d+)", attributes)
+            flags = re.search(rb"FLAGS \(([^)]*)\)", attributes)
+            size = re.search(rb"RFC822\.SIZE (\d+)", attributes)
+
+            messages.append((index,
+                             int(uid.group(1)) if uid else 0,
+                             tuple(flags.group(1).decode("utf-8").split()) if flags else (),
+                             int(size.group(1)) if size else 0,
+                             item[1]))
+        return messages
+
+    @staticmethod
+    def compress_uid_set(uids) -> str:
+        uids = sorted(set(uids))
+        if not uids:
+            return ""
+
+        ranges = list()
+        first = last = uids[0]
+        for uid in uids[1:]:
+            if uid == last + 1:
+                last = uid
+                continue
+            ranges.append(str(first) if first == last else f"{first}:{last}")
+            first = last = uid
+        ranges.append(str(first) if first == last else f"{first}:{last}")
+
+        return ",".join(ranges)
+
+    @staticmethod
+    def make_uid_sets(uids, max_length: int = None) -> list:
+        # imparte setul compactat (ex. 1:50,72,90:120) in seturi de cel mult max_length caractere
+        max_length = max_length or ReadEmailServices.UID_SET_LENGTH
+        uid_sets, uid_set = list(), ""
+        for uid_range in ReadEmailServices.compress_uid_set(uids).split(","):
+            if not uid_range:
+                continue
+            if uid_set and len(uid_set) + 1 + len(uid_range) > max_length:
+                uid_sets.append(uid_set)
+                uid_set = ""
+            uid_set = uid_set + "," + uid_range if uid_set else uid_range
+        if uid_set:
+            uid_sets.append(uid_set)
+        return uid_sets
+
+    @staticmethod
+    def expand_uid_set(uid_set: str) -> list:
+        uids = list()
+        for uid_range in uid_set.split(","):
+            first, _, last = uid_range.partition(":")
+            first, last = int(first), int(last or first)
+            uids.extend(range(min(first, last), max(first, last) + 1))
+        return uids
+
+    @staticmethod
+    def parse_fetch_uids(response: list) -> dict:
+        uids = dict()
+        for item in response:
+            if isinstance(item, tuple):
+                item = item[0]
+            if not isinstance(item, bytes):
+                continue
+
+            match = re.match(rb"(\d+) \(.*?UID (\d+)", item)
+            if match:
+                uids[int(match.group(1))] = int(match.group(2))
+        return uids
+
+    def __fetch_raw_headers_by_uid(self, connection: "ImapConnection", uids: list) -> dict:
+        raw_headers = dict()
+        if not uids:
+            return raw_headers
+
+        status, response = connection.server.uid("FETCH", self.compress_uid_set(uids), f"({self.HEADER_FIELDS})")
+        if status != "OK":
+            return raw_headers
+
+        for _, uid, flags, size, raw in self.parse_fetch_attributes(response):
+            if uid:
+                raw_headers[uid] = (raw, flags, size)
+        return raw_headers
+
+    def get_email_headers_range(self, start: int, stop: int) -> dict:
+        if not isinstance(start, int) or not isinstance(stop, int):
+            raise ReadEmailServicesException(f"wrong arg types: {type(start)}, {type(stop)}; (int, int) required")
+
+        headers = dict()
+        if start <= 0 or stop <= 0:
+            return headers
+
+        if self.__headers_cache and self.__uidvalidities.get(self.__mailbox):
+            return self.__get_cached_email_headers_range(start, stop)
+
+        try:
+            with self.__connection(self.__mailbox) as connection:
+                status, response = connection.server.fetch(f"{start}:{stop}".encode("utf-8"),
+                                                           f"({self.HEADER_FIELDS})")
+        except Exception:
+            self.__output(colored(f"[-] headers fetching failed: {start}:{stop}", "red"))
+            return headers
+
+        if status != "OK":
+            return headers
+
+        # raspunsurile FETCH nesolicitate (ex. FLAGS) nu contin literal si sunt ignorate
+        for index, uid, flags, size, raw in self.parse_fetch_attributes(response):
+            headers[index] = self.build_email_headers(raw, uid, flags, size)
+
+        self.__index_headers(self.__mailbox, self.__uidvalidities.get(self.__mailbox),
+                             [email_headers for email_headers in headers.values() if email_headers.uid])
+        return headers
+
+    def __get_cached_email_headers_range(self, start: int, stop: int) -> dict:
+        # se cer doar UID-urile mesajelor, iar header-ele lipsa din cache sunt descarcate
+        # cu o singura comanda UID FETCH
+        headers = dict()
+        try:
+            with self.__connection(self.__mailbox) as connection:
+                status, response = connection.server.fetch(f"{start}:{stop}".encode("utf-8"), "(UID)")
+            if status != "OK":
+                return headers
+            uids = self.parse_fetch_uids(response)
+        except Exception:
+            self.__output(colored(f"[-] headers fetching failed: {start}:{stop}", "red"))
+            return headers
+
+        headers_by_uid = self.get_email_headers_by_uid(list(uids.values()))
+        for index, uid in uids.items():
+            if uid in headers_by_uid:
+                headers[index] = headers_by_uid[uid]
+        return headers
+
+    def get_email_headers_by_uid(self, uids: list, mailbox: str = None) -> dict:
+        if not isinstance(uids, list):
+            raise ReadEmailServicesException(f"wrong arg type: {type(uids)}; list required")
+
+        headers = dict()
+        if not uids:
+            return headers
+
+        mailbox = mailbox or self.__mailbox
+        raw_headers = dict()
+        try:
+            uidvalidity = self.__uidvalidities.get(mailbox)
+            if self.__headers_cache and uidvalidity:
+                raw_headers = self.__headers_cache.get_headers(self.__account, mailbox, uidvalidity, uids)
+
+            missing_uids = [uid for uid in uids if uid not in raw_headers]
+            fetched_headers = dict()
+            if missing_uids:
+                with self.__connection(mailbox) as connection:
+                    fetched_headers = self.__fetch_raw_headers_by_uid(connection, missing_uids)
+                    uidvalidity = connection.uidvalidity
+        except Exception:
+            self.__output(colored(f"[-] headers fetching failed: {self.compress_uid_set(uids)}", "red"))
+            return headers
+
+        if self.__headers_cache and uidvalidity:
+            self.__headers_cache.store_headers(self.__account, mailbox, uidvalidity, fetched_headers)
+        self.__output(f"[+] headers loaded: {len(raw_headers)} from cache, {len(fetched_headers)} from server")
+        raw_headers.update(fetched_headers)
+
+        for uid, (raw, flags, size) in raw_headers.items():
+            headers[uid] = self.build_email_headers(raw, uid, flags, size)
+
+        self.__index_headers(mailbox, uidvalidity, headers.values())
+        return headers
+
+    def __index_headers(self, mailbox: str, uidvalidity: int, headers: typing.Iterable["EmailHeaders"]) -> None:
+        if not self.__search_index or not uidvalidity:
+            return
+
+        added = self.__search_index.add_headers(self.__account, mailbox, uidvalidity, {
+            email_headers.uid: (email_headers.from_address, email_headers.to_address, email_headers.subject)
+            for email_headers in headers
+        })
+        if added:
+            self.__output(f"[+] search index: {added} messages added from '{mailbox}'")
+
+    @staticmethod
+    def extract_text(content: str, subtype: str = "plain") -> str:
+        # textul indexat nu contine etichete html, stiluri sau scripturi
+        if subtype == "html":
+            content = re.sub(r"(?is)<(style|script)\b.*?</\1\s*>", " ", content)
+            content = html.unescape(re.sub(r"(?s)<[^>]*>", " ", content))
+        return " ".join(content.split())
+
+    def __index_body(self, mailbox: str, uidvalidity: int, uid: int, body: tuple) -> None:
+        if self.__search_index and uidvalidity:
+            self.__search_index.add_body(self.__account, mailbox, uidvalidity, uid, self.extract_text(*body))
+
+    def get_email_headers(self, index: int = 1) -> "EmailHeaders":
+        if not isinstance(index, int):
+            raise ReadEmailServicesException(f"wrong arg type: {type(index)}; int required")
+
+        return self.get_email_headers_range(index, index).get(index, EmailHeaders())
+
     def get_emails_headers(self, count: int = 1) -> list:
         if not isinstance(count, int):
             raise ReadEmailServicesException(f"wrong arg type: {type(count)}; int required")
 
-        headers = list()
         if count <= 0:
-            return headers
-        i = 1
+            return list()
 
-        while True:
-            header = self.get_email_headers(i)
-            headers.append(header)
+        headers = self.get_email_headers_range(1, count)
+        return [headers.get(index, EmailHeaders()) for index in range(1, count + 1)]
 
-            if i == count:
-                break
+    @staticmethod
+    def __fetch(connection: "ImapConnection", message_id: int, items: str, uid: bool = True) -> list:
+        if uid:
+            status, response = connection.server.uid("FETCH", str(message_id), items)
+        else:
+            status, response = connection.server.fetch(str(message_id).encode("utf-8"), items)
+
+        if status != "OK":
+            raise ReadEmailServicesException(f"fetching {items} failed: {response}")
+        return response
+
+    def __fetch_body_structure(self, connection: "ImapConnection", message_id: int, uid: bool = True) -> list:
+        response = self.__fetch(connection, message_id, "(BODYSTRUCTURE)", uid)
+        return BodyStructureParser.parse_fetch_response(response)
+
+    def __fetch_part(self, connection: "ImapConnection", message_id: int, part: "BodyPart", uid: bool = True) -> bytes:
+        response = self.__fetch(connection, message_id, f"(BODY.PEEK[{part.section}])", uid)
+        for item in response:
+            if isinstance(item, tuple):
+                return part.decode_payload(item[1])
+        return b""
+
+    def __fetch_displayable_body(self, connection: "ImapConnection", message_id: int, uid: bool = True,
+                                 prefer: str = "html") -> tuple:
+        # se descarca doar partea text/html sau text/plain a mesajului, nu si atasamentele
+        try:
+            parts = self.__fetch_body_structure(connection, message_id, uid)
+        except BodyStructureParserException:
+            parts = None
 
-            i += 1
-        # headers.reverse()
-        return headers
+        if parts is None:
+            response = self.__fetch(connection, message_id, "(RFC822)", uid)
+            return str(parse_from_bytes(response[0][1]).body), "html"
+
+        part = BodyStructureParser.get_displayable_part(parts, prefer)
+        if part is None:
+            return "", "plain"
+
+        payload = self.__fetch_part(connection, message_id, part, uid)
+        self.__output(f"[+] body part {part.section} ({part.get_content_type()}) fetched: {len(payload)} bytes")
+        return part.decode_text(payload), part.subtype
 
     def get_body(self, index: int = 1) -> str:
         if not isinstance(index, int):
             raise ReadEmailServicesException(f"wrong arg type: {type(index)}; int required")
 
         try:
-            status, data = self.__server.fetch(str(index).encode("utf-8"), "(RFC822)")
-            email_message = parse_from_bytes(data[0][1])
-            return str(email_message.body)
+            with self.__connection(self.__mailbox) as connection:
+                return self.__fetch_displayable_body(connection, index, uid=False)[0]
         except Exception:
             self.__output(colored("[-] body fetching failed", "red"))
             return ""
 
+    def get_displayable_body(self, uid: int, mailbox: str = None, prefer: str = "html") -> tuple:
+        if not isinstance(uid, int):
+            raise ReadEmailServicesException(f"wrong arg type: {type(uid)}; int required")
+        if prefer not in ("html", "plain"):
+            raise ReadEmailServicesException(f"wrong arg: {prefer}; 'html' or 'plain' required")
+
+        # cheia din cache include UIDVALIDITY; cat timp aceasta nu este cunoscuta, cache-ul nu este folosit
+        mailbox = mailbox or self.__mailbox
+        uidvalidity = self.__uidvalidities.get(mailbox, 0)
+        if self.__body_cache and uidvalidity:
+            body = self.__body_cache.get(BodyCache.make_key(mailbox, uidvalidity, uid, prefer))
+            if body:
+                return body
+
+        try:
+            with self.__connection(mailbox) as connection:
+                body = self.__fetch_displayable_body(connection, uid, prefer=prefer)
+                uidvalidity = connection.uidvalidity
+        except Exception:
+            self.__output(colored("[-] body fetching failed", "red"))
+            return "", "plain"
+
+        if self.__body_cache and uidvalidity:
+            self.__body_cache.put(BodyCache.make_key(mailbox, uidvalidity, uid, prefer), *body)
+        self.__index_body(mailbox, uidvalidity, uid, body)
+        return body
+
+    def prefetch_body(self, uid: int, mailbox: str = None, prefer: str = "html") -> bool:
+        # descarca mesajul in cache-ul de corpuri pe o conexiune dedicata, astfel incat descarcarile
+        # in avans nu ocupa conexiunile folosite de interfata; intoarce True daca mesajul este in cache
+        if not isinstance(uid, int):
+            raise ReadEmailServicesException(f"wrong arg type: {type(uid)}; int required")
+        if not self.__body_cache:
+            return False
+
+        mailbox = mailbox or self.__mailbox
+        uidvalidity = self.__uidvalidities.get(mailbox, 0)
+        if uidvalidity and self.__body_cache.get(BodyCache.make_key(mailbox, uidvalidity, uid, prefer)):
+            return True
+
+        with self.__prefetch_lock:
+            if self.__pool is None:
+                raise ReadEmailServicesException("not logged in")
+
+            try:
+                if self.__prefetch_connection is None:
+                    self.__prefetch_connection = ImapConnection(self.__open_connection())
+                connection = self.__prefetch_connection
+                if connection.mailbox != mailbox:
+                    self.__select(connection, mailbox)
+                body = self.__fetch_displayable_body(connection, uid, prefer=prefer)
+            except (imaplib.IMAP4.abort, OSError):
+                self.__prefetch_connection = None
+                raise
+
+        if not connection.uidvalidity:
+            return False
+        self.__body_cache.put(BodyCache.make_key(mailbox, connection.uidvalidity, uid, prefer), *body)
+        self.__index_body(mailbox, connection.uidvalidity, uid, body)
+        return True
+
+    def search_local(self, text: str, mailbox: str = None, limit: int = 500) -> list:
+        # cautare in indexul local: nu necesita conexiune la server, dar acopera doar mesajele indexate
+        if not isinstance(text, str):
+            raise ReadEmailServicesException(f"wrong arg type: {type(text)}; str required")
+        if not self.__search_index:
+            raise ReadEmailServicesException("no search index configured")
+
+        try:
+            results = self.__search_index.search(text, self.__account, mailbox, limit)
+        except SearchIndexException:
+            self.__output(colored(f"[-] local search failed: {text}", "red"))
+            return []
+
+        self.__output(f"[+] local search result: {len(results)} messages match {text}")
+        return results
+
+    def has_search_index(self) -> bool:
+        return self.__search_index is not None
+
+    def index_mailbox(self, mailbox: str, bodies: bool = False, batch_size: int = 50,
+                      should_stop: typing.Callable[[], bool] = None) -> int:
+        # adauga in indexul local header-ele (si optional textul) mesajelor inca neindexate;
+        # conexiunea este eliberata intre loturi, astfel incat comenzile interfetei nu asteapta
+        if not isinstance(mailbox, str) or not isinstance(batch_size, int):
+            raise ReadEmailServicesException(f"wrong arg type: {type(mailbox)}, {type(batch_size)}; (str, int) required")
+        if not self.__search_index:
+            raise ReadEmailServicesException("no search index configured")
+
+        should_stop = should_stop or (lambda: False)
+        with self.__connection(mailbox) as connection:
+            uids = sorted(self.__search_uids(connection, "ALL"), reverse=True)
+            uidvalidity = connection.uidvalidity
+
+        indexed_uids = self.__search_index.get_indexed_uids(self.__account, mailbox, uidvalidity)
+        missing_uids = [uid for uid in uids if uid not in indexed_uids]
+        indexed = 0
+        for i in range(0, len(missing_uids), batch_size):
+            if should_stop():
+                return indexed
+            indexed += len(self.get_email_headers_by_uid(missing_uids[i:i + batch_size], mailbox))
+
+        if not bodies:
+            return indexed
+
+        indexed_uids = self.__search_index.get_indexed_uids(self.__account, mailbox, uidvalidity, with_body=True)
+        missing_uids = [uid for uid in uids if uid not in indexed_uids]
+        for i in range(0, len(missing_uids), batch_size):
+            if should_stop():
+                break
+            # corpurile descarcate aici nu trec prin cache-ul LRU, pentru a nu elimina mesajele deschise recent
+            with self.__connection(mailbox) as connection:
+                if connection.uidvalidity != uidvalidity:
+                    break
+                for uid in missing_uids[i:i + batch_size]:
+                    self.__index_body(mailbox, uidvalidity, uid,
+                                      self.__fetch_displayable_body(connection, uid, prefer="plain"))
+                    indexed += 1
+
+        return indexed
+
+    def get_body_by_uid(self, uid: int, mailbox: str = None, prefer: str = "html") -> str:
+        return self.get_displayable_body(uid, mailbox, prefer)[0]
+
+    def get_attachments(self, uid: int, mailbox: str = None) -> list:
+        if not isinstance(uid, int):
+            raise ReadEmailServicesException(f"wrong arg type: {type(uid)}; int required")
+
+        try:
+            with self.__connection(mailbox or self.__mailbox) as connection:
+                parts = self.__fetch_body_structure(connection, uid)
+        except Exception:
+            self.__output(colored("[-] attachments listing failed", "red"))
+            return []
+
+        return [part for part in parts if part.is_attachment()]
+
+    def get_attachment(self, uid: int, part: "BodyPart", mailbox: str = None) -> bytes:
+        if not isinstance(uid, int) or not isinstance(part, BodyPart):
+            raise ReadEmailServicesException(f"wrong arg type: {type(uid)}, {type(part)}; (int, BodyPart) required")
+
+        try:
+            with self.__connection(mailbox or self.__mailbox) as connection:
+                return self.__fetch_part(connection, uid, part)
+        except Exception:
+            self.__output(colored(f"[-] attachment fetching failed: {part.filename}", "red"))
+            return b""
+
+    def save_attachment(self, uid: int, part: "BodyPart", path: str, mailbox: str = None,
+                        progress: typing.Callable[[int, int], None] = None) -> bool:
+        # atasamentul este descarcat pe bucati (BODY.PEEK[sectiune]<offset.lungime>), decodificat incremental
+        # si scris direct in fisier, deci memoria folosita nu depinde de dimensiunea lui
+        if not isinstance(uid, int) or not isinstance(part, BodyPart):
+            raise ReadEmailServicesException(f"wrong arg type: {type(uid)}, {type(part)}; (int, BodyPart) required")
+        if not isinstance(path, str):
+            raise ReadEmailServicesException(f"wrong arg type: {type(path)}; str required")
+        if progress is not None and not callable(progress):
+            raise ReadEmailServicesException(f"wrong arg type: {type(progress)}; callable required")
+
+        # fisierul final apare doar dupa o descarcare completa
+        temporary_path = path + ".part"
+        decoder = PayloadDecoder(part.encoding)
+        received = 0
+        try:
+            with self.__connection(mailbox or self.__mailbox) as connection, open(temporary_path, "wb") as file:
+                while True:
+                    chunk = self.__fetch_partial(connection, uid, part.section, received,
+                                                 self.ATTACHMENT_CHUNK_SIZE)
+                    file.write(decoder.decode(chunk))
+                    received += len(chunk)
+                    if progress:
+                        progress(received, max(part.size, received))
+                    if len(chunk) < self.ATTACHMENT_CHUNK_SIZE:
+                        break
+                file.write(decoder.flush())
+            os.replace(temporary_path, path)
+        except Exception:
+            with contextlib.suppress(OSError):
+                os.remove(temporary_path)
+            self.__output(colored(f"[-] attachment saving failed: {part.filename}", "red"))
+            return False
+
+        self.__output(f"[+] attachment saved: {path} ({received} bytes fetched)")
+        return True
+
+    def __fetch_partial(self, connection: "ImapConnection", uid: int, section: str, offset: int,
+                        length: int) -> bytes:
+        response = self.__fetch(connection, uid, f"(BODY.PEEK[{section}]<{offset}.{length}>)")
+        for item in response:
+            if isinstance(item, tuple):
+                return item[1]
+        return b""  # dupa sfarsitul partii, serverul intoarce un sir vid in locul unui literal
+
+    def get_message_sizes(self, mailbox: str, first_uid: int = 1) -> tuple:
+        # intoarce (UIDVALIDITY, {UID: RFC822.SIZE}) pentru mesajele cu UID >= first_uid, fara continutul lor
+        if not isinstance(mailbox, str) or not isinstance(first_uid, int):
+            raise ReadEmailServicesException(
+                f"wrong arg types: {type(mailbox)}, {type(first_uid)}; (str, int) required"
+            )
+
+        with self.__connection(mailbox) as connection:
+            status, response = connection.server.uid("FETCH", f"{max(first_uid, 1)}:*", "(UID RFC822.SIZE)")
+            if status != "OK":
+                raise ReadEmailServicesException(f"fetching sizes failed: {response}")
+            uidvalidity = connection.uidvalidity
+
+        sizes = dict()
+        for item in response:
+            if not isinstance(item, bytes):
+                continue
+
+            uid = re.search(rb"UID (\d+)", item)
+            size = re.search(rb"RFC822\.SIZE (\d+)", item)
+            # n:* include mereu ultimul mesaj, chiar daca UID-ul lui este mai mic decat n
+            if uid and size and int(uid.group(1)) >= first_uid:
+                sizes[int(uid.group(1))] = int(size.group(1))
+        return uidvalidity, sizes
+
+    def get_raw_messages(self, uids: list, mailbox: str) -> tuple:
+        # intoarce (UIDVALIDITY, {UID: (mesaj brut, FLAGS, INTERNALDATE ca timestamp)}); mesajele nu sunt
+        # interpretate, iar cele sterse intre timp lipsesc din rezultat
+        if not isinstance(mailbox, str):
+            raise ReadEmailServicesException(f"wrong arg type: {type(mailbox)}; str required")
+        if not uids:
+            return 0, dict()
+
+        with self.__connection(mailbox) as connection:
+            status, response = connection.server.uid("FETCH", self.compress_uid_set(uids),
+                                                     "(UID FLAGS INTERNALDATE BODY.PEEK[])")
+            if status != "OK":
+                raise ReadEmailServicesException(f"fetching messages failed: {response}")
+            uidvalidity = connection.uidvalidity
+
+        messages = dict()
+        for i, item in enumerate(response):
+            if not isinstance(item, tuple):
+                continue
+
+            attributes = item[0]
+            if i + 1 < len(response) and isinstance(response[i + 1], bytes):
+                attributes += response[i + 1]
+
+            uid = re.search(rb"UID (\d+)", attributes)
+            flags = re.search(rb"FLAGS \(([^)]*)\)", attributes)
+            internaldate = imaplib.Internaldate2tuple(attributes)
+            if uid:
+                messages[int(uid.group(1))] = (item[1],
+                                               tuple(flags.group(1).decode("utf-8").split()) if flags else (),
+                                               time.mktime(internaldate) if internaldate else time.time())
+        return uidvalidity, messages
+
+    def create_mailbox(self, mailbox: str) -> bool:
+        if not isinstance(mailbox, str):
+            raise ReadEmailServicesException(f"wrong arg type: {type(mailbox)}; str required")
+
+        try:
+            with self.__connection() as connection:
+                status, response = connection.server.create('"' + mailbox + '"')
+            _status = self.__highlight_status(status)
+
+            self.__output(f"[+] mailbox creating result: status: {_status}, server response: {response}")
+            return status == "OK"
+        except Exception:
+            self.__output(colored(f"[-] error creating mailbox: {mailbox}", "red"))
+            return False
+
+    def get_message_ids(self, mailbox: str) -> set:
+        # intoarce valorile antetului Message-ID din mailbox, cerute pe loturi de UID-uri
+        if not isinstance(mailbox, str):
+            raise ReadEmailServicesException(f"wrong arg type: {type(mailbox)}; str required")
+
+        message_ids = set()
+        with self.__connection(mailbox) as connection:
+            uids = self.__search_uids(connection, "ALL")
+            for i in range(0, len(uids), self.MESSAGE_ID_BATCH):
+                status, response = connection.server.uid("FETCH",
+                                                         self.compress_uid_set(uids[i:i + self.MESSAGE_ID_BATCH]),
+                                                         "(UID BODY.PEEK[HEADER.FIELDS (MESSAGE-ID)])")
+                if status != "OK":
+                    raise ReadEmailServicesException(f"fetching message ids failed: {response}")
+
+                for item in response:
+                    if isinstance(item, tuple):
+                        message_id = self.get_message_id(item[1])
+                        if message_id:
+                            message_ids.add(message_id)
+        return message_ids
+
+    @staticmethod
+    def get_message_id(raw: bytes) -> str:
+        # antetul poate fi impartit pe mai multe linii; identificatorul este comparat fara spatii
+        match = re.search(rb"(?im)^message-id:[ \t]*((?:.*)(?:\r?\n[ \t].*)*)", raw.split(b"\r\n\r\n", 1)[0])
+        if not match:
+            return ""
+        return re.sub(rb"\s+", b"", match.group(1)).decode("utf-8", "replace")
+
+    def append_messages(self, mailbox: str, messages: list) -> int:
+        # adauga mesajele (mesaj brut, FLAGS, INTERNALDATE ca timestamp) in mailbox; cu MULTIAPPEND toate
+        # mesajele sunt trimise intr-o singura comanda, altfel cate o comanda APPEND pe aceeasi conexiune
+        if not isinstance(mailbox, str) or not isinstance(messages, list):
+            raise ReadEmailServicesException(
+                f"wrong arg types: {type(mailbox)}, {type(messages)}; (str, list) required"
+            )
+        if not messages:
+            return 0
+
+        with self.__connection() as connection:
+            if self.has_capability("MULTIAPPEND"):
+                self.__append(connection, mailbox, messages)
+            else:
+                for message in messages:
+                    self.__append(connection, mailbox, [message])
+        return len(messages)
+
+    def __append(self, connection: "ImapConnection", mailbox: str, messages: list) -> None:
+        # imaplib accepta un singur literal pe comanda, asa ca APPEND este scris direct pe socket;
+        # cu LITERAL+ literalele nu mai asteapta confirmarea serverului ("+") inainte de a fi trimise
+        server = connection.server
+        literal_plus = self.has_capability("LITERAL+")
+        tag = server._new_tag()
+        try:
+            command = tag + b" APPEND " + ('"' + mailbox + '"').encode("utf-8")
+            for raw, flags, internaldate in messages:
+                raw = re.sub(rb"\r\n|\r|\n", b"\r\n", raw)
+                flags = " ".join(flag for flag in flags if flag.lower() != "\\recent")
+                command += f" ({flags}) {imaplib.Time2Internaldate(internaldate)} ".encode("utf-8")
+                command += b"{%d%s}\r\n" % (len(raw), b"+" if literal_plus else b"")
+
+                server.send(command)
+                if not literal_plus:
+                    self.__wait_for_continuation(server, tag)
+                server.send(raw)
+                command = b""
+            server.send(b"\r\n")
+
+            while True:
+                line = server._get_line()
+                if line.startswith(tag + b" "):
+                    break
+            status = line.split(b" ", 2)[1]
+            if status != b"OK":
+                raise ReadEmailServicesException(f"append failed: {line.decode('utf-8', 'replace')}")
+        finally:
+            server.tagged_commands.pop(tag, None)
+
+    @staticmethod
+    def __wait_for_continuation(server: imaplib.IMAP4, tag: bytes) -> None:
+        while True:
+            line = server._get_line()
+            if line.startswith(b"+"):
+                return
+            if line.startswith(tag + b" "):
+                raise ReadEmailServicesException(f"append rejected: {line.decode('utf-8', 'replace')}")
+
+    def set_flags(self, uids: list, flags: list, mailbox: str = None, add: bool = True) -> bool:
+        # adauga (sau elimina) FLAGS pentru toate mesajele, cu o singura comanda STORE pentru fiecare set de UID-uri
+        if not isinstance(uids, list) or not isinstance(flags, list):
+            raise ReadEmailServicesException(f"wrong arg types: {type(uids)}, {type(flags)}; (list, list) required")
+        if not uids or not flags:
+            return True
+
+        mailbox = mailbox or self.__mailbox
+        try:
+            with self.__connection(mailbox) as connection:
+                response = self.__uid_command(connection, "STORE", uids, ("+" if add else "-") + "FLAGS",
+                                              "(" + " ".join(flags) + ")")
+                uidvalidity = connection.uidvalidity
+        except Exception:
+            self.__output(colored(f"[-] flags updating failed for {len(uids)} messages", "red"))
+            return False
+
+        # serverul intoarce noile FLAGS ale fiecarui mesaj, folosite pentru actualizarea cache-ului
+        changed_flags = dict()
+        for item in response:
+            if isinstance(item, tuple):
+                item = item[0]
+            uid = re.search(rb"UID (\d+)", item or b"")
+            uid_flags = re.search(rb"FLAGS \(([^)]*)\)", item or b"")
+            if uid and uid_flags:
+                changed_flags[int(uid.group(1))] = uid_flags.group(1).decode("utf-8").split()
+
+        if self.__headers_cache and uidvalidity and changed_flags:
+            self.__headers_cache.update_flags(self.__account, mailbox, uidvalidity, changed_flags)
+        self.__output(f"[+] flags {' '.join(flags)} {'added to' if add else 'removed from'} {len(uids)} messages")
+        return True
+
+    def move_messages(self, uids: list, target: str, mailbox: str = None) -> bool:
+        # fara extensia MOVE, mesajele sunt copiate, marcate ca sterse si eliminate din mailbox-ul sursa
+        if not isinstance(uids, list) or not isinstance(target, str):
+            raise ReadEmailServicesException(f"wrong arg types: {type(uids)}, {type(target)}; (list, str) required")
+        if not uids:
+            return True
+
+        mailbox = mailbox or self.__mailbox
+        try:
+            with self.__connection(mailbox) as connection:
+                if self.has_capability("MOVE"):
+                    self.__uid_command(connection, "MOVE", uids, '"' + target + '"')
+                else:
+                    self.__uid_command(connection, "COPY", uids, '"' + target + '"')
+                    self.__expunge(connection, uids)
+                self.__forget_messages(connection, mailbox, uids)
+        except Exception:
+            self.__output(colored(f"[-] moving {len(uids)} messages to '{target}' failed", "red"))
+            return False
+
+        self.__output(f"[+] {len(uids)} messages moved from '{mailbox}' to '{target}'")
+        return True
+
+    def delete_messages(self, uids: list, mailbox: str = None) -> bool:
+        if not isinstance(uids, list):
+            raise ReadEmailServicesException(f"wrong arg type: {type(uids)}; list required")
+        if not uids:
+            return True
+
+        mailbox = mailbox or self.__mailbox
+        try:
+            with self.__connection(mailbox) as connection:
+                self.__expunge(connection, uids)
+                self.__forget_messages(connection, mailbox, uids)
+        except Exception:
+            self.__output(colored(f"[-] deleting {len(uids)} messages failed", "red"))
+            return False
+
+        self.__output(f"[+] {len(uids)} messages deleted from '{mailbox}'")
+        return True
+
+    def __uid_command(self, connection: "ImapConnection", command: str, uids: list, *arguments: str) -> list:
+        # setul de UID-uri este impartit astfel incat nicio linie de comanda sa nu depaseasca limita serverelor
+        response = list()
+        for uid_set in self.make_uid_sets(uids):
+            status, data = connection.server.uid(command, uid_set, *arguments)
+            if status != "OK":
+                raise ReadEmailServicesException(f"UID {command} failed: {data}")
+            response.extend(item for item in data if item)
+        return response
+
+    def __expunge(self, connection: "ImapConnection", uids: list) -> None:
+        self.__uid_command(connection, "STORE", uids, "+FLAGS.SILENT", "(\\Deleted)")
+        if self.has_capability("UIDPLUS"):
+            self.__uid_command(connection, "EXPUNGE", uids)
+        else:
+            # fara UIDPLUS, EXPUNGE elimina si alte mesaje marcate anterior ca sterse
+            status, response = connection.server.expunge()
+            if status != "OK":
+                raise ReadEmailServicesException(f"expunge failed: {response}")
+
+    def __forget_messages(self, connection: "ImapConnection", mailbox: str, uids: list) -> None:
+        # notificarile EXPUNGE/VANISHED generate de comanda sunt eliminate, pentru ca resincronizarea
+        # urmatoare sa nu numere din nou mesajele deja scoase din starea locala
+        for name in ("EXPUNGE", "VANISHED"):
+            connection.server.response(name)
+
+        state = self.__mailbox_states.get(mailbox)
+        if state and state.uidvalidity == connection.uidvalidity:
+            state.uids.difference_update(uids)
+        if self.__headers_cache and connection.uidvalidity:
+            self.__headers_cache.remove_headers(self.__account, mailbox, connection.uidvalidity, uids)
+        if self.__search_index and connection.uidvalidity:
+            self.__search_index.remove(self.__account, mailbox, connection.uidvalidity, uids)
+
     def logout(self):
         try:
-            self.__server.logout()
+            self.__mailbox_states.clear()
+            self.__uidvalidities.clear()
+            if self.__body_cache:
+                self.__body_cache.clear()
+            if self.__pool:
+                self.__pool.close()
+                self.__pool = None
+            with self.__prefetch_lock:
+                if self.__prefetch_connection:
+                    self.__prefetch_connection.server.logout()
+                    self.__prefetch_connection = None
+            if self.__server:
+                self.__server.logout()
+                self.__server = None
             self.__output("[+] IMAP logout succeeded")
             self.__is_connected = False
             return True
@@ -268,8 +1726,1190 @@ class ReadEmailServices:
             return False
 
 
+class ImapConnection(object):
+    def __init__(self, server: imaplib.IMAP4):
+        self.server = server
+        self.mailbox = None  # mailbox-ul selectat pe aceasta conexiune
+        self.uidvalidity = 0
+        self.uidnext = 0
+        self.highestmodseq = 0
+
+
+class ImapConnectionPool:
+    def __init__(self, factory: typing.Callable[[], imaplib.IMAP4], size: int = 4):
+        if not callable(factory):
+            raise ImapConnectionPoolException(f"wrong arg type: {type(factory)}; callable required")
+        if not isinstance(size, int) or size < 1:
+            raise ImapConnectionPoolException(f"wrong arg: {size}; positive int required")
+
+        self.__factory = factory
+        self.__size = size
+        self.__idle_connections = list()
+        self.__connections_count = 0
+        self.__condition = threading.Condition()
+        self.__closed = False
+
+    def add(self, server: imaplib.IMAP4) -> None:
+        with self.__condition:
+            self.__connections_count += 1
+            self.__idle_connections.append(ImapConnection(server))
+            self.__condition.notify()
+
+    @contextlib.contextmanager
+    def connection(self, mailbox: str = None):
+        connection = self.__acquire(mailbox)
+        try:
+            yield connection
+        except (imaplib.IMAP4.abort, OSError):
+            # conexiunea este compromisa si nu mai este returnata in pool
+            self.__discard(connection)
+            raise
+        except BaseException:
+            self.__release(connection)
+            raise
+        else:
+            self.__release(connection)
+
+    def __acquire(self, mailbox: str = None) -> ImapConnection:
+        with self.__condition:
+            while True:
+                if self.__closed:
+                    raise ImapConnectionPoolException("connection pool closed")
+
+                # se prefera o conexiune pe care mailbox-ul cerut este deja selectat
+                for connection in self.__idle_connections:
+                    if connection.mailbox == mailbox:
+                        self.__idle_connections.remove(connection)
+                        return connection
+                if self.__idle_connections:
+                    return self.__idle_connections.pop(0)
+
+                if self.__connections_count < self.__size:
+                    self.__connections_count += 1
+                    break
+                self.__condition.wait()
+
+        try:
+            return ImapConnection(self.__factory())
+        except BaseException:
+            with self.__condition:
+                self.__connections_count -= 1
+                self.__condition.notify()
+            raise
+
+    def __release(self, connection: ImapConnection) -> None:
+        with self.__condition:
+            if not self.__closed:
+                self.__idle_connections.append(connection)
+                self.__condition.notify()
+                return
+        self.__discard(connection)
+
+    def __discard(self, connection: ImapConnection) -> None:
+        try:
+            connection.server.logout()
+        except Exception:
+            pass
+
+        with self.__condition:
+            self.__connections_count -= 1
+            self.__condition.notify()
+
+    def close(self) -> None:
+        with self.__condition:
+            self.__closed = True
+            connections, self.__idle_connections = self.__idle_connections, list()
+            self.__condition.notify_all()
+
+        for connection in connections:
+            self.__discard(connection)
+
+
+class IdleListener:
+    IDLE_TIMEOUT = 29 * 60
+    POLL_INTERVAL = 60
+
+    def __init__(self, callback: typing.Callable[[str, int], None]):
+        if not callable(callback):
+            raise IdleListenerException(f"wrong arg type: {type(callback)}; callable required")
+
+        self.__callback = callback
+        self.__server = None
+        self.__thread = None
+        self.__stop_event = threading.Event()
+        self.__mailbox = str()
+        self.__pending_mailbox = None
+        self.__buffer = b""
+        self.__show_details = True
+
+    def show_details(self, show_details: bool) -> None:
+        if not isinstance(show_details, bool):
+            raise IdleListenerException(f"wrong arg type: {type(show_details)}; {bool} required")
+
+        self.__show_details = show_details
+
+    def __output(self, output: typing.Any) -> None:
+        if self.__show_details:
+            print(output)
+
+    def start(self, address: str, port: int, username: str, password: str, mailbox: str = "INBOX") -> bool:
+        if not isinstance(address, str) or not isinstance(port, int):
+            raise IdleListenerException(f"wrong arg type: {type(address)}, {type(port)}; (str, int) required")
+
+        self.stop()
+
+        # se foloseste o conexiune separata, astfel incat comenzile obisnuite nu asteapta dupa IDLE
+        try:
+            self.__server = imaplib.IMAP4_SSL(address, port)
+            self.__server.login(username, password)
+            self.__server.select('"' + mailbox + '"', readonly=True)
+        except Exception:
+            self.__output(colored(f"[-] IDLE listener connection to '{address}' failed", "red"))
+            return False
+
+        self.__mailbox = mailbox
+        self.__pending_mailbox = None
+        self.__buffer = b""
+        self.__stop_event.clear()
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+
+        self.__output(f"[+] IDLE listener started on mailbox: {mailbox}")
+        return True
+
+    def set_mailbox(self, mailbox: str) -> None:
+        if not isinstance(mailbox, str):
+            raise IdleListenerException(f"wrong arg type: {type(mailbox)}; str required")
+
+        if mailbox != self.__mailbox:
+            self.__pending_mailbox = mailbox
+
+    def is_running(self) -> bool:
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def stop(self) -> None:
+        self.__stop_event.set()
+        if self.__thread and self.__thread is not threading.current_thread():
+            self.__thread.join(5)
+        self.__thread = None
+
+    def __run(self) -> None:
+        try:
+            while not self.__stop_event.is_set():
+                if self.__pending_mailbox is not None:
+                    self.__mailbox, self.__pending_mailbox = self.__pending_mailbox, None
+                    self.__server.select('"' + self.__mailbox + '"', readonly=True)
+
+                if "IDLE" in self.__server.capabilities:
+                    self.__idle()
+                else:
+                    self.__poll()
+        except Exception:
+            if not self.__stop_event.is_set():
+                self.__output(colored("[-] IDLE listener connection lost", "red"))
+
+        try:
+            self.__server.logout()
+        except Exception:
+            pass
+
+    def __idle(self) -> None:
+        tag = self.__server._new_tag()
+        self.__server.send(tag + b" IDLE\r\n")
+
+        line = self.__read_line(self.POLL_INTERVAL)
+        if line is None or not line.startswith(b"+"):
+            raise IdleListenerException(f"IDLE rejected: {line}")
+
+        # serverele inchid conexiunile IDLE dupa 30 de minute, asa ca IDLE este reluat periodic
+        deadline = time.monotonic() + self.IDLE_TIMEOUT
+        while not self.__stop_event.is_set() and self.__pending_mailbox is None and time.monotonic() < deadline:
+            line = self.__read_line(1.0)
+            if line:
+                self.__dispatch(line)
+
+        self.__server.send(b"DONE\r\n")
+        while True:
+            line = self.__read_line(self.POLL_INTERVAL)
+            if line is None:
+                raise IdleListenerException("IDLE termination timed out")
+            if line.startswith(tag):
+                break
+            self.__dispatch(line)
+
+        self.__server.tagged_commands.pop(tag, None)
+
+    def __poll(self) -> None:
+        if self.__stop_event.wait(self.POLL_INTERVAL):
+            return
+
+        self.__server.noop()
+        for name in ("EXISTS", "EXPUNGE", "FETCH"):
+            _, response = self.__server.response(name)
+            for data in response:
+                if data:
+                    self.__callback(name, int(data.split()[0]))
+
+    def __read_line(self, timeout: float) -> typing.Optional[bytes]:
+        # liniile sunt citite direct de pe socket pentru a putea verifica periodic daca listener-ul a fost oprit
+        while b"\r\n" not in self.__buffer:
+            sock = self.__server.sock
+            if not sock.pending():
+                ready, _, _ = select.select([sock], [], [], timeout)
+                if not ready:
+                    return None
+
+            data = sock.recv(4096)
+            if not data:
+                raise IdleListenerException("connection closed by server")
+            self.__buffer += data
+
+        line, self.__buffer = self.__buffer.split(b"\r\n", 1)
+        return line
+
+    def __dispatch(self, line: bytes) -> None:
+        match = re.match(rb"\* (\d+) (EXISTS|EXPUNGE|FETCH)", line)
+        if match:
+            self.__callback(match.group(2).decode("utf-8"), int(match.group(1)))
+        elif line.startswith(b"* VANISHED"):
+            self.__callback("VANISHED", 0)
+
+
+class IndexCrawler:
+    def __init__(self, read_email_services: ReadEmailServices, bodies: bool = True, batch_size: int = 50):
+        if not isinstance(read_email_services, ReadEmailServices):
+            raise IndexCrawlerException(f"wrong arg type: {type(read_email_services)}; {ReadEmailServices} required")
+        if not isinstance(bodies, bool) or not isinstance(batch_size, int):
+            raise IndexCrawlerException(f"wrong arg types: {type(bodies)}, {type(batch_size)}; (bool, int) required")
+
+        self.__read_email_services = read_email_services
+        self.__bodies = bodies
+        self.__batch_size = batch_size
+        self.__indexed_mailboxes = set()  # mailbox-urile parcurse complet de la ultima pornire
+        self.__thread = None
+        self.__stop_event = threading.Event()
+        self.__show_details = True
+
+    def show_details(self, show_details: bool) -> None:
+        if not isinstance(show_details, bool):
+            raise IndexCrawlerException(f"wrong arg type: {type(show_details)}; {bool} required")
+
+        self.__show_details = show_details
+
+    def __output(self, output: typing.Any) -> None:
+        if self.__show_details:
+            print(output)
+
+    def start(self, mailboxes: list) -> None:
+        if not isinstance(mailboxes, list):
+            raise IndexCrawlerException(f"wrong arg type: {type(mailboxes)}; list required")
+
+        self.stop()
+        self.__stop_event.clear()
+        self.__indexed_mailboxes.clear()
+        self.__thread = threading.Thread(target=self.__run, args=(list(mailboxes),), daemon=True)
+        self.__thread.start()
+
+    def is_running(self) -> bool:
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def is_indexed(self, mailbox: str, bodies: bool = False) -> bool:
+        # indexul local poate inlocui cautarea pe server doar pentru mailbox-urile parcurse complet;
+        # cautarea in text necesita si indexarea corpurilor
+        return mailbox in self.__indexed_mailboxes and (self.__bodies or not bodies)
+
+    def stop(self) -> None:
+        self.__stop_event.set()
+        if self.__thread and self.__thread is not threading.current_thread():
+            self.__thread.join(5)
+        self.__thread = None
+
+    def __run(self, mailboxes: list) -> None:
+        # mailbox-urile sunt parcurse pe rand, iar indexarea poate fi oprita intre doua loturi
+        for mailbox in mailboxes:
+            if self.__stop_event.is_set():
+                return
+
+            try:
+                indexed = self.__read_email_services.index_mailbox(mailbox, self.__bodies, self.__batch_size,
+                                                                   self.__stop_event.is_set)
+            except Exception:
+                self.__output(colored(f"[-] indexing failed: {mailbox}", "red"))
+                continue
+
+            if not self.__stop_event.is_set():
+                self.__indexed_mailboxes.add(mailbox)
+            self.__output(f"[+] indexing finished: {mailbox}, {indexed} messages indexed")
+
+
+class BodyPrefetcher:
+    DELAY = 0.3  # descarcarea incepe doar daca utilizatorul nu a trecut intre timp la alt mesaj
+
+    def __init__(self, read_email_services: ReadEmailServices):
+        if not isinstance(read_email_services, ReadEmailServices):
+            raise BodyPrefetcherException(f"wrong arg type: {type(read_email_services)}; {ReadEmailServices} required")
+
+        self.__read_email_services = read_email_services
+        self.__condition = threading.Condition()
+        self.__pending = None  # (mailbox, UID-uri) pentru urmatoarea descarcare
+        self.__generation = 0  # creste la fiecare programare noua, anuland descarcarile in curs
+        self.__running = False
+        self.__thread = None
+        self.__show_details = True
+
+    def show_details(self, show_details: bool) -> None:
+        if not isinstance(show_details, bool):
+            raise BodyPrefetcherException(f"wrong arg type: {type(show_details)}; {bool} required")
+
+        self.__show_details = show_details
+
+    def __output(self, output: typing.Any) -> None:
+        if self.__show_details:
+            print(output)
+
+    def start(self) -> None:
+        self.stop()
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+
+    def schedule(self, mailbox: str, uids: list) -> None:
+        # inlocuieste lista precedenta; mesajele ei care nu au fost inca descarcate sunt abandonate
+        if not isinstance(mailbox, str) or not isinstance(uids, list):
+            raise BodyPrefetcherException(f"wrong arg types: {type(mailbox)}, {type(uids)}; (str, list) required")
+
+        with self.__condition:
+            self.__generation += 1
+            self.__pending = (mailbox, list(uids))
+            self.__condition.notify()
+
+    def cancel(self) -> None:
+        with self.__condition:
+            self.__generation += 1
+            self.__pending = None
+            self.__condition.notify()
+
+    def is_running(self) -> bool:
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def stop(self) -> None:
+        with self.__condition:
+            self.__running = False
+            self.__generation += 1
+            self.__pending = None
+            self.__condition.notify()
+
+        if self.__thread and self.__thread is not threading.current_thread():
+            self.__thread.join(5)
+        self.__thread = None
+
+    def __run(self) -> None:
+        while True:
+            with self.__condition:
+                while self.__running and self.__pending is None:
+                    self.__condition.wait()
+                if not self.__running:
+                    return
+
+                (mailbox, uids), self.__pending = self.__pending, None
+                generation = self.__generation
+
+                self.__condition.wait(self.DELAY)
+                if generation != self.__generation:
+                    continue
+
+            # intre doua mesaje se verifica daca programarea a fost inlocuita sau anulata
+            for uid in uids:
+                if generation != self.__generation:
+                    break
+
+                try:
+                    self.__read_email_services.prefetch_body(uid, mailbox)
+                except Exception:
+                    self.__output(colored(f"[-] body prefetching failed: {mailbox}, {uid}", "red"))
+                    break
+
+
+class EmailAccount(object):
+    def __init__(self, name: str, imap_host: str, imap_port: int = 993, smtp_host: str = "", smtp_port: int = 465,
+                 username: str = "", password: str = "", mailboxes: list = None, sync_interval: float = 300,
+                 headers_cache: HeadersCache = None):
+        if not isinstance(name, str) or not isinstance(imap_host, str):
+            raise EmailAccountException(f"wrong arg types: {type(name)}, {type(imap_host)}; (str, str) required")
+        if not isinstance(sync_interval, (int, float)) or sync_interval <= 0:
+            raise EmailAccountException(f"wrong arg: {sync_interval}; positive number required")
+
+        self.name = name
+        self.imap_host = imap_host
+        self.imap_port = imap_port
+        self.smtp_host = smtp_host
+        self.smtp_port = smtp_port
+        self.username = username
+        self.password = password
+        self.mailboxes = list(mailboxes or ["INBOX"])
+        self.sync_interval = sync_interval  # intervalul minim (secunde) intre doua sincronizari ale contului
+
+        # fiecare cont are propriile servicii; in fundal este suficienta o singura conexiune IMAP
+        self.read_email_services = ReadEmailServices(headers_cache, pool_size=1)
+        self.send_email_services = SendEmailServices()
+
+    def has_credentials(self) -> bool:
+        return bool(self.username and self.password)
+
+
+class AccountSyncScheduler:
+    MAX_BACKOFF = 3600  # intervalul maxim (secunde) intre doua incercari pentru un cont cu erori
+    HEADERS_BATCH = 500  # numarul de header-e descarcate intr-o singura comanda FETCH
+
+    def __init__(self, callback: typing.Callable[[str, str, "MailboxChanges"], None], max_workers: int = 4):
+        if not callable(callback):
+            raise AccountSyncSchedulerException(f"wrong arg type: {type(callback)}; callable required")
+        if not isinstance(max_workers, int) or max_workers < 1:
+            raise AccountSyncSchedulerException(f"wrong arg: {max_workers}; positive int required")
+
+        self.__callback = callback
+        self.__max_workers = max_workers
+        self.__accounts = dict()  # nume -> EmailAccount
+        self.__next_sync = dict()  # nume -> momentul urmatoarei sincronizari permise
+        self.__failures = dict()  # nume -> numarul de erori consecutive
+        self.__running_syncs = set()
+        self.__lock = threading.Lock()
+        self.__wake_event = threading.Event()
+        self.__stop_event = threading.Event()
+        self.__executor = None
+        self.__thread = None
+        self.__show_details = True
+
+    def show_details(self, show_details: bool) -> None:
+        if not isinstance(show_details, bool):
+            raise AccountSyncSchedulerException(f"wrong arg type: {type(show_details)}; {bool} required")
+
+        self.__show_details = show_details
+
+    def __output(self, output: typing.Any) -> None:
+        if self.__show_details:
+            print(output)
+
+    def add_account(self, account: EmailAccount) -> None:
+        if not isinstance(account, EmailAccount):
+            raise AccountSyncSchedulerException(f"wrong arg type: {type(account)}; {EmailAccount} required")
+
+        with self.__lock:
+            self.__accounts[account.name] = account
+            self.__next_sync[account.name] = 0
+            self.__failures[account.name] = 0
+        self.__wake_event.set()
+
+    def get_accounts(self) -> list:
+        with self.__lock:
+            return list(self.__accounts.values())
+
+    def sync_now(self, name: str) -> None:
+        # cererea este tot supusa limitei: nu porneste o a doua sincronizare a contului in paralel
+        with self.__lock:
+            if name in self.__next_sync:
+                self.__next_sync[name] = 0
+        self.__wake_event.set()
+
+    def start(self) -> None:
+        self.stop()
+        self.__stop_event.clear()
+        self.__executor = concurrent.futures.ThreadPoolExecutor(self.__max_workers)
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+
+    def is_running(self) -> bool:
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def stop(self) -> None:
+        self.__stop_event.set()
+        self.__wake_event.set()
+        if self.__thread and self.__thread is not threading.current_thread():
+            self.__thread.join(5)
+        self.__thread = None
+
+        if self.__executor:
+            self.__executor.shutdown(wait=True, cancel_futures=True)
+            self.__executor = None
+
+        for account in self.get_accounts():
+            if account.read_email_services.is_connected():
+                account.read_email_services.logout()
+
+    def __run(self) -> None:
+        # conturile sunt sincronizate concurent, dar fiecare cont cel mult o data la sync_interval secunde
+        while not self.__stop_event.is_set():
+            now = time.monotonic()
+            with self.__lock:
+                due = [account for name, account in self.__accounts.items()
+                       if self.__next_sync[name] <= now and name not in self.__running_syncs]
+                for account in due:
+                    self.__running_syncs.add(account.name)
+                waiting = [next_sync for name, next_sync in self.__next_sync.items()
+                           if name not in self.__running_syncs]
+
+            for account in due:
+                self.__executor.submit(self.__sync, account)
+
+            self.__wake_event.wait(max(min(waiting, default=60) - time.monotonic(), 0.1))
+            self.__wake_event.clear()
+
+    def __sync(self, account: EmailAccount) -> None:
+        services = account.read_email_services
+        try:
+            if not services.is_connected():
+                services.show_details(self.__show_details)
+                if not services.connect_to_server(account.imap_host, account.imap_port) or \
+                        not services.login_to_server(account.username, account.password):
+                    raise AccountSyncSchedulerException(f"login failed: {account.name}")
+
+            for mailbox in account.mailboxes:
+                if self.__stop_event.is_set():
+                    break
+                # resincronizarea elimina din cache mesajele sterse; header-ele mesajelor noi sunt descarcate
+                # acum, astfel incat contul poate fi deschis fara a astepta serverul
+                changes = services.resync_mailbox(mailbox)
+                self.__fetch_new_headers(services, mailbox, changes.new_uids)
+                self.__callback(account.name, mailbox, changes)
+
+            failures = 0
+        except Exception:
+            self.__output(colored(f"[-] account sync failed: {account.name}", "red"))
+            failures = self.__failures[account.name] + 1
+            services.logout()
+
+        # dupa erori, intervalul creste exponential, pentru a nu suprasolicita serverul
+        delay = min(account.sync_interval * 2 ** failures, max(self.MAX_BACKOFF, account.sync_interval))
+        with self.__lock:
+            self.__failures[account.name] = failures
+            self.__next_sync[account.name] = time.monotonic() + delay
+            self.__running_syncs.discard(account.name)
+        self.__wake_event.set()
+
+    def __fetch_new_headers(self, services: ReadEmailServices, mailbox: str, uids: list) -> None:
+        # cele mai noi mesaje sunt descarcate primele; o oprire lasa in cache loturile deja terminate
+        uids = sorted(uids, reverse=True)
+        for i in range(0, len(uids), self.HEADERS_BATCH):
+            if self.__stop_event.is_set():
+                return
+            services.get_email_headers_by_uid(uids[i:i + self.HEADERS_BATCH], mailbox)
+
+
+class SmtpSessionPool:
+    # sesiunile SMTP folosite de trimiterile in paralel; prima este sesiunea principala, iar celelalte sunt
+    # deschise cu aceleasi date de autentificare doar cand toate cele existente sunt ocupate
+    def __init__(self, send_email_services: SendEmailServices, size: int = 3):
+        if not isinstance(send_email_services, SendEmailServices):
+            raise SmtpSessionPoolException(f"wrong arg type: {type(send_email_services)}; {SendEmailServices} required")
+        if not isinstance(size, int) or size < 1:
+            raise SmtpSessionPoolException(f"wrong arg: {size}; positive int required")
+
+        self.__main_session = send_email_services
+        self.__size = size
+        self.__sessions = [send_email_services]
+        self.__idle_sessions = [send_email_services]
+        self.__opening = 0
+        self.__condition = threading.Condition()
+        self.__closed = False
+
+    def get_size(self) -> int:
+        with self.__condition:
+            return len(self.__sessions)
+
+    @contextlib.contextmanager
+    def session(self):
+        session = self.__acquire()
+        try:
+            yield session
+        finally:
+            self.__release(session)
+
+    def __acquire(self) -> SendEmailServices:
+        while True:
+            with self.__condition:
+                while True:
+                    if self.__closed:
+                        raise SmtpSessionPoolException("session pool closed")
+                    if self.__idle_sessions:
+                        return self.__idle_sessions.pop(0)
+                    if len(self.__sessions) + self.__opening < self.__size:
+                        self.__opening += 1
+                        break
+                    self.__condition.wait()
+
+            session = self.__main_session.open_session()
+            with self.__condition:
+                self.__opening -= 1
+                if session is not None:
+                    self.__sessions.append(session)
+                    return session
+
+                # serverul refuza sesiuni suplimentare (de ex. limita de conexiuni simultane),
+                # asa ca pool-ul ramane la sesiunile deja deschise
+                self.__size = max(len(self.__sessions) + self.__opening, 1)
+                self.__condition.notify_all()
+
+    def __release(self, session: SendEmailServices) -> None:
+        with self.__condition:
+            if not self.__closed:
+                self.__idle_sessions.append(session)
+                self.__condition.notify()
+                return
+            self.__sessions.remove(session)
+        if session is not self.__main_session:
+            session.logout()
+
+    def close(self) -> None:
+        # sesiunea principala ramane deschisa; doar sesiunile suplimentare sunt inchise
+        with self.__condition:
+            self.__closed = True
+            sessions, self.__idle_sessions = self.__idle_sessions, list()
+            for session in sessions:
+                self.__sessions.remove(session)
+            self.__condition.notify_all()
+
+        for session in sessions:
+            if session is not self.__main_session:
+                session.logout()
+
+
+class OutboxSender:
+    MAX_ATTEMPTS = 8
+    RETRY_DELAY = 30  # intarzierea (secunde) dupa prima eroare; se dubleaza la fiecare incercare
+    MAX_BACKOFF = 3600
+    POLL_INTERVAL = 60
+
+    def __init__(self, send_email_services: SendEmailServices, outbox: Outbox, account: str, concurrency: int = 1,
+                 callback: typing.Callable[[int, str], None] = None):
+        if not isinstance(send_email_services, SendEmailServices):
+            raise OutboxSenderException(f"wrong arg type: {type(send_email_services)}; {SendEmailServices} required")
+        if not isinstance(outbox, Outbox):
+            raise OutboxSenderException(f"wrong arg type: {type(outbox)}; {Outbox} required")
+        if not isinstance(concurrency, int) or concurrency < 1:
+            raise OutboxSenderException(f"wrong arg: {concurrency}; positive int required")
+        if callback is not None and not callable(callback):
+            raise OutboxSenderException(f"wrong arg type: {type(callback)}; callable required")
+
+        self.__send_email_services = send_email_services
+        self.__outbox = outbox
+        self.__account = account
+        self.__concurrency = concurrency
+        self.__callback = callback
+        self.__sessions = None
+        self.__in_flight = 0
+        self.__lock = threading.Lock()
+        self.__wake_event = threading.Event()
+        self.__stop_event = threading.Event()
+        self.__executor = None
+        self.__thread = None
+        self.__show_details = True
+
+    def show_details(self, show_details: bool) -> None:
+        if not isinstance(show_details, bool):
+            raise OutboxSenderException(f"wrong arg type: {type(show_details)}; {bool} required")
+
+        self.__show_details = show_details
+
+    def __output(self, output: typing.Any) -> None:
+        if self.__show_details:
+            print(output)
+
+    def enqueue(self, email_message: typing.Union[MIMEText, MIMEMultipart]) -> int:
+        # mesajul este salvat pe disc inainte de trimitere, deci nu se pierde daca trimiterea esueaza
+        if not isinstance(email_message, (MIMEText, MIMEMultipart)):
+            raise OutboxSenderException(
+                f"wrong arg type: {type(email_message)}; {MIMEText} or {MIMEMultipart} required"
+            )
+
+        sender, recipients, message = SendEmailServices.make_envelope(email_message)
+        raw = SendEmailServices.iter_message_bytes(message)
+        if not message.is_multipart():
+            raw = b"".join(raw)  # mesajele fara atasamente sunt mici si raman in baza de date
+        try:
+            message_id = self.__outbox.add(self.__account, sender, recipients, raw)
+        except OutboxException as e:
+            raise OutboxSenderException(f"message not queued: {e}")
+
+        self.__output(f"[+] email queued in outbox: {message_id}")
+        self.__wake_event.set()
+        return message_id
+
+    def get_queue_depth(self) -> int:
+        return self.__outbox.get_depth(self.__account)
+
+    def get_status(self, message_id: int) -> typing.Optional[tuple]:
+        return self.__outbox.get_status(message_id)
+
+    def get_messages(self, status: str = None) -> list:
+        return self.__outbox.get_messages(self.__account, status)
+
+    def retry_failed(self) -> None:
+        for message_id, _, _, _ in self.__outbox.get_messages(self.__account, Outbox.FAILED):
+            self.__outbox.requeue(message_id)
+        self.__wake_event.set()
+
+    def start(self) -> None:
+        self.stop()
+        self.__stop_event.clear()
+        self.__sessions = SmtpSessionPool(self.__send_email_services, self.__concurrency)
+        self.__executor = concurrent.futures.ThreadPoolExecutor(self.__concurrency)
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+
+    def is_running(self) -> bool:
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def stop(self) -> None:
+        self.__stop_event.set()
+        self.__wake_event.set()
+        if self.__thread and self.__thread is not threading.current_thread():
+            self.__thread.join(5)
+        self.__thread = None
+
+        # mesajele deja preluate sunt trimise complet, cele ramase in coada asteapta urmatoarea pornire
+        if self.__executor:
+            self.__executor.shutdown(wait=True)
+            self.__executor = None
+
+        if self.__sessions:
+            self.__sessions.close()
+            self.__sessions = None
+
+    def __run(self) -> None:
+        while not self.__stop_event.is_set():
+            with self.__lock:
+                free = self.__concurrency - self.__in_flight
+            messages = self.__outbox.claim(self.__account, free) if free > 0 else list()
+
+            with self.__lock:
+                self.__in_flight += len(messages)
+            for message in messages:
+                self.__executor.submit(self.__send, *message)
+
+            # se asteapta pana la urmatoarea reincercare programata sau pana la un mesaj nou
+            next_attempt = self.__outbox.get_next_attempt(self.__account)
+            timeout = self.POLL_INTERVAL if next_attempt is None else next_attempt - time.time()
+            self.__wake_event.wait(min(max(timeout, 0.1), self.POLL_INTERVAL))
+            self.__wake_event.clear()
+
+    def __send(self, message_id: int, sender: str, recipients: list, raw: typing.Union[bytes, str],
+               attempts: int) -> None:
+        unavailable = False
+        try:
+            # mesajele din spool sunt citite din fisier pe bucati, direct catre socket-ul SMTP
+            with open(raw, "rb") if isinstance(raw, str) else contextlib.nullcontext(raw) as content, \
+                    self.__sessions.session() as session:
+                sent = session.send_raw_email(sender, recipients, content)
+                code, error = session.get_last_error()
+        except OSError as e:
+            # fisierul din spool nu mai exista, deci mesajul nu mai poate fi trimis
+            sent, unavailable, code, error = False, True, 0, f"spooled message unavailable: {e}"
+
+        if sent:
+            self.__outbox.mark_sent(message_id)
+            status = Outbox.SENT
+        elif unavailable or 500 <= code < 600 or attempts + 1 >= self.MAX_ATTEMPTS:
+            # erorile permanente (5xx) nu sunt reincercate
+            self.__outbox.mark_failed(message_id, f"{code} {error}".strip())
+            status = Outbox.FAILED
+            self.__output(colored(f"[-] outbox message {message_id} failed: {code} {error}", "red"))
+        else:
+            delay = min(self.RETRY_DELAY * 2 ** attempts, self.MAX_BACKOFF)
+            self.__outbox.retry(message_id, f"{code} {error}".strip(), time.time() + delay)
+            status = Outbox.QUEUED
+            self.__output(colored(f"[-] outbox message {message_id} will be retried in {delay} s", "red"))
+
+        with self.__lock:
+            self.__in_flight -= 1
+        self.__wake_event.set()
+
+        if self.__callback:
+            self.__callback(message_id, status)
+
+
+class BulkSender:
+    MAX_ATTEMPTS = 3
+    THROTTLE_DELAY = 30  # pauza (secunde) pentru toate sesiunile dupa un raspuns 4xx al serverului
+
+    def __init__(self, send_email_services: SendEmailServices, sessions: int = 3, rate: float = 0,
+                 callback: typing.Callable[[str, bool], None] = None):
+        if not isinstance(send_email_services, SendEmailServices):
+            raise BulkSenderException(f"wrong arg type: {type(send_email_services)}; {SendEmailServices} required")
+        if not isinstance(sessions, int) or sessions < 1:
+            raise BulkSenderException(f"wrong arg: {sessions}; positive int required")
+        if not isinstance(rate, (int, float)) or rate < 0:
+            raise BulkSenderException(f"wrong arg: {rate}; non-negative number required")
+        if callback is not None and not callable(callback):
+            raise BulkSenderException(f"wrong arg type: {type(callback)}; callable required")
+
+        self.__send_email_services = send_email_services
+        self.__sessions = sessions
+        self.__rate = rate  # numarul maxim de mesaje pe secunda, pentru toate sesiunile; 0 inseamna fara limita
+        self.__callback = callback
+        self.__next_slot = 0.0
+        self.__lock = threading.Lock()
+        self.__stop_event = threading.Event()
+        self.__show_details = True
+
+    def show_details(self, show_details: bool) -> None:
+        if not isinstance(show_details, bool):
+            raise BulkSenderException(f"wrong arg type: {type(show_details)}; {bool} required")
+
+        self.__show_details = show_details
+
+    def __output(self, output: typing.Any) -> None:
+        if self.__show_details:
+            print(output)
+
+    @staticmethod
+    def render(template: str, fields: dict) -> str:
+        # campurile lipsa raman neinlocuite ($nume), in loc sa opreasca intreaga trimitere
+        return string.Template(template).safe_substitute(fields)
+
+    def send(self, from_address: str, subject: str, text: str, recipients: typing.Iterable,
+             subtype: str = "plain", charset: str = "utf-8") -> tuple:
+        # fiecare destinatar este o adresa sau un dictionar cu cheia "to" si campurile folosite in sabloane;
+        # intoarce (numarul mesajelor trimise, lista (adresa, eroare) a celor esuate)
+        if not isinstance(from_address, str) or not isinstance(subject, str) or not isinstance(text, str):
+            raise BulkSenderException(
+                f"wrong arg types: ({type(from_address)}, {type(subject)}, {type(text)}); (str, str, str) required"
+            )
+
+        self.__stop_event.clear()
+        self.__next_slot = 0.0
+        results = {"sent": 0, "failed": list()}
+        pool = SmtpSessionPool(self.__send_email_services, self.__sessions)
+
+        # destinatarii sunt cititi din flux, iar mesajele generate, doar pe masura ce pot fi trimise
+        in_flight = threading.BoundedSemaphore(self.__sessions * 2)
+        try:
+            with concurrent.futures.ThreadPoolExecutor(self.__sessions) as executor:
+                for fields in recipients:
+                    if isinstance(fields, str):
+                        fields = {"to": fields}
+                    if not isinstance(fields, dict) or not fields.get("to"):
+                        # un destinatar invalid este raportat ca esuat, fara a opri restul trimiterii
+                        self.__record_failure(results, str(fields), "wrong recipient; address or dict with 'to' "
+                                                                   "required")
+                        continue
+
+                    acquired = False
+                    while not acquired and not self.__stop_event.is_set():
+                        acquired = in_flight.acquire(timeout=1)
+                    if self.__stop_event.is_set():
+                        # locul obtinut chiar inainte de oprire nu mai este folosit, deci este eliberat
+                        if acquired:
+                            in_flight.release()
+                        break
+
+                    executor.submit(self.__send_one, pool, in_flight, results, from_address, subject, text, fields,
+                                    subtype, charset)
+        finally:
+            pool.close()
+
+        self.__output(f"[+] bulk send finished: {results['sent']} sent, {len(results['failed'])} failed")
+        return results["sent"], results["failed"]
+
+    def stop(self) -> None:
+        # mesajele deja preluate de sesiuni sunt trimise complet, restul destinatarilor nu mai sunt cititi
+        self.__stop_event.set()
+
+    def __wait_for_slot(self, delay: float = 0) -> bool:
+        # limita de frecventa este comuna tuturor sesiunilor: fiecare mesaj primeste un moment de trimitere
+        with self.__lock:
+            now = time.monotonic()
+            if delay:
+                self.__next_slot = max(self.__next_slot, now + delay)
+            slot = max(self.__next_slot, now)
+            self.__next_slot = slot + (1 / self.__rate if self.__rate else 0)
+
+        return not self.__stop_event.wait(max(slot - time.monotonic(), 0))
+
+    def __send_one(self, pool: SmtpSessionPool, in_flight: threading.BoundedSemaphore, results: dict,
+                   from_address: str, subject: str, text: str, fields: dict, subtype: str, charset: str) -> None:
+        address = fields["to"]
+        sent, code, error = False, 0, "stopped"
+        try:
+            email_message = SendEmailServices.create_email_message(
+                from_address, address, self.render(subject, fields), self.render(text, fields),
+                fields.get("cc", ""), fields.get("bcc", ""), subtype, charset
+            )
+
+            delay = 0
+            for attempt in range(self.MAX_ATTEMPTS):
+                if not self.__wait_for_slot(delay):
+                    break
+                with pool.session() as session:
+                    sent = session.send_email(email_message)
+                    code, error = session.get_last_error()
+                # 4xx inseamna de obicei depasirea limitelor furnizorului; toate sesiunile incetinesc
+                if sent or not 400 <= code < 500:
+                    break
+                delay = self.THROTTLE_DELAY * 2 ** attempt
+        except Exception as e:
+            error = str(e)
+        finally:
+            in_flight.release()
+
+        if not sent:
+            self.__record_failure(results, address, f"{code} {error}".strip())
+            return
+
+        with self.__lock:
+            results["sent"] += 1
+        if self.__callback:
+            self.__callback(address, True)
+
+    def __record_failure(self, results: dict, address: str, error: str) -> None:
+        with self.__lock:
+            results["failed"].append((address, error))
+        if self.__callback:
+            self.__callback(address, False)
+
+
+class EmailHeaders(object):
+    # inregistrare compacta pentru lista de mail-uri; sirurile afisate sunt calculate o singura data
+    __slots__ = ("uid", "flags", "size", "from_address", "to_address", "subject", "date", "content_type",
+                 "display_from", "display_subject", "display_date")
+
+    def __init__(self, uid: int = 0, flags: tuple = (), size: int = 0, from_address: str = "", to_address: str = "",
+                 subject: str = "", date: str = "", content_type: str = "text/plain"):
+        self.uid = uid
+        self.flags = flags
+        self.size = size
+        self.from_address = from_address
+        self.to_address = to_address
+        self.subject = subject
+        self.date = date
+        self.content_type = content_type
+        self.display_from = str()
+        self.display_subject = str()
+        self.display_date = str()
+
+    @staticmethod
+    def make_flags(flags: list) -> tuple:
+        # aceleasi cateva flag-uri se repeta pe fiecare rand, asa ca sunt internate
+        return tuple(sys.intern(flag) for flag in flags)
+
+    def update_display(self) -> None:
+        self.display_from = BasicEmailHeadersParser.parse_regular(
+            BasicEmailHeadersParser.parse_address(self.from_address))
+        self.display_subject = BasicEmailHeadersParser.parse_regular(
+            BasicEmailHeadersParser.parse_subject(self.subject))
+        self.display_date = BasicEmailHeadersParser.parse_regular(BasicEmailHeadersParser.parse_date(self.date))
+
+    def is_seen(self) -> bool:
+        return "\\Seen" in self.flags
+
+
+class BodyPart(object):
+    def __init__(self, section: str, maintype: str, subtype: str, parameters: dict = None, encoding: str = "7bit",
+                 size: int = 0, disposition: str = None, filename: str = None):
+        self.section = section
+        self.maintype = maintype
+        self.subtype = subtype
+        self.parameters = parameters or dict()
+        self.encoding = encoding
+        self.size = size
+        self.disposition = disposition
+        self.filename = filename
+
+    def get_content_type(self) -> str:
+        return f"{self.maintype}/{self.subtype}"
+
+    def is_attachment(self) -> bool:
+        if self.disposition == "attachment" or self.filename:
+            return True
+        return self.maintype not in ("text", "multipart")
+
+    def decode_payload(self, payload: bytes) -> bytes:
+        if self.encoding == "base64":
+            return base64.b64decode(payload)
+        if self.encoding == "quoted-printable":
+            return quopri.decodestring(payload)
+        return payload
+
+    def decode_text(self, payload: bytes) -> str:
+        charset = self.parameters.get("charset", "utf-8")
+        try:
+            return payload.decode(charset, errors="replace")
+        except LookupError:
+            return payload.decode("utf-8", errors="replace")
+
+
+class PayloadDecoder(object):
+    # decodifica incremental o parte descarcata pe bucati; octetii care nu formeaza inca un grup base64
+    # complet, respectiv o linie quoted-printable completa, sunt pastrati pentru bucata urmatoare
+    def __init__(self, encoding: str = "7bit"):
+        self.__encoding = encoding
+        self.__pending = b""
+
+    def decode(self, data: bytes) -> bytes:
+        if self.__encoding == "base64":
+            data = self.__pending + re.sub(rb"[^A-Za-z0-9+/=]", b"", data)
+            end = len(data) - len(data) % 4
+            self.__pending = data[end:]
+            return base64.b64decode(data[:end])
+        if self.__encoding == "quoted-printable":
+            data = self.__pending + data
+            end = data.rfind(b"\n") + 1
+            self.__pending = data[end:]
+            return quopri.decodestring(data[:end])
+        return data
+
+    def flush(self) -> bytes:
+        pending, self.__pending = self.__pending, b""
+        if not pending:
+            return b""
+        if self.__encoding == "base64":
+            return base64.b64decode(pending + b"=" * (-len(pending) % 4))
+        if self.__encoding == "quoted-printable":
+            return quopri.decodestring(pending)
+        return pending
+
+
+class BodyStructureParser(object):
+    @staticmethod
+    def parse_fetch_response(response: list) -> list:
+        # literalii din raspuns sunt returnati de imaplib separat si sunt reinserati in sirul original
+        data = b""
+        for item in response:
+            if isinstance(item, tuple):
+                data += item[0] + b"\r\n" + item[1]
+            elif isinstance(item, bytes):
+                data += item
+
+        position = data.find(b"BODYSTRUCTURE ")
+        if position < 0:
+            raise BodyStructureParserException(f"BODYSTRUCTURE missing from response: {data[:100]}")
+
+        structure, _ = BodyStructureParser.parse_list(data, position + len(b"BODYSTRUCTURE "))
+        return BodyStructureParser.get_parts(structure)
+
+    @staticmethod
+    def parse_list(data: bytes, position: int) -> tuple:
+        if data[position:position + 1] != b"(":
+            raise BodyStructureParserException(f"list expected at position {position}")
+
+        result = list()
+        position += 1
+        while position < len(data):
+            char = data[position:position + 1]
+
+            if char == b" ":
+                position += 1
+            elif char == b")":
+                return result, position + 1
+            elif char == b"(":
+                value, position = BodyStructureParser.parse_list(data, position)
+                result.append(value)
+            elif char == b'"':
+                value = bytearray()
+                position += 1
+                while position < len(data) and data[position:position + 1] != b'"':
+                    if data[position:position + 1] == b"\\":
+                        position += 1
+                    value += data[position:position + 1]
+                    position += 1
+                if position >= len(data):
+                    # un raspuns trunchiat nu trebuie sa blocheze firul de executie care il parseaza
+                    raise BodyStructureParserException("unterminated string")
+                result.append(bytes(value))
+                position += 1
+            elif char == b"{":
+                end = data.find(b"}", position)
+                size = data[position + 1:end].rstrip(b"+")
+                if end < 0 or not size.isdigit() or end + 3 + int(size) > len(data):
+                    raise BodyStructureParserException(f"malformed literal at position {position}")
+                size = int(size)
+                position = end + 3
+                result.append(data[position:position + size])
+                position += size
+            else:
+                end = position
+                while end < len(data) and data[end:end + 1] not in b" ()":
+                    end += 1
+                atom = data[position:end]
+                result.append(None if atom.upper() == b"NIL" else atom)
+                position = end
+
+        raise BodyStructureParserException("unterminated list")
+
+    @staticmethod
+    def decode_string(value) -> str:
+        if not isinstance(value, bytes):
+            return str()
+        value = value.decode("utf-8", errors="replace")
+        try:
+            return str(make_header(decode_header(value)))
+        except Exception:
+            return value
+
+    @staticmethod
+    def parse_parameters(parameters) -> dict:
+        result = dict()
+        if not isinstance(parameters, list):
+            return result
+
+        for i in range(0, len(parameters) - 1, 2):
+            name = BodyStructureParser.decode_string(parameters[i]).lower()
+            result[name] = BodyStructureParser.decode_string(parameters[i + 1])
+        return result
+
+    @staticmethod
+    def get_parts(structure: list, section: str = "") -> list:
+        if not structure:
+            return []
+
+        # multipart: partile componente sunt urmate de subtipul multipart
+        if isinstance(structure[0], list):
+            parts = list()
+            for index, child in enumerate(structure, 1):
+                if not isinstance(child, list):
+                    break
+                parts.extend(BodyStructureParser.get_parts(child, f"{section}.{index}" if section else str(index)))
+            return parts
+
+        maintype = BodyStructureParser.decode_string(structure[0]).lower()
+        subtype = BodyStructureParser.decode_string(structure[1]).lower()
+        parameters = BodyStructureParser.parse_parameters(structure[2])
+        encoding = BodyStructureParser.decode_string(structure[5]).lower() or "7bit"
+        size = int(structure[6]) if isinstance(structure[6], bytes) and structure[6].isdigit() else 0
+
+        if maintype == "text":
+            disposition_index = 9
+        elif maintype == "message" and subtype == "rfc822":
+            disposition_index = 11
+        else:
+            disposition_index = 8
+
+        disposition = None
+        filename = parameters.get("name")
+        if len(structure) > disposition_index and isinstance(structure[disposition_index], list):
+            disposition = BodyStructureParser.decode_string(structure[disposition_index][0]).lower()
+            if len(structure[disposition_index]) > 1:
+                filename = BodyStructureParser.parse_parameters(structure[disposition_index][1]).get("filename",
+                                                                                                     filename)
+
+        return [BodyPart(section or "1", maintype, subtype, parameters, encoding, size, disposition, filename)]
+
+    @staticmethod
+    def get_displayable_part(parts: list, prefer: str = "html") -> typing.Optional[BodyPart]:
+        candidates = [part for part in parts if part.maintype == "text" and part.disposition != "attachment"]
+        for subtype in (prefer, "plain", "html"):
+            for part in candidates:
+                if part.subtype == subtype:
+                    return part
+        return candidates[0] if candidates else None
+
+
 class BasicEmailHeadersParser(object):
-    def __init__(self, content: MIMEText = None):
+    # caracterele cu codul >= 880 (dupa alfabetul latin extins si diacritice) sunt eliminate
+    UNSUPPORTED_CHARACTERS = re.compile("[^\u0000-\u036f]+")
+    # Tk nu poate afisa caracterele din afara planului multilingv de baza (ex. emoji)
+    NON_BMP_CHARACTERS = re.compile("[^\u0000-\uffff]+")
+
+    def __init__(self, content: typing.Union[MIMEText, EmailHeaders] = None):
         self.from_address = str()
         self.subject = str()
         self.to_address = str()
@@ -280,13 +2920,24 @@ class BasicEmailHeadersParser(object):
 
     @staticmethod
     def process_charset(string: str):
-        _result = ""
         if not string:
-            return _result
-        result = [string[j] for j in range(len(string)) if ord(string[j]) in range(880)]
-        for char in result:
-            _result += char
-        return _result
+            return ""
+        return BasicEmailHeadersParser.UNSUPPORTED_CHARACTERS.sub("", string)
+
+    @staticmethod
+    def decode_header_value(string: str) -> str:
+        # decodeaza cuvintele codificate RFC 2047 (=?charset?B/Q?...?=) in loc sa le elimine
+        if not string:
+            return ""
+
+        string = str(string)
+        if "=?" in string:
+            try:
+                string = str(make_header(decode_header(string)))
+            except Exception:
+                pass
+
+        return " ".join(BasicEmailHeadersParser.NON_BMP_CHARACTERS.sub("", string).split())
 
     @staticmethod
     def parse_regular(string: str, max_length=35):
@@ -333,7 +2984,14 @@ class BasicEmailHeadersParser(object):
 
         return subject
 
-    def parse(self, content: MIMEText) -> None:
+    def parse(self, content: typing.Union[MIMEText, EmailHeaders]) -> None:
+        if isinstance(content, EmailHeaders):
+            self.from_address = content.display_from
+            self.subject = content.display_subject
+            self.date = content.display_date
+            self.to_address = self.parse_regular(self.parse_address(content.to_address))
+            return
+
         if not isinstance(content, MIMEText):
             raise BasicEmailHeadersParserException(f"wrong arg type: {type(content)}; MIMEText required")
 
@@ -343,16 +3001,89 @@ class BasicEmailHeadersParser(object):
         self.to_address = self.parse_regular(self.parse_address(self.process_charset(content["To"])))
 
 
+class MailboxState(object):
+    def __init__(self, uidvalidity: int = 0):
+        self.uidvalidity = uidvalidity
+        self.uidnext = 0
+        self.highestmodseq = 0
+        self.uids = set()
+
+
+class MailboxChanges(object):
+    def __init__(self, emails_count: int = 0):
+        self.emails_count = emails_count
+        self.full = False
+        self.new_uids = list()
+        self.changed_uids = dict()
+        self.expunged_uids = list()
+
+
 class SendEmailServicesException(Exception):
     def __init__(self, e):
         super().__init__(e)
 
 
+class AttachmentPartException(Exception):
+    def __init__(self, e):
+        super().__init__(e)
+
+
 class ReadEmailServicesException(Exception):
     def __init__(self, e):
         super().__init__(e)
 
 
+class ImapConnectionPoolException(Exception):
+    def __init__(self, e):
+        super().__init__(e)
+
+
+class IdleListenerException(Exception):
+    def __init__(self, e):
+        super().__init__(e)
+
+
+class IndexCrawlerException(Exception):
+    def __init__(self, e):
+        super().__init__(e)
+
+
+class BodyPrefetcherException(Exception):
+    def __init__(self, e):
+        super().__init__(e)
+
+
+class EmailAccountException(Exception):
+    def __init__(self, e):
+        super().__init__(e)
+
+
+class AccountSyncSchedulerException(Exception):
+    def __init__(self, e):
+        super().__init__(e)
+
+
+class SmtpSessionPoolException(Exception):
+    def __init__(self, e):
+        super().__init__(e)
+
+
+class OutboxSenderException(Exception):
+    def __init__(self, e):
+        super().__init__(e)
+
+
+class BulkSenderException(Exception):
+    def __init__(self, e):
+        super().__init__(e)
+
+
+class BodyStructureParserException(Exception):
+    def __init__(self, e):
+        super().__init__(e)
+
+
 class BasicEmailHeadersParserException(Exception):
     def __init__(self, e):
         super().__init__(e)
+
@@ -0,0 +1,561 @@
+#!/usr/bin/env python
+
+import os
+import shlex
+import sqlite3
+import hashlib
+import threading
+import time
+import typing
+import uuid
+from collections import OrderedDict
+
+
+"""
+    Acest modul contine mecanismele de stocare locala (pe disc) pentru datele descarcate de pe server
+"""
+
+
+class HeadersCache:
+    def __init__(self, path: str = "email_cache.db"):
+        if not isinstance(path, str):
+            raise HeadersCacheException(f"wrong arg type: {type(path)}; str required")
+
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(path, check_same_thread=False)
+
+        with self.__lock, self.__connection:
+            self.__connection.execute("CREATE TABLE IF NOT EXISTS mailboxes ("
+                                      "account TEXT, mailbox TEXT, uidvalidity INTEGER, "
+                                      "PRIMARY KEY (account, mailbox))")
+            self.__connection.execute("CREATE TABLE IF NOT EXISTS headers ("
+                                      "account TEXT, mailbox TEXT, uidvalidity INTEGER, uid INTEGER, raw BLOB, "
+                                      "flags TEXT DEFAULT '', size INTEGER DEFAULT 0, "
+                                      "PRIMARY KEY (account, mailbox, uidvalidity, uid))")
+
+            # cache-urile create de versiunile anterioare nu contin flag-urile si dimensiunea mesajelor
+            columns = [row[1] for row in self.__connection.execute("PRAGMA table_info(headers)")]
+            if "flags" not in columns:
+                self.__connection.execute("ALTER TABLE headers ADD COLUMN flags TEXT DEFAULT ''")
+                self.__connection.execute("ALTER TABLE headers ADD COLUMN size INTEGER DEFAULT 0")
+
+    def get_uidvalidity(self, account: str, mailbox: str) -> int:
+        with self.__lock:
+            row = self.__connection.execute("SELECT uidvalidity FROM mailboxes WHERE account = ? AND mailbox = ?",
+                                            (account, mailbox)).fetchone()
+        return row[0] if row else 0
+
+    def set_uidvalidity(self, account: str, mailbox: str, uidvalidity: int) -> None:
+        if not isinstance(uidvalidity, int):
+            raise HeadersCacheException(f"wrong arg type: {type(uidvalidity)}; int required")
+
+        # daca UIDVALIDITY s-a schimbat, UID-urile vechi nu mai sunt valide si sunt sterse
+        with self.__lock, self.__connection:
+            self.__connection.execute("DELETE FROM headers WHERE account = ? AND mailbox = ? AND uidvalidity != ?",
+                                      (account, mailbox, uidvalidity))
+            self.__connection.execute("INSERT OR REPLACE INTO mailboxes VALUES (?, ?, ?)",
+                                      (account, mailbox, uidvalidity))
+
+    def get_headers(self, account: str, mailbox: str, uidvalidity: int, uids: list = None) -> dict:
+        # intoarce UID -> (header-e brute, flag-uri, dimensiune)
+        query = "SELECT uid, raw, flags, size FROM headers WHERE account = ? AND mailbox = ? AND uidvalidity = ?"
+        params = (account, mailbox, uidvalidity)
+
+        with self.__lock:
+            if uids is None:
+                rows = self.__connection.execute(query, params).fetchall()
+            else:
+                rows = list()
+                uids = list(uids)
+                # sqlite limiteaza numarul de parametri dintr-o interogare
+                for i in range(0, len(uids), 500):
+                    chunk = uids[i:i + 500]
+                    rows.extend(self.__connection.execute(query + f" AND uid IN ({','.join('?' * len(chunk))})",
+                                                          params + tuple(chunk)).fetchall())
+
+        return {uid: (raw, tuple(flags.split()), size) for uid, raw, flags, size in rows}
+
+    def store_headers(self, account: str, mailbox: str, uidvalidity: int, headers: dict) -> None:
+        if not isinstance(headers, dict):
+            raise HeadersCacheException(f"wrong arg type: {type(headers)}; dict required")
+
+        with self.__lock, self.__connection:
+            self.__connection.executemany("INSERT OR REPLACE INTO headers "
+                                          "(account, mailbox, uidvalidity, uid, raw, flags, size) "
+                                          "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                          [(account, mailbox, uidvalidity, uid, raw, " ".join(flags), size)
+                                           for uid, (raw, flags, size) in headers.items()])
+
+    def update_flags(self, account: str, mailbox: str, uidvalidity: int, flags: dict) -> None:
+        with self.__lock, self.__connection:
+            self.__connection.executemany("UPDATE headers SET flags = ? "
+                                          "WHERE account = ? AND mailbox = ? AND uidvalidity = ? AND uid = ?",
+                                          [(" ".join(uid_flags), account, mailbox, uidvalidity, uid)
+                                           for uid, uid_flags in flags.items()])
+
+    def remove_headers(self, account: str, mailbox: str, uidvalidity: int, uids: list) -> None:
+        with self.__lock, self.__connection:
+            self.__connection.executemany("DELETE FROM headers "
+                                          "WHERE account = ? AND mailbox = ? AND uidvalidity = ? AND uid = ?",
+                                          [(account, mailbox, uidvalidity, uid) for uid in uids])
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__connection.close()
+
+
+class BodyCache:
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, spill_directory: str = None,
+                 max_spill_bytes: int = 256 * 1024 * 1024):
+        if not isinstance(max_bytes, int) or not isinstance(max_spill_bytes, int):
+            raise BodyCacheException(
+                f"wrong arg types: {type(max_bytes)}, {type(max_spill_bytes)}; (int, int) required"
+            )
+        if spill_directory is not None and not isinstance(spill_directory, str):
+            raise BodyCacheException(f"wrong arg type: {type(spill_directory)}; str required")
+
+        self.__lock = threading.Lock()
+        self.__max_bytes = max_bytes
+        self.__bytes = 0
+        self.__entries = OrderedDict()  # cheie -> (continut, subtip, dimensiune), in ordinea utilizarii
+
+        self.__spill_directory = spill_directory
+        self.__max_spill_bytes = max_spill_bytes
+        self.__spill_bytes = 0
+        self.__spilled_entries = OrderedDict()  # cheie -> dimensiune fisier
+
+        if spill_directory:
+            os.makedirs(spill_directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(mailbox: str, uidvalidity: int, uid: int, variant: str = "") -> str:
+        return f"{mailbox}\x00{uidvalidity}\x00{uid}\x00{variant}"
+
+    def get(self, key: str) -> tuple:
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry:
+                self.__entries.move_to_end(key)
+                return entry[0], entry[1]
+
+            if key not in self.__spilled_entries:
+                return None
+
+            try:
+                with open(self.__get_spill_path(key), "rb") as file:
+                    subtype, content = file.read().decode("utf-8").split("\n", 1)
+            except (OSError, ValueError):
+                self.__remove_spilled(key)
+                return None
+
+            self.__remove_spilled(key)
+            self.__put(key, content, subtype)
+            return content, subtype
+
+    def put(self, key: str, content: str, subtype: str = "plain") -> None:
+        if not isinstance(content, str) or not isinstance(subtype, str):
+            raise BodyCacheException(f"wrong arg types: {type(content)}, {type(subtype)}; (str, str) required")
+
+        with self.__lock:
+            self.__put(key, content, subtype)
+
+    def __put(self, key: str, content: str, subtype: str) -> None:
+        size = len(content.encode("utf-8"))
+        if key in self.__entries:
+            self.__bytes -= self.__entries.pop(key)[2]
+        if size > self.__max_bytes:
+            return
+
+        self.__entries[key] = (content, subtype, size)
+        self.__bytes += size
+
+        # cele mai vechi intrari sunt eliminate din memorie (si eventual mutate pe disc)
+        while self.__bytes > self.__max_bytes:
+            old_key, (old_content, old_subtype, old_size) = self.__entries.popitem(last=False)
+            self.__bytes -= old_size
+            self.__spill(old_key, old_content, old_subtype)
+
+    def __get_spill_path(self, key: str) -> str:
+        return os.path.join(self.__spill_directory, hashlib.sha1(key.encode("utf-8")).hexdigest())
+
+    def __spill(self, key: str, content: str, subtype: str) -> None:
+        if not self.__spill_directory:
+            return
+
+        data = (subtype + "\n" + content).encode("utf-8")
+        if len(data) > self.__max_spill_bytes:
+            return
+
+        try:
+            with open(self.__get_spill_path(key), "wb") as file:
+                file.write(data)
+        except OSError:
+            return
+
+        self.__spilled_entries[key] = len(data)
+        self.__spill_bytes += len(data)
+
+        while self.__spill_bytes > self.__max_spill_bytes:
+            self.__remove_spilled(next(iter(self.__spilled_entries)))
+
+    def __remove_spilled(self, key: str) -> None:
+        self.__spill_bytes -= self.__spilled_entries.pop(key, 0)
+        try:
+            os.remove(self.__get_spill_path(key))
+        except OSError:
+            pass
+
+    def get_size(self) -> int:
+        return self.__bytes
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__entries.clear()
+            self.__bytes = 0
+            for key in list(self.__spilled_entries):
+                self.__remove_spilled(key)
+
+
+class SearchIndex:
+    FIELDS = {"from": "from_address", "to": "to_address", "subject": "subject", "body": "body"}
+
+    def __init__(self, path: str = "email_index.db"):
+        if not isinstance(path, str):
+            raise SearchIndexException(f"wrong arg type: {type(path)}; str required")
+
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(path, check_same_thread=False)
+
+        try:
+            with self.__lock, self.__connection:
+                self.__connection.execute("CREATE TABLE IF NOT EXISTS messages ("
+                                          "id INTEGER PRIMARY KEY, account TEXT, mailbox TEXT, uidvalidity INTEGER, "
+                                          "uid INTEGER, has_body INTEGER DEFAULT 0, has_headers INTEGER DEFAULT 0, "
+                                          "UNIQUE (account, mailbox, uidvalidity, uid))")
+                # textul indexat se afla intr-un tabel FTS5, legat de tabelul messages prin rowid
+                self.__connection.execute("CREATE VIRTUAL TABLE IF NOT EXISTS messages_text USING fts5("
+                                          "from_address, to_address, subject, body, "
+                                          "tokenize = 'unicode61 remove_diacritics 2')")
+
+                columns = [row[1] for row in self.__connection.execute("PRAGMA table_info(messages)")]
+                if "has_headers" not in columns:
+                    # in indexurile vechi, mesajele adaugate doar cu textul au coloanele header-elor goale
+                    self.__connection.execute("ALTER TABLE messages ADD COLUMN has_headers INTEGER DEFAULT 0")
+                    self.__connection.execute("UPDATE messages SET has_headers = 1 WHERE id IN (SELECT rowid "
+                                              "FROM messages_text WHERE from_address != '' OR subject != '')")
+        except sqlite3.OperationalError as e:
+            self.__connection.close()
+            raise SearchIndexException(f"full-text index unavailable: {e}")
+
+    def purge(self, account: str, mailbox: str, uidvalidity: int) -> None:
+        # elimina mesajele indexate cu un UIDVALIDITY diferit de cel curent
+        with self.__lock, self.__connection:
+            self.__connection.execute("DELETE FROM messages_text WHERE rowid IN (SELECT id FROM messages "
+                                      "WHERE account = ? AND mailbox = ? AND uidvalidity != ?)",
+                                      (account, mailbox, uidvalidity))
+            self.__connection.execute("DELETE FROM messages WHERE account = ? AND mailbox = ? AND uidvalidity != ?",
+                                      (account, mailbox, uidvalidity))
+
+    def __get_id(self, account: str, mailbox: str, uidvalidity: int, uid: int) -> tuple:
+        # intoarce (id, True) daca mesajul a fost adaugat acum, respectiv (id, False) daca era deja indexat
+        cursor = self.__connection.execute("INSERT OR IGNORE INTO messages (account, mailbox, uidvalidity, uid) "
+                                           "VALUES (?, ?, ?, ?)", (account, mailbox, uidvalidity, uid))
+        if cursor.rowcount:
+            return cursor.lastrowid, True
+
+        row = self.__connection.execute("SELECT id FROM messages "
+                                        "WHERE account = ? AND mailbox = ? AND uidvalidity = ? AND uid = ?",
+                                        (account, mailbox, uidvalidity, uid)).fetchone()
+        return row[0], False
+
+    def add_headers(self, account: str, mailbox: str, uidvalidity: int, headers: dict) -> int:
+        # header-ele unui UID nu se schimba, deci mesajele deja indexate sunt ignorate; cele adaugate anterior
+        # doar cu textul (de exemplu la descarcarea in avans a corpului) primesc acum si header-ele
+        if not isinstance(headers, dict):
+            raise SearchIndexException(f"wrong arg type: {type(headers)}; dict required")
+
+        added = 0
+        with self.__lock, self.__connection:
+            for uid, (from_address, to_address, subject) in headers.items():
+                rowid, inserted = self.__get_id(account, mailbox, uidvalidity, uid)
+                if inserted:
+                    self.__connection.execute("INSERT INTO messages_text "
+                                              "(rowid, from_address, to_address, subject, body) VALUES (?, ?, ?, ?, '')",
+                                              (rowid, from_address, to_address, subject))
+                    self.__connection.execute("UPDATE messages SET has_headers = 1 WHERE id = ?", (rowid,))
+                else:
+                    cursor = self.__connection.execute("UPDATE messages SET has_headers = 1 "
+                                                       "WHERE id = ? AND has_headers = 0", (rowid,))
+                    if not cursor.rowcount:
+                        continue
+                    self.__connection.execute("UPDATE messages_text SET from_address = ?, to_address = ?, "
+                                              "subject = ? WHERE rowid = ?", (from_address, to_address, subject, rowid))
+
+                added += 1
+        return added
+
+    def add_body(self, account: str, mailbox: str, uidvalidity: int, uid: int, text: str) -> None:
+        if not isinstance(text, str):
+            raise SearchIndexException(f"wrong arg type: {type(text)}; str required")
+
+        with self.__lock, self.__connection:
+            rowid, inserted = self.__get_id(account, mailbox, uidvalidity, uid)
+            if inserted:
+                self.__connection.execute("INSERT INTO messages_text (rowid, from_address, to_address, subject, body) "
+                                          "VALUES (?, '', '', '', ?)", (rowid, text))
+            else:
+                self.__connection.execute("UPDATE messages_text SET body = ? WHERE rowid = ?", (text, rowid))
+            self.__connection.execute("UPDATE messages SET has_body = 1 WHERE id = ?", (rowid,))
+
+    def remove(self, account: str, mailbox: str, uidvalidity: int, uids: list) -> None:
+        with self.__lock, self.__connection:
+            for uid in uids:
+                row = self.__connection.execute("SELECT id FROM messages "
+                                                "WHERE account = ? AND mailbox = ? AND uidvalidity = ? AND uid = ?",
+                                                (account, mailbox, uidvalidity, uid)).fetchone()
+                if row:
+                    self.__connection.execute("DELETE FROM messages_text WHERE rowid = ?", row)
+                    self.__connection.execute("DELETE FROM messages WHERE id = ?", row)
+
+    def get_indexed_uids(self, account: str, mailbox: str, uidvalidity: int, with_body: bool = False) -> set:
+        # fara with_body, intoarce mesajele ale caror header-e sunt indexate
+        query = "SELECT uid FROM messages WHERE account = ? AND mailbox = ? AND uidvalidity = ?"
+        query += " AND has_body = 1" if with_body else " AND has_headers = 1"
+
+        with self.__lock:
+            rows = self.__connection.execute(query, (account, mailbox, uidvalidity)).fetchall()
+        return {row[0] for row in rows}
+
+    @staticmethod
+    def make_query(text: str) -> str:
+        # fiecare termen devine un prefix intre ghilimele, deci caracterele speciale FTS5 nu sunt interpretate;
+        # termenii de forma "from:ana" se cauta doar in coloana corespunzatoare
+        try:
+            terms = shlex.split(text)
+        except ValueError:
+            terms = text.split()
+
+        query = list()
+        for term in terms:
+            field, _, value = term.partition(":")
+            column = SearchIndex.FIELDS.get(field.lower()) if value else None
+            value = value if column else term
+
+            phrase = '"' + value.replace('"', '""') + '"*'
+            query.append(f"{column} : {phrase}" if column else phrase)
+        return " ".join(query)
+
+    def search(self, text: str, account: str, mailbox: str = None, limit: int = 500) -> list:
+        # intoarce (mailbox, UID) pentru mesajele gasite, in ordinea relevantei
+        if not isinstance(text, str) or not isinstance(account, str):
+            raise SearchIndexException(f"wrong arg types: {type(text)}, {type(account)}; (str, str) required")
+
+        query = self.make_query(text)
+        if not query:
+            return []
+
+        sql = ("SELECT messages.mailbox, messages.uid FROM messages_text "
+               "JOIN messages ON messages.id = messages_text.rowid "
+               "WHERE messages_text MATCH ? AND messages.account = ?")
+        params = (query, account)
+        if mailbox is not None:
+            sql += " AND messages.mailbox = ?"
+            params += (mailbox,)
+
+        with self.__lock:
+            try:
+                rows = self.__connection.execute(sql + " ORDER BY rank LIMIT ?", params + (limit,)).fetchall()
+            except sqlite3.OperationalError as e:
+                raise SearchIndexException(f"wrong search query: {text}; {e}")
+        return [(row[0], row[1]) for row in rows]
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__connection.close()
+
+
+class Outbox:
+    QUEUED = "queued"
+    SENDING = "sending"
+    SENT = "sent"
+    FAILED = "failed"
+
+    def __init__(self, path: str = "email_outbox.db", spool_directory: str = None):
+        if not isinstance(path, str):
+            raise OutboxException(f"wrong arg type: {type(path)}; str required")
+        if spool_directory is not None and not isinstance(spool_directory, str):
+            raise OutboxException(f"wrong arg type: {type(spool_directory)}; str required")
+
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(path, check_same_thread=False)
+        # mesajele generate pe bucati (de exemplu cu atasamente mari) sunt pastrate in fisiere separate
+        self.__spool_directory = spool_directory or os.path.splitext(path)[0] + "_spool"
+
+        with self.__lock, self.__connection:
+            self.__connection.execute("CREATE TABLE IF NOT EXISTS outbox ("
+                                      "id INTEGER PRIMARY KEY AUTOINCREMENT, account TEXT, sender TEXT, "
+                                      "recipients TEXT, raw BLOB, status TEXT, attempts INTEGER DEFAULT 0, "
+                                      "next_attempt REAL DEFAULT 0, error TEXT DEFAULT '', created REAL, "
+                                      "spool TEXT)")
+            self.__connection.execute("CREATE INDEX IF NOT EXISTS outbox_pending "
+                                      "ON outbox (account, status, next_attempt)")
+
+            columns = [row[1] for row in self.__connection.execute("PRAGMA table_info(outbox)")]
+            if "spool" not in columns:
+                self.__connection.execute("ALTER TABLE outbox ADD COLUMN spool TEXT")
+
+            # mesajele ramase in curs de trimitere dupa o oprire brusca sunt puse inapoi in coada
+            self.__connection.execute("UPDATE outbox SET status = ? WHERE status = ?", (self.QUEUED, self.SENDING))
+
+    def add(self, account: str, sender: str, recipients: list, raw: typing.Union[bytes, typing.Iterable[bytes]]) -> int:
+        # raw este fie mesajul complet, fie bucatile mesajului, scrise pe rand intr-un fisier din spool
+        if not recipients:
+            raise OutboxException("no recipients")
+
+        spool = None
+        if not isinstance(raw, bytes):
+            spool = self.__spool(raw)
+            raw = None
+
+        try:
+            with self.__lock, self.__connection:
+                cursor = self.__connection.execute("INSERT INTO outbox "
+                                                   "(account, sender, recipients, raw, status, created, spool) "
+                                                   "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                                   (account, sender, "\n".join(recipients), raw, self.QUEUED,
+                                                    time.time(), spool))
+        except sqlite3.Error:
+            self.__remove_spooled(spool)
+            raise
+        return cursor.lastrowid
+
+    def __spool(self, chunks: typing.Iterable[bytes]) -> str:
+        path = os.path.join(self.__spool_directory, f"{uuid.uuid4().hex}.eml")
+        try:
+            os.makedirs(self.__spool_directory, exist_ok=True)
+            with open(path, "wb") as file:
+                for chunk in chunks:
+                    file.write(chunk)
+                file.flush()
+                os.fsync(file.fileno())
+        except Exception as e:
+            self.__remove_spooled(path)
+            raise OutboxException(f"message not spooled: {e}")
+        return path
+
+    @staticmethod
+    def __remove_spooled(path: typing.Optional[str]) -> None:
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def claim(self, account: str, limit: int = 1) -> list:
+        # intoarce mesajele care pot fi trimise acum, sub forma (id, expeditor, destinatari, continut, incercari),
+        # si le marcheaza ca fiind in curs de trimitere; continutul este mesajul sau calea fisierului din spool
+        with self.__lock, self.__connection:
+            rows = self.__connection.execute("SELECT id, sender, recipients, IFNULL(spool, raw), attempts FROM outbox "
+                                             "WHERE account = ? AND status = ? AND next_attempt <= ? "
+                                             "ORDER BY id LIMIT ?",
+                                             (account, self.QUEUED, time.time(), limit)).fetchall()
+            self.__connection.executemany("UPDATE outbox SET status = ? WHERE id = ?",
+                                          [(self.SENDING, row[0]) for row in rows])
+
+        return [(message_id, sender, recipients.split("\n"), raw, attempts)
+                for message_id, sender, recipients, raw, attempts in rows]
+
+    def get_next_attempt(self, account: str) -> typing.Optional[float]:
+        with self.__lock:
+            row = self.__connection.execute("SELECT MIN(next_attempt) FROM outbox WHERE account = ? AND status = ?",
+                                            (account, self.QUEUED)).fetchone()
+        return row[0]
+
+    def mark_sent(self, message_id: int) -> None:
+        # continutul mesajelor trimise nu mai este necesar; ramane doar starea lor
+        with self.__lock, self.__connection:
+            row = self.__connection.execute("SELECT spool FROM outbox WHERE id = ?", (message_id,)).fetchone()
+            self.__connection.execute("UPDATE outbox SET status = ?, attempts = attempts + 1, raw = NULL, "
+                                      "spool = NULL, error = '' WHERE id = ?", (self.SENT, message_id))
+        self.__remove_spooled(row[0] if row else None)
+
+    def retry(self, message_id: int, error: str, next_attempt: float) -> None:
+        with self.__lock, self.__connection:
+            self.__connection.execute("UPDATE outbox SET status = ?, attempts = attempts + 1, error = ?, "
+                                      "next_attempt = ? WHERE id = ?", (self.QUEUED, error, next_attempt, message_id))
+
+    def mark_failed(self, message_id: int, error: str) -> None:
+        with self.__lock, self.__connection:
+            self.__connection.execute("UPDATE outbox SET status = ?, attempts = attempts + 1, error = ? WHERE id = ?",
+                                      (self.FAILED, error, message_id))
+
+    def requeue(self, message_id: int) -> None:
+        with self.__lock, self.__connection:
+            self.__connection.execute("UPDATE outbox SET status = ?, attempts = 0, next_attempt = 0 "
+                                      "WHERE id = ? AND status = ?", (self.QUEUED, message_id, self.FAILED))
+
+    def get_status(self, message_id: int) -> typing.Optional[tuple]:
+        # intoarce (stare, incercari, ultima eroare), sau None daca mesajul nu exista
+        with self.__lock:
+            row = self.__connection.execute("SELECT status, attempts, error FROM outbox WHERE id = ?",
+                                            (message_id,)).fetchone()
+        return row
+
+    def get_depth(self, account: str = None) -> int:
+        # numarul mesajelor care nu au fost inca trimise (in asteptare sau in curs de trimitere)
+        query = "SELECT COUNT(*) FROM outbox WHERE status IN (?, ?)"
+        params = (self.QUEUED, self.SENDING)
+        if account is not None:
+            query += " AND account = ?"
+            params += (account,)
+
+        with self.__lock:
+            return self.__connection.execute(query, params).fetchone()[0]
+
+    def get_messages(self, account: str = None, status: str = None) -> list:
+        # intoarce (id, stare, incercari, ultima eroare) pentru fiecare mesaj, in ordinea adaugarii
+        query = "SELECT id, status, attempts, error FROM outbox WHERE 1"
+        params = tuple()
+        if account is not None:
+            query += " AND account = ?"
+            params += (account,)
+        if status is not None:
+            query += " AND status = ?"
+            params += (status,)
+
+        with self.__lock:
+            return self.__connection.execute(query + " ORDER BY id", params).fetchall()
+
+    def remove_sent(self, account: str = None) -> None:
+        query = "DELETE FROM outbox WHERE status = ?"
+        params = (self.SENT,)
+        if account is not None:
+            query += " AND account = ?"
+            params += (account,)
+
+        with self.__lock, self.__connection:
+            self.__connection.execute(query, params)
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__connection.close()
+
+
+class HeadersCacheException(Exception):
+    def __init__(self, e):
+        super().__init__(e)
+
+
+class BodyCacheException(Exception):
+    def __init__(self, e):
+        super().__init__(e)
+
+
+class SearchIndexException(Exception):
+    def __init__(self, e):
+        super().__init__(e)
+
+
+class OutboxException(Exception):
+    def __init__(self, e):
+        super().__init__(e)
@@ -0,0 +1,485 @@
+#!/usr/bin/env python
+
+import os
+import re
+import sys
+import json
+import time
+import getpass
+import argparse
+import calendar
+import socket
+import typing
+import threading
+import collections
+import concurrent.futures
+from termcolor import colored
+
+from email_services import ReadEmailServices
+
+
+"""
+    Acest modul contine transferul mailbox-urilor intre server si fisiere locale (mbox si Maildir), in ambele sensuri
+"""
+
+
+class MailboxExporter:
+    FORMATS = ("mbox", "maildir")
+    BATCH_SIZE = 100  # numarul maxim de mesaje cerute intr-o singura comanda FETCH
+    BATCH_BYTES = 8 * 1024 * 1024  # dimensiunea maxima a unui lot; un mesaj mai mare formeaza singur un lot
+    MAILDIR_FLAGS = {"\\Draft": "D", "\\Flagged": "F", "\\Answered": "R", "\\Seen": "S", "\\Deleted": "T"}
+    MBOX_STATUS_FLAGS = {"\\Seen": "R"}  # antetul Status; "O" marcheaza mesajele deja vazute de client
+    MBOX_X_STATUS_FLAGS = {"\\Answered": "A", "\\Flagged": "F", "\\Draft": "T", "\\Deleted": "D"}
+
+    def __init__(self, read_email_services: ReadEmailServices, workers: int = 3):
+        if not isinstance(read_email_services, ReadEmailServices):
+            raise MailboxExporterException(f"wrong arg type: {type(read_email_services)}; {ReadEmailServices} required")
+        if not isinstance(workers, int) or workers < 1:
+            raise MailboxExporterException(f"wrong arg: {workers}; positive int required")
+
+        self.__read_email_services = read_email_services
+        self.__workers = workers  # conexiunile folosite in paralel; limitate si de dimensiunea pool-ului IMAP
+        self.__stop_event = threading.Event()
+        self.__show_details = True
+
+    def show_details(self, show_details: bool) -> None:
+        if not isinstance(show_details, bool):
+            raise MailboxExporterException(f"wrong arg type: {type(show_details)}; {bool} required")
+
+        self.__show_details = show_details
+
+    def __output(self, output: typing.Any) -> None:
+        if self.__show_details:
+            print(output)
+
+    @staticmethod
+    def get_checkpoint_path(path: str) -> str:
+        return path.rstrip(os.sep) + ".checkpoint"
+
+    def export(self, mailbox: str, path: str, export_format: str = "mbox",
+               progress: typing.Callable[[int, int], None] = None) -> int:
+        # exporta mesajele din mailbox care nu au fost exportate anterior in acelasi fisier (director);
+        # intoarce numarul mesajelor exportate acum
+        if not isinstance(mailbox, str) or not isinstance(path, str):
+            raise MailboxExporterException(f"wrong arg types: {type(mailbox)}, {type(path)}; (str, str) required")
+        if export_format not in self.FORMATS:
+            raise MailboxExporterException(f"wrong arg: {export_format}; one of {self.FORMATS} required")
+        if progress is not None and not callable(progress):
+            raise MailboxExporterException(f"wrong arg type: {type(progress)}; callable required")
+
+        self.__stop_event.clear()
+        checkpoint = self.__load_checkpoint(path, mailbox, export_format)
+        try:
+            uidvalidity, sizes = self.__read_email_services.get_message_sizes(mailbox, checkpoint["last_uid"] + 1)
+        except Exception as e:
+            raise MailboxExporterException(f"listing '{mailbox}' failed: {e}")
+
+        # UID-urile salvate nu mai sunt valide dupa o schimbare a UIDVALIDITY; un export nou ar duplica mesajele
+        if checkpoint["uidvalidity"] and checkpoint["uidvalidity"] != uidvalidity:
+            raise MailboxExporterException(f"UIDVALIDITY of '{mailbox}' changed; "
+                                           f"remove {self.get_checkpoint_path(path)} to export again")
+        checkpoint["uidvalidity"] = uidvalidity
+
+        batches = self.__make_batches(sizes)
+        self.__output(f"[+] exporting {len(sizes)} messages from '{mailbox}' to {path} "
+                      f"(resuming after UID {checkpoint['last_uid']})")
+
+        if export_format == "mbox":
+            file = self.__open_mbox(path, checkpoint["offset"])
+        else:
+            file = None
+            for directory in ("tmp", "new", "cur"):
+                os.makedirs(os.path.join(path, directory), exist_ok=True)
+
+        exported = 0
+        try:
+            for uids, messages in self.__fetch_batches(mailbox, batches):
+                for uid in uids:
+                    if uid not in messages:
+                        continue  # mesajul a fost sters intre timp
+                    raw, flags, internaldate = messages[uid]
+                    if file:
+                        file.write(self.make_mbox_entry(raw, internaldate, flags))
+                    else:
+                        self.__write_maildir_message(path, uidvalidity, uid, raw, flags, internaldate)
+                    exported += 1
+
+                # punctul de reluare este salvat doar dupa ce lotul este scris complet pe disc
+                if file:
+                    file.flush()
+                    os.fsync(file.fileno())
+                    checkpoint["offset"] = file.tell()
+                checkpoint["last_uid"] = uids[-1]
+                self.__save_checkpoint(path, checkpoint)
+
+                if progress:
+                    progress(exported, len(sizes))
+                if self.__stop_event.is_set():
+                    break
+        except Exception as e:
+            self.__output(colored(f"[-] export of '{mailbox}' interrupted after {exported} messages", "red"))
+            raise MailboxExporterException(f"export interrupted, it can be resumed: {e}")
+        finally:
+            if file:
+                file.close()
+
+        self.__output(f"[+] export of '{mailbox}' {'stopped' if self.__stop_event.is_set() else 'finished'}: "
+                      f"{exported} messages")
+        return exported
+
+    def stop(self) -> None:
+        # lotul curent este terminat, iar exportul poate fi reluat din punctul salvat
+        self.__stop_event.set()
+
+    def __make_batches(self, sizes: dict) -> list:
+        batches = list()
+        batch, batch_bytes = list(), 0
+        for uid in sorted(sizes):
+            if batch and (len(batch) >= self.BATCH_SIZE or batch_bytes + sizes[uid] > self.BATCH_BYTES):
+                batches.append(batch)
+                batch, batch_bytes = list(), 0
+            batch.append(uid)
+            batch_bytes += sizes[uid]
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def __fetch_batches(self, mailbox: str, batches: list) -> typing.Iterator[tuple]:
+        # loturile sunt descarcate in paralel, dar intoarse in ordinea UID-urilor; cel mult cateva loturi
+        # asteapta sa fie scrise, deci memoria folosita nu depinde de dimensiunea mailbox-ului
+        with concurrent.futures.ThreadPoolExecutor(self.__workers) as executor:
+            pending = collections.deque()
+            batches = iter(batches)
+            try:
+                while True:
+                    while len(pending) <= self.__workers and not self.__stop_event.is_set():
+                        uids = next(batches, None)
+                        if uids is None:
+                            break
+                        pending.append((uids, executor.submit(self.__read_email_services.get_raw_messages,
+                                                              uids, mailbox)))
+                    if not pending:
+                        return
+
+                    uids, future = pending.popleft()
+                    yield uids, future.result()[1]
+            finally:
+                for _, future in pending:
+                    future.cancel()
+
+    def __load_checkpoint(self, path: str, mailbox: str, export_format: str) -> dict:
+        checkpoint = {"mailbox": mailbox, "format": export_format, "uidvalidity": 0, "last_uid": 0, "offset": 0}
+        try:
+            with open(self.get_checkpoint_path(path), "r") as file:
+                saved = json.load(file)
+        except FileNotFoundError:
+            return checkpoint
+        except (OSError, ValueError) as e:
+            raise MailboxExporterException(f"unreadable checkpoint: {e}")
+
+        if saved.get("mailbox") != mailbox or saved.get("format") != export_format:
+            raise MailboxExporterException(f"{path} contains an export of '{saved.get('mailbox')}' "
+                                           f"({saved.get('format')})")
+        checkpoint.update(saved)
+        return checkpoint
+
+    def __save_checkpoint(self, path: str, checkpoint: dict) -> None:
+        checkpoint_path = self.get_checkpoint_path(path)
+        with open(checkpoint_path + ".tmp", "w") as file:
+            json.dump(checkpoint, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(checkpoint_path + ".tmp", checkpoint_path)
+
+    @staticmethod
+    def __open_mbox(path: str, offset: int) -> typing.BinaryIO:
+        # mesajele scrise dupa ultimul punct de reluare (de exemplu la o intrerupere) sunt eliminate
+        file = open(path, "r+b" if os.path.exists(path) else "wb")
+        file.truncate(offset)
+        file.seek(offset)
+        return file
+
+    @classmethod
+    def make_mbox_entry(cls, raw: bytes, internaldate: float = None, flags: tuple = ()) -> bytes:
+        # format mboxrd: liniile care incep cu ">*From " primesc inca un ">", deci transformarea este reversibila;
+        # starea mesajului este scrisa in antetele Status si X-Status, inlocuind eventualele valori vechi
+        raw = raw.replace(b"\r\n", b"\n")
+        headers, _, body = raw.partition(b"\n\n")
+        headers = re.sub(rb"(?im)^(?:x-)?status:[^\n]*(?:\n|$)", b"", headers).rstrip(b"\n")
+        status = "".join(letter for flag, letter in cls.MBOX_STATUS_FLAGS.items() if flag in flags) + "O"
+        x_status = "".join(letter for flag, letter in cls.MBOX_X_STATUS_FLAGS.items() if flag in flags)
+        status = f"Status: {status}" + (f"\nX-Status: {x_status}" if x_status else "")
+        headers += (b"\n" if headers else b"") + status.encode("ascii")
+        raw = headers + b"\n\n" + body
+
+        raw = re.sub(rb"(?m)^(>*From )", rb">\1", raw)
+        if not raw.endswith(b"\n"):
+            raw += b"\n"
+        date = time.asctime(time.gmtime(internaldate if internaldate is not None else time.time()))
+        return b"From MAILER-DAEMON " + date.encode("ascii") + b"\n" + raw + b"\n"
+
+    def __write_maildir_message(self, path: str, uidvalidity: int, uid: int, raw: bytes, flags: tuple,
+                                internaldate: float) -> None:
+        # numele depinde doar de UIDVALIDITY si UID, asa ca un mesaj rescris la reluare nu este duplicat
+        hostname = socket.gethostname().replace("/", "_").replace(":", "_")
+        name = f"{int(internaldate)}.U{uidvalidity}-{uid}.{hostname}"
+        info = "".join(sorted(self.MAILDIR_FLAGS[flag] for flag in flags if flag in self.MAILDIR_FLAGS))
+
+        temporary_path = os.path.join(path, "tmp", name)
+        with open(temporary_path, "wb") as file:
+            file.write(raw)
+            file.flush()
+            os.fsync(file.fileno())
+        os.utime(temporary_path, (internaldate, internaldate))
+        os.replace(temporary_path, os.path.join(path, "cur", f"{name}:2,{info}"))
+
+
+class MailboxImporter:
+    FORMATS = MailboxExporter.FORMATS
+    BATCH_SIZE = 50  # numarul maxim de mesaje trimise intr-o comanda MULTIAPPEND
+    BATCH_BYTES = 8 * 1024 * 1024
+    MAILDIR_FLAGS = {letter: flag for flag, letter in MailboxExporter.MAILDIR_FLAGS.items()}
+    MBOX_FLAGS = {"R": "\\Seen", "A": "\\Answered", "F": "\\Flagged", "T": "\\Draft", "D": "\\Deleted"}
+
+    def __init__(self, read_email_services: ReadEmailServices, workers: int = 3):
+        if not isinstance(read_email_services, ReadEmailServices):
+            raise MailboxImporterException(f"wrong arg type: {type(read_email_services)}; {ReadEmailServices} required")
+        if not isinstance(workers, int) or workers < 1:
+            raise MailboxImporterException(f"wrong arg: {workers}; positive int required")
+
+        self.__read_email_services = read_email_services
+        self.__workers = workers
+        self.__stop_event = threading.Event()
+        self.__show_details = True
+
+    def show_details(self, show_details: bool) -> None:
+        if not isinstance(show_details, bool):
+            raise MailboxImporterException(f"wrong arg type: {type(show_details)}; {bool} required")
+
+        self.__show_details = show_details
+
+    def __output(self, output: typing.Any) -> None:
+        if self.__show_details:
+            print(output)
+
+    def import_messages(self, path: str, mailbox: str, import_format: str = "mbox",
+                        progress: typing.Callable[[int, int], None] = None) -> tuple:
+        # incarca mesajele din fisier (director) in mailbox si intoarce (importate, duplicate, esuate);
+        # mesajele al caror Message-ID exista deja in mailbox sunt sarite, deci un import intrerupt
+        # poate fi pur si simplu repornit
+        if not isinstance(path, str) or not isinstance(mailbox, str):
+            raise MailboxImporterException(f"wrong arg types: {type(path)}, {type(mailbox)}; (str, str) required")
+        if import_format not in self.FORMATS:
+            raise MailboxImporterException(f"wrong arg: {import_format}; one of {self.FORMATS} required")
+        if progress is not None and not callable(progress):
+            raise MailboxImporterException(f"wrong arg type: {type(progress)}; callable required")
+        if not os.path.exists(path):
+            raise MailboxImporterException(f"{path} does not exist")
+
+        self.__stop_event.clear()
+        if mailbox not in self.__read_email_services.get_mailboxes():
+            self.__read_email_services.create_mailbox(mailbox)
+        try:
+            message_ids = self.__read_email_services.get_message_ids(mailbox)
+        except Exception as e:
+            raise MailboxImporterException(f"listing '{mailbox}' failed: {e}")
+
+        self.__output(f"[+] importing {path} into '{mailbox}' ({len(message_ids)} messages already there)")
+        messages = self.read_mbox(path) if import_format == "mbox" else self.read_maildir(path)
+        counts = {"imported": 0, "duplicates": 0, "failed": 0}
+        total = self.count_messages(path, import_format) if progress else 0
+
+        # loturile sunt citite pe masura ce sunt trimise; cel mult doua loturi pe conexiune asteapta in memorie
+        with concurrent.futures.ThreadPoolExecutor(self.__workers) as executor:
+            pending = set()
+            for batch in self.__make_batches(messages, message_ids, counts):
+                if self.__stop_event.is_set():
+                    break
+                if len(pending) >= 2 * self.__workers:
+                    done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    self.__collect(done, counts, progress, total)
+                pending.add(executor.submit(self.__upload, mailbox, batch))
+            self.__collect(concurrent.futures.wait(pending).done, counts, progress, total)
+
+        if progress:
+            progress(sum(counts.values()), total)  # include si duplicatele gasite dupa ultimul lot trimis
+
+        self.__output(f"[+] import into '{mailbox}' {'stopped' if self.__stop_event.is_set() else 'finished'}: "
+                      f"{counts['imported']} imported, {counts['duplicates']} duplicates, {counts['failed']} failed")
+        return counts["imported"], counts["duplicates"], counts["failed"]
+
+    def stop(self) -> None:
+        # loturile deja trimise sunt terminate; mesajele importate vor fi sarite la reluare
+        self.__stop_event.set()
+
+    def __make_batches(self, messages: typing.Iterator[tuple], message_ids: set,
+                       counts: dict) -> typing.Iterator[list]:
+        batch, batch_bytes = list(), 0
+        for raw, flags, internaldate in messages:
+            message_id = ReadEmailServices.get_message_id(raw)
+            if message_id and message_id in message_ids:
+                counts["duplicates"] += 1
+                continue
+            if message_id:
+                message_ids.add(message_id)  # duplicatele din sursa sunt importate o singura data
+
+            if batch and (len(batch) >= self.BATCH_SIZE or batch_bytes + len(raw) > self.BATCH_BYTES):
+                yield batch
+                batch, batch_bytes = list(), 0
+            batch.append((raw, flags, internaldate))
+            batch_bytes += len(raw)
+        if batch:
+            yield batch
+
+    def __upload(self, mailbox: str, batch: list) -> tuple:
+        try:
+            return self.__read_email_services.append_messages(mailbox, batch), 0
+        except Exception as e:
+            self.__output(colored(f"[-] uploading {len(batch)} messages to '{mailbox}' failed: {e}", "red"))
+            return 0, len(batch)
+
+    @staticmethod
+    def __collect(futures: typing.Iterable[concurrent.futures.Future], counts: dict,
+                  progress: typing.Callable[[int, int], None], total: int) -> None:
+        # progresul este raportat ca (mesaje procesate, total), la fel ca la export
+        for future in futures:
+            imported, failed = future.result()
+            counts["imported"] += imported
+            counts["failed"] += failed
+            if progress:
+                progress(sum(counts.values()), total)
+
+    @classmethod
+    def count_messages(cls, path: str, import_format: str = "mbox") -> int:
+        # fisierul mbox este parcurs o data in plus, linie cu linie, fara a pastra mesajele in memorie
+        if import_format == "maildir":
+            directories = [os.path.join(path, directory) for directory in ("cur", "new")]
+            return sum(len([name for name in os.listdir(directory) if not name.startswith(".")])
+                       for directory in directories if os.path.isdir(directory))
+
+        count, previous = 0, b"\n"
+        with open(path, "rb") as file:
+            for line in file:
+                if line.startswith(b"From ") and previous in (b"\n", b"\r\n"):
+                    count += 1
+                previous = line
+        return count
+
+    @classmethod
+    def read_mbox(cls, path: str) -> typing.Iterator[tuple]:
+        # citeste fisierul linie cu linie si intoarce (mesaj brut, FLAGS, INTERNALDATE) pentru fiecare mesaj;
+        # liniile ">From " sunt readuse la forma initiala (mboxrd), iar data este luata din linia "From "
+        with open(path, "rb") as file:
+            lines, internaldate, previous = None, None, b"\n"
+            for line in file:
+                if line.startswith(b"From ") and previous in (b"\n", b"\r\n"):
+                    if lines is not None:
+                        yield cls.__make_mbox_message(lines, internaldate)
+                    lines, internaldate = list(), cls.__parse_from_line(line)
+                elif lines is not None:
+                    lines.append(re.sub(rb"^>(>*From )", rb"\1", line))
+                previous = line
+            if lines is not None:
+                yield cls.__make_mbox_message(lines, internaldate)
+
+    @classmethod
+    def __make_mbox_message(cls, lines: list, internaldate: float) -> tuple:
+        if lines and lines[-1] in (b"\n", b"\r\n"):
+            lines.pop()  # linia goala care separa mesajele
+        raw = b"".join(lines)
+
+        # starea mesajului este pastrata de clientii de email in antetele Status si X-Status
+        headers = raw.split(b"\n\n", 1)[0].split(b"\r\n\r\n", 1)[0]
+        status = b"".join(re.findall(rb"(?im)^(?:x-)?status:[ \t]*(\w*)", headers)).decode("ascii", "ignore")
+        flags = tuple(sorted({cls.MBOX_FLAGS[letter] for letter in status if letter in cls.MBOX_FLAGS}))
+        return raw, flags, internaldate
+
+    @staticmethod
+    def __parse_from_line(line: bytes) -> float:
+        # "From expeditor Thu Jul 18 09:44:25 1996"; data este in format asctime, considerata UTC
+        try:
+            date = " ".join(line.decode("ascii", "ignore").split()[-5:])
+            return float(calendar.timegm(time.strptime(date, "%a %b %d %H:%M:%S %Y")))
+        except ValueError:
+            return time.time()
+
+    @classmethod
+    def read_maildir(cls, path: str) -> typing.Iterator[tuple]:
+        # starea mesajului este codificata in numele fisierului (":2,FS"), iar data in momentul modificarii
+        for directory in ("cur", "new"):
+            directory = os.path.join(path, directory)
+            if not os.path.isdir(directory):
+                continue
+
+            for name in sorted(os.listdir(directory)):
+                if name.startswith("."):
+                    continue
+                message_path = os.path.join(directory, name)
+                info = name.rsplit(":2,", 1)[1] if ":2," in name else ""
+                with open(message_path, "rb") as file:
+                    raw = file.read()
+                yield (raw, tuple(sorted(cls.MAILDIR_FLAGS[letter] for letter in info if letter in cls.MAILDIR_FLAGS)),
+                       os.path.getmtime(message_path))
+
+
+def main(arguments: list = None) -> int:
+    # linia de comanda: python email_transfer.py (export | import) <cont> <mailbox> <cale> [--format maildir];
+    # contul este o intrare din config.json, iar datele de autentificare lipsa sunt cerute la terminal
+    parser = argparse.ArgumentParser(description="Export a mailbox to, or import it from, an mbox file or a Maildir")
+    parser.add_argument("command", choices=("export", "import"))
+    parser.add_argument("account", help="account name from the configuration file")
+    parser.add_argument("mailbox")
+    parser.add_argument("path", help="mbox file or Maildir directory")
+    parser.add_argument("--format", choices=MailboxExporter.FORMATS, default="mbox")
+    parser.add_argument("--workers", type=int, default=3, help="parallel IMAP connections")
+    parser.add_argument("--config", default=os.path.join(os.path.dirname(os.path.realpath(__file__)), "config.json"))
+    arguments = parser.parse_args(arguments)
+
+    with open(arguments.config, "r") as file:
+        accounts = json.load(file)
+    if arguments.account not in accounts:
+        print(colored(f"[-] account '{arguments.account}' not found in {arguments.config}", "red"))
+        return 1
+
+    config = accounts[arguments.account]
+    username = config.get("username") or input("Username: ")
+    password = config.get("password") or getpass.getpass("Password: ")
+
+    read_email_services = ReadEmailServices(pool_size=max(arguments.workers, 1))
+    if not read_email_services.connect_to_server(config["imap"]["host"], config["imap"]["port"]) or \
+            not read_email_services.login_to_server(username, password):
+        return 1
+
+    def progress(done, total):
+        print(f"[+] {done}/{total} messages")
+
+    try:
+        if arguments.command == "export":
+            MailboxExporter(read_email_services, arguments.workers).export(arguments.mailbox, arguments.path,
+                                                                           arguments.format, progress)
+        else:
+            MailboxImporter(read_email_services, arguments.workers).import_messages(arguments.path, arguments.mailbox,
+                                                                                    arguments.format, progress)
+    except (MailboxExporterException, MailboxImporterException) as e:
+        print(colored(f"[-] {e}", "red"))
+        return 1
+    except KeyboardInterrupt:
+        print(colored("[-] interrupted; run the same command again to continue", "red"))
+        return 1
+    finally:
+        read_email_services.logout()
+    return 0
+
+
+class MailboxExporterException(Exception):
+    def __init__(self, e):
+        super().__init__(e)
+
+
+class MailboxImporterException(Exception):
+    def __init__(self, e):
+        super().__init__(e)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
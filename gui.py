@@ -2,10 +2,16 @@
 
 from tkinter import *
 from tkinter import ttk
-from email.mime.text import MIMEText
+from tkinter import font
+from tkinter import filedialog
+import os
+import queue
+import time
 from tkinterhtml import HtmlFrame
 from bs4 import BeautifulSoup
 
+from email_services import EmailHeaders
+
 
 """
     Acest modul contine implementarea interfetei grafice
@@ -28,6 +34,7 @@ class LoginScreen(ttk.Frame):  # implemantarea frame-ului de login
         super().__init__(parent)
 
         self.login_group = ttk.Frame(self)
+        self.accounts_list = ttk.Combobox(self.login_group)
         self.username = ttk.Entry(self.login_group)
         self.password = ttk.Entry(self.login_group)
         self.login_button = ttk.Button(self.login_group)
@@ -36,6 +43,7 @@ class LoginScreen(ttk.Frame):  # implemantarea frame-ului de login
         self.__setup__login_screen()
 
     def __setup__login_screen(self):  # setarea proprietatilor de baza
+        account_label = ttk.Label(self.login_group)
         username_label = ttk.Label(self.login_group)
         password_label = ttk.Label(self.login_group)
 
@@ -43,18 +51,22 @@ class LoginScreen(ttk.Frame):  # implemantarea frame-ului de login
 
         self.login_group.configure(borderwidth=3, relief="raised")
         self.password.configure(show="*")
+        self.accounts_list.configure(state="readonly")
         self.login_button.configure(text="Login")
         self.status.configure(text="Enter your username and password")
+        account_label.configure(text="Account:")
         username_label.configure(text="Username:")
         password_label.configure(text="Password:")
 
         self.login_group.grid(row=1, column=1, sticky=(N, S, E, W))
-        self.username.grid(row=1, column=1, sticky=(E, W))
-        self.password.grid(row=2, column=1, sticky=(E, W))
-        self.login_button.grid(row=3, column=0, columnspan=2, pady=4)
+        self.accounts_list.grid(row=1, column=1, sticky=(E, W))
+        self.username.grid(row=2, column=1, sticky=(E, W))
+        self.password.grid(row=3, column=1, sticky=(E, W))
+        self.login_button.grid(row=4, column=0, columnspan=2, pady=4)
 
-        username_label.grid(row=1, column=0)
-        password_label.grid(row=2, column=0)
+        account_label.grid(row=1, column=0)
+        username_label.grid(row=2, column=0)
+        password_label.grid(row=3, column=0)
 
         self.status.grid(row=0, column=0, columnspan=2, sticky=(E, W))
 
@@ -83,6 +95,10 @@ class WriteEmailScreen(ttk.Frame):  # implementarea frame-ului de scriere
         self.subject = ttk.Entry(self)
         self.send_email_button = ttk.Button(self)
         self.back_button = ttk.Button(self)
+        self.attach_button = ttk.Button(self)
+        self.attachments = ttk.Label(self)
+        self.attachment_paths = list()  # fisierele atasate mesajului, citite abia la trimitere
+        self.status = ttk.Label(self)
 
         self.__setup_write_email_screen()
 
@@ -91,6 +107,7 @@ class WriteEmailScreen(ttk.Frame):  # implementarea frame-ului de scriere
 
         self.send_email_button.configure(text="Send")
         self.back_button.configure(text="Back")
+        self.attach_button.configure(text="Attach")
 
         self.from_address.grid(row=0, column=1, sticky=(W, E))
         self.to_address.grid(row=1, column=1, sticky=(W, E))
@@ -105,8 +122,11 @@ class WriteEmailScreen(ttk.Frame):  # implementarea frame-ului de scriere
         ttk.Label(self, text="Subject:").grid(row=4, column=0, sticky=W, pady=1)
 
         self.text.grid(row=5, column=0, columnspan=2, sticky=(N, S, E, W))
+        self.attach_button.grid(row=6, column=0, sticky=W, pady=2)
+        self.attachments.grid(row=6, column=1, sticky=(W, E))
         self.send_email_button.grid(row=7, column=1, sticky=E, pady=2)
         self.back_button.grid(row=7, column=0, sticky=W, pady=2)
+        self.status.grid(row=8, column=0, columnspan=2, sticky=(W, E))
 
         self.rowconfigure(5, weight=1)
         self.columnconfigure(0, weight=1)
@@ -115,12 +135,197 @@ class WriteEmailScreen(ttk.Frame):  # implementarea frame-ului de scriere
     def show(self):
         self.grid(column=0, row=0, sticky=(N, S, E, W))
 
+    def add_attachments(self, paths: tuple):
+        self.attachment_paths.extend(path for path in paths if path not in self.attachment_paths)
+        self.attachments["text"] = ", ".join(os.path.basename(path) for path in self.attachment_paths)
+
     def clear_all(self):
         self.to_address.delete(0, "end")
         self.cc.delete(0, "end")
         self.bcc.delete(0, "end")
         self.subject.delete(0, "end")
         self.text.delete(1.0, "end")
+        self.attachment_paths = list()
+        self.attachments["text"] = ""
+        self.status["text"] = ""
+
+
+class UpdateQueue:  # coada prin care firele de executie secundare cer modificari ale interfetei grafice
+    # Tk nu poate fi apelat in siguranta decat din firul principal; functiile primite sunt
+    # executate in loturi de bucla principala, printr-un apel periodic after()
+    INTERVAL = 20  # milisecunde intre doua goliri ale cozii
+    BUDGET = 0.015  # timpul maxim (secunde) petrecut la o golire, pentru ca interfata sa ramana fluida
+
+    def __init__(self, widget: Misc):
+        self.__widget = widget
+        self.__queue = queue.Queue()
+        self.__widget.after(self.INTERVAL, self.__drain)
+
+    def put(self, function, *args, **kwargs):
+        self.__queue.put((function, args, kwargs))
+
+    def __drain(self):
+        deadline = time.monotonic() + self.BUDGET
+        while time.monotonic() < deadline:
+            try:
+                function, args, kwargs = self.__queue.get_nowait()
+            except queue.Empty:
+                break
+
+            try:
+                function(*args, **kwargs)
+            except Exception as e:
+                print(f"[-] UI update failed: {e}")
+
+        self.__widget.after(self.INTERVAL, self.__drain)
+
+
+class VirtualList:  # model de date pentru un Treeview care afiseaza doar randurile vizibile
+    # randurile (cheie, text, valori, tag-uri) sunt pastrate in memorie, iar in Treeview
+    # sunt inserate doar cele din fereastra vizibila; bara de derulare este controlata de model
+    def __init__(self, treeview: ttk.Treeview, scrollbar: ttk.Scrollbar):
+        self.treeview = treeview
+        self.__scrollbar = scrollbar
+        self.__keys = list()
+        self.__rows = dict()  # cheie -> (text, valori, tag-uri)
+        self.__first = 0  # indexul primului rand afisat
+        self.__selection = ()  # cheile selectate, pastrate si dupa ce randurile ies din fereastra vizibila
+        self.__render_pending = False
+        self.__scroll_callback = None
+
+        self.__scrollbar.configure(command=self.yview)
+        self.treeview.configure(yscrollcommand="")
+        self.treeview.bind("<Configure>", lambda event: self.__schedule_render())
+        self.treeview.bind("<MouseWheel>", self.__mouse_wheel)
+        self.treeview.bind("<Button-4>", self.__mouse_wheel)
+        self.treeview.bind("<Button-5>", self.__mouse_wheel)
+        self.treeview.bind("<<TreeviewSelect>>", self.__selection_changed, add="+")
+
+    def __len__(self):
+        return len(self.__keys)
+
+    def __contains__(self, key):
+        return key in self.__rows
+
+    def get_keys(self) -> list:
+        return list(self.__keys)
+
+    def bind_scroll(self, callback):
+        # functia primeste (primul rand vizibil, numarul de randuri vizibile, numarul total de randuri)
+        # dupa fiecare redesenare; poate fi folosita pentru incarcarea in avans a randurilor urmatoare
+        self.__scroll_callback = callback
+
+    def insert(self, index, key: str, text: str = "", values: tuple = (), tags: tuple = ()):
+        self.insert_rows(index, [(key, text, values, tags)])
+
+    def insert_rows(self, index, rows: list):
+        # randurile existente cu aceeasi cheie sunt inlocuite
+        self.delete(*[key for key, *_ in rows])
+        if index == "end":
+            index = len(self.__keys)
+
+        self.__keys[index:index] = [key for key, *_ in rows]
+        for key, text, values, tags in rows:
+            self.__rows[key] = (text, tuple(values), tuple(tags))
+
+        if index < self.__first:
+            self.__first += len(rows)  # randurile vizibile raman pe loc daca se insereaza deasupra lor
+        self.__schedule_render()
+
+    def update(self, key: str, text: str = None, values: tuple = None, tags: tuple = None):
+        if key not in self.__rows:
+            return
+
+        old_text, old_values, old_tags = self.__rows[key]
+        self.__rows[key] = (old_text if text is None else text,
+                            old_values if values is None else tuple(values),
+                            old_tags if tags is None else tuple(tags))
+        if self.treeview.exists(key):
+            self.treeview.item(key, text=self.__rows[key][0], values=self.__rows[key][1], tags=self.__rows[key][2])
+
+    def delete(self, *keys: str):
+        keys = {key for key in keys if key in self.__rows}
+        if not keys:
+            return
+
+        # lista este reconstruita o singura data, deci stergerea a mii de randuri nu blocheaza interfata
+        self.__first -= sum(1 for key in self.__keys[:self.__first] if key in keys)
+        self.__keys = [key for key in self.__keys if key not in keys]
+        for key in keys:
+            del self.__rows[key]
+        self.__selection = tuple(key for key in self.__selection if key not in keys)
+        self.__schedule_render()
+
+    def clear(self):
+        self.__keys = list()
+        self.__rows = dict()
+        self.__first = 0
+        self.__selection = ()
+        self.__schedule_render()
+
+    def selection(self) -> tuple:
+        return self.__selection
+
+    def select_all(self):
+        self.__selection = tuple(self.__keys)
+        self.treeview.selection_set(self.treeview.get_children())
+
+    def __selection_changed(self, event=None):
+        # randurile reselectate la redesenare nu modifica selectia; o selectie noua facuta de utilizator
+        # o inlocuieste pe cea veche, inclusiv randurile care nu mai sunt vizibile
+        selection = set(self.treeview.selection())
+        if selection == set(self.treeview.get_children()).intersection(self.__selection):
+            return
+        self.__selection = tuple(key for key in self.__keys if key in selection)
+
+    def get_visible_count(self) -> int:
+        # numarul de randuri care incap in Treeview; o estimare mai mare doar materializeaza cateva randuri in plus
+        row_height = max(font.nametofont("TkDefaultFont").metrics("linespace"), 1)
+        return max(self.treeview.winfo_height() // row_height, 1)
+
+    def yview(self, *args):
+        visible_count = self.get_visible_count()
+        if args and args[0] == "moveto":
+            self.__first = int(float(args[1]) * len(self.__keys))
+        elif args and args[0] == "scroll":
+            self.__first += int(args[1]) * (visible_count if args[2] == "pages" else 1)
+        self.__schedule_render()
+
+    def __mouse_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.yview("scroll", -3, "units")
+        else:
+            self.yview("scroll", 3, "units")
+        return "break"
+
+    def __schedule_render(self):
+        # mai multe modificari consecutive ale modelului produc o singura redesenare
+        if not self.__render_pending:
+            self.__render_pending = True
+            self.treeview.after_idle(self.__render)
+
+    def __render(self):
+        self.__render_pending = False
+
+        visible_count = self.get_visible_count()
+        self.__first = max(min(self.__first, len(self.__keys) - visible_count), 0)
+        visible_keys = self.__keys[self.__first:self.__first + visible_count + 1]
+
+        if tuple(visible_keys) != self.treeview.get_children():
+            self.treeview.delete(*self.treeview.get_children())
+            for key in visible_keys:
+                text, values, tags = self.__rows[key]
+                self.treeview.insert("", "end", key, text=text, values=values, tags=tags)
+            self.treeview.selection_set([key for key in visible_keys if key in self.__selection])
+
+        if self.__keys:
+            self.__scrollbar.set(self.__first / len(self.__keys),
+                                 min(self.__first + visible_count, len(self.__keys)) / len(self.__keys))
+        else:
+            self.__scrollbar.set(0, 1)
+
+        if self.__scroll_callback:
+            self.__scroll_callback(self.__first, visible_count, len(self.__keys))
 
 
 class MailboxScreen(Frame):  # implementarea frame-ului pentru inbox in care se listeaza
@@ -135,19 +340,43 @@ class MailboxScreen(Frame):  # implementarea frame-ului pentru inbox in care se
         self.more_button = ttk.Button(self)
         self.scrollbar = ttk.Scrollbar(self)
         self.logout_button = ttk.Button(self)
+        self.search_entry = ttk.Entry(self)
+        self.search_button = ttk.Button(self)
+        self.accounts_status = ttk.Label(self)  # starea conturilor sincronizate in fundal
+        self.outbox_status = ttk.Label(self)  # mesajele din outbox care nu au fost inca trimise
+        self.actions_group = ttk.Frame(self)  # actiunile aplicate tuturor mesajelor selectate
+        self.read_button = ttk.Button(self.actions_group)
+        self.unread_button = ttk.Button(self.actions_group)
+        self.flag_button = ttk.Button(self.actions_group)
+        self.delete_button = ttk.Button(self.actions_group)
+        self.move_button = ttk.Button(self.actions_group)
+        self.move_target = ttk.Combobox(self.actions_group)
+        self.actions_status = ttk.Label(self.actions_group)
+        self.__unseen_font = font.nametofont("TkDefaultFont").copy()
 
         self.__setup_read_email_screen()
+        self.mails = VirtualList(self.mails_list, self.scrollbar)  # randurile listei, materializate doar cand sunt vizibile
+        self.mails_list.bind("<Control-a>", lambda event: self.mails.select_all())
 
     def __setup_read_email_screen(self):
         self.mailboxes_list.configure(state="readonly")
         self.write_button.configure(text="Write")
-        self.mails_list.configure(columns=("Subject", "Date"), yscrollcommand=self.scrollbar.set)
+        self.mails_list.configure(columns=("Subject", "Date"), selectmode="extended")
         self.mails_list.heading("Subject", text="Subject")
         self.mails_list.heading("Date", text="Date")
+        self.__unseen_font.configure(weight="bold")
+        self.mails_list.tag_configure("unseen", font=self.__unseen_font)
         self.refresh_button.configure(text="Refresh")
         self.more_button.configure(text="Show More")
         self.logout_button.configure(text="Logout")
-        self.scrollbar.configure(orient=VERTICAL, command=self.mails_list.yview)
+        self.search_button.configure(text="Search")
+        self.scrollbar.configure(orient=VERTICAL)
+        self.read_button.configure(text="Mark read")
+        self.unread_button.configure(text="Mark unread")
+        self.flag_button.configure(text="Flag")
+        self.delete_button.configure(text="Delete")
+        self.move_button.configure(text="Move to")
+        self.move_target.configure(state="readonly")
 
         self.mailboxes_list.grid(column=1, row=0, sticky=W, padx=3)
         self.mails_list.grid(column=0, row=1, columnspan=5, sticky=(N, S, E, W))
@@ -156,7 +385,20 @@ class MailboxScreen(Frame):  # implementarea frame-ului pentru inbox in care se
         self.more_button.grid(column=2, row=0, sticky=E, padx=1)
         self.logout_button.grid(column=0, row=0, sticky=W, padx=1)
         self.scrollbar.grid(column=4, row=1, sticky=(N, S, E))
-
+        self.search_entry.grid(column=0, row=2, columnspan=4, sticky=(E, W), padx=1)
+        self.search_button.grid(column=4, row=2, sticky=E, padx=1)
+        self.accounts_status.grid(column=0, row=3, columnspan=5, sticky=(E, W), padx=1)
+        self.outbox_status.grid(column=0, row=4, columnspan=5, sticky=(E, W), padx=1)
+        self.actions_group.grid(column=0, row=5, columnspan=5, sticky=(E, W))
+        self.read_button.grid(column=0, row=0, padx=1)
+        self.unread_button.grid(column=1, row=0, padx=1)
+        self.flag_button.grid(column=2, row=0, padx=1)
+        self.delete_button.grid(column=3, row=0, padx=1)
+        self.move_button.grid(column=4, row=0, padx=1)
+        self.move_target.grid(column=5, row=0, padx=1)
+        self.actions_status.grid(column=6, row=0, sticky=(E, W), padx=1)
+
+        self.actions_group.columnconfigure(6, weight=1)
         self.columnconfigure(1, weight=1)
         self.rowconfigure(1, weight=1)
 
@@ -165,7 +407,12 @@ class MailboxScreen(Frame):  # implementarea frame-ului pentru inbox in care se
 
     def clear_all(self):
         self.mailboxes_list.delete(0, "end")
-        self.mails_list.delete(*self.mails_list.get_children())
+        self.mails.clear()
+        self.search_entry.delete(0, "end")
+        self.accounts_status["text"] = ""
+        self.outbox_status["text"] = ""
+        self.move_target.set("")
+        self.actions_status["text"] = ""
 
 
 class EmailRenderingScreen(ttk.Frame):  # implementarea frame-ului pentru randarea mail-urilor html si text
@@ -177,7 +424,9 @@ class EmailRenderingScreen(ttk.Frame):  # implementarea frame-ului pentru randar
         self.back_button = ttk.Button(self)
         self.respond_button = ttk.Button(self)
         self.redirect_button = ttk.Button(self)
+        self.attachments_button = ttk.Button(self)
         self.header = ttk.Label(self)
+        self.status = ttk.Label(self)  # progresul salvarii atasamentelor
 
         self.__setup__email_rendering_screen()
 
@@ -187,11 +436,14 @@ class EmailRenderingScreen(ttk.Frame):  # implementarea frame-ului pentru randar
         self.back_button.configure(text="Back")
         self.respond_button.configure(text="Respond")
         self.redirect_button.configure(text="Redirect")
+        self.attachments_button.configure(text="Save attachments")
 
         self.back_button.grid(row=2, column=0, sticky=W)
         self.redirect_button.grid(row=2, column=2, sticky=E)
         self.respond_button.grid(row=2, column=1, sticky=E)
-        self.header.grid(row=0, column=0, columnspan=3, sticky=(N, S, E, W))
+        self.attachments_button.grid(row=2, column=3, sticky=E)
+        self.header.grid(row=0, column=0, columnspan=4, sticky=(N, S, E, W))
+        self.status.grid(row=3, column=0, columnspan=4, sticky=(W, E))
 
         self.rowconfigure(1, weight=1)
         self.columnconfigure(1, weight=1)
@@ -210,11 +462,11 @@ class EmailRenderingScreen(ttk.Frame):  # implementarea frame-ului pentru randar
             self.__text_display.delete(1.0, "end")
             self.__text_display.insert(1.0, content)
             self.__text_display.configure(state="disabled")
-            self.__text_display.grid(row=1, column=0, columnspan=3, sticky=(N, S, E, W))
+            self.__text_display.grid(row=1, column=0, columnspan=4, sticky=(N, S, E, W))
         else:
             content = self.process_content(content)
             self.__email_renderer.set_content(content)
-            self.__email_renderer.grid(row=1, column=0, columnspan=3, sticky=(N, S, E, W))
+            self.__email_renderer.grid(row=1, column=0, columnspan=4, sticky=(N, S, E, W))
             self.__parent.geometry("800x300")
 
     def grid_rmv(self):
@@ -222,11 +474,11 @@ class EmailRenderingScreen(ttk.Frame):  # implementarea frame-ului pentru randar
         self.__email_renderer.grid_remove()
         self.grid_remove()
 
-    def set_header(self, header: MIMEText):
-        from_address = header["From"]
-        to_address = header["To"]
-        subject = header["Subject"]
-        date = header["Date"]
+    def set_header(self, header: EmailHeaders):
+        from_address = header.from_address
+        to_address = header.to_address
+        subject = header.subject
+        date = header.date
         self.header["text"] = f"From: {from_address}\nTo: {to_address}\nSubject: {subject}\nDate: {date}"
 
     def show(self):
@@ -235,3 +487,4 @@ class EmailRenderingScreen(ttk.Frame):  # implementarea frame-ului pentru randar
     def clear_all(self):
         self.__text_display.delete(1.0, "end")
         self.header["text"] = ""
+        self.status["text"] = ""